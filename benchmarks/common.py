@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Helpers shared by the benchmarks.
+
+Every benchmark writes its results as JSON, and can compare them with a baseline
+(the results of a previous run) to fail when a measure regressed.
+
+Functions:
+    percentiles(values) -> dict:
+        Summarizes measured durations with their count, p50, p95, p99 and max.
+
+    compare(results, baseline, tolerance) -> list[str]:
+        Lists the measures of the results that regressed from the baseline.
+
+    report(results, output, baseline, tolerance, measures) -> int:
+        Writes the results, compares them with the baseline and returns the exit code.
+"""
+import json
+import sys
+from typing import Iterable
+
+# measures where a higher value is better, every other measure should not grow
+HIGHER_IS_BETTER: tuple[str, ...] = ('per_second', 'throughput', 'completed')
+
+
+def percentiles(values: Iterable[float]) -> dict:
+    """Summarizes measured durations with their count, p50, p95, p99 and max.
+
+    Args:
+        values (Iterable[float]): The durations in seconds.
+
+    Returns:
+        dict: The summary, with None percentiles when there are no values.
+    """
+    ordered: list[float] = sorted(values)
+    if not ordered:
+        return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+    def at(fraction: float) -> float:
+        # nearest rank
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 6)
+
+    return {'count': len(ordered), 'p50': at(0.5), 'p95': at(0.95), 'p99': at(0.99),
+            'max': round(ordered[-1], 6)}
+
+
+def _flatten(value, prefix: str = '') -> dict[str, float]:
+    """Returns the numeric measures of nested results by dotted path."""
+    if isinstance(value, dict):
+        flat: dict[str, float] = {}
+        for key, item in value.items():
+            flat.update(_flatten(item, f'{prefix}{key}.'))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2,
+            measures: Iterable[str] = ('p95', 'p99', 'per_second', 'peak')) -> list[str]:
+    """Lists the measures of the results that regressed from the baseline.
+
+    Only the measures whose path ends with one of `measures` are compared, the
+    configuration of the run is not.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results of a previous run.
+        tolerance (float): The relative change allowed, e.g. 0.2 for 20%.
+        measures (Iterable[str]): The last part of the compared paths, e.g. `p95`.
+
+    Returns:
+        list[str]: A description of every regression, empty if there is none.
+    """
+    current: dict[str, float] = _flatten(results)
+    regressions: list[str] = []
+    for path, before in _flatten(baseline).items():
+        if path.startswith('config.') or not path.endswith(tuple(measures)):
+            continue
+        after = current.get(path)
+        if after is None or not before:
+            continue
+        higher_is_better: bool = any(word in path for word in HIGHER_IS_BETTER)
+        change: float = (after - before) / before
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f'{path}: {before} -> {after} ({change:+.0%})')
+    return regressions
+
+
+def report(results: dict, output: str = None, baseline: str = None,
+           tolerance: float = 0.2,
+           measures: Iterable[str] = ('p95', 'p99', 'per_second', 'peak')) -> int:
+    """Writes the results, compares them with the baseline and returns the exit code.
+
+    Args:
+        results (dict): The results of the benchmark.
+        output (str, optional): The file the results are written to, stdout by default.
+        baseline (str, optional): A file with the results of a previous run.
+        tolerance (float): The relative change allowed from the baseline.
+        measures (Iterable[str]): The last part of the compared paths, see `compare`.
+
+    Returns:
+        int: 1 if a measure regressed from the baseline, 0 otherwise.
+    """
+    text: str = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    if not baseline:
+        return 0
+    with open(baseline, encoding='utf-8') as file:
+        regressions: list[str] = compare(results, json.load(file), tolerance, measures)
+    for regression in regressions:
+        print(f'regression: {regression}', file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Generated corpus of the documents users upload, for the extraction benchmark.
+
+The corpus is generated from a seed, so every run extracts the same documents:
+small and large documents in English and Arabic, a table-heavy document and a
+document with many pages, each as PDF and DOCX. DOC files are converted from the
+DOCX files with LibreOffice (`soffice`) when it is installed, they are left out
+otherwise.
+
+The PDFs are written without a PDF library: their text uses the standard
+Helvetica font, with a `ToUnicode` map for the Arabic letters, and Arabic lines
+are written in visual order, so their text is extracted like the text of a PDF
+exported by a word processor. Every page has a header and a page number.
+
+Classes:
+    Document: A document of the corpus with its format, pages and content.
+
+Functions:
+    render_pdf(pages, rtl) -> bytes:
+        Renders the blocks of every page into a PDF.
+
+    render_docx(pages) -> bytes:
+        Renders the blocks of every page into a DOCX, with a page break between pages.
+
+    convert_to_doc(docx) -> bytes:
+        Converts a DOCX into a DOC with LibreOffice, None when it is not installed.
+
+    build_corpus(scale, seed, formats) -> list[Document]:
+        Generates the documents of the corpus.
+"""
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Iterable, Optional
+
+ENGLISH: tuple[str, ...] = (
+    'water', 'community', 'access', 'project', 'youth', 'training', 'peace', 'the',
+    'of', 'and', 'displaced', 'families', 'health', 'education', 'local', 'support',
+    'organization', 'Darfur', 'Nyala', 'sustainable', 'partners', 'budget', 'women',
+)
+ARABIC: tuple[str, ...] = (
+    'المياه', 'المجتمع', 'النزاع', 'الشباب', 'التدريب', 'السلام', 'في', 'من', 'على',
+    'النازحين', 'الأسر', 'الصحة', 'التعليم', 'المحلي', 'دعم', 'منظمة', 'دارفور',
+    'نيالا', 'مستدام', 'الشركاء', 'الميزانية', 'النساء',
+)
+
+# (name, language, pages, paragraphs per page, tables per page) at scale 1
+LAYOUTS: tuple[tuple[str, str, int, int, int], ...] = (
+    ('en-small', 'en', 2, 6, 0),
+    ('ar-small', 'ar', 2, 6, 0),
+    ('en-large', 'en', 40, 12, 0),
+    ('ar-large', 'ar', 40, 12, 0),
+    ('tables', 'en', 20, 2, 2),
+    ('many-pages', 'en', 300, 3, 0),
+)
+TABLE_SHAPE: tuple[int, int] = (12, 5)
+# repeated on every page of the PDFs, with a page number in the footer
+HEADER: str = 'Sudanese Youth Network - Annual Report 2024'
+
+
+
+@dataclass
+class Document:
+    """A document of the corpus with its format, pages and content."""
+
+    name: str
+    format: str
+    language: str
+    pages: int
+    data: bytes
+
+    @property
+    def file_name(self) -> str:
+        return f'{self.name}.{self.format}'
+
+
+class _Writer:
+    """Generates the words, paragraphs and tables of the documents."""
+
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+
+    def sentence(self, language: str, words: int = 14) -> str:
+        vocabulary: tuple[str, ...] = ARABIC if language == 'ar' else ENGLISH
+        return ' '.join(self.random.choice(vocabulary) for _ in range(words)) + '.'
+
+    def paragraph(self, language: str) -> str:
+        return ' '.join(self.sentence(language) for _ in range(self.random.randint(3, 6)))
+
+    def table(self, language: str) -> list[list[str]]:
+        rows, columns = TABLE_SHAPE
+        return [[self.sentence(language, 2)[:-1] if row else f'Column {column + 1}'
+                 for column in range(columns)] for row in range(rows)]
+
+    def pages(self, language: str, pages: int, paragraphs: int,
+              tables: int) -> list[list]:
+        """Returns the blocks of every page, paragraphs as str and tables as lists."""
+        content: list[list] = []
+        for _ in range(pages):
+            blocks: list = [self.paragraph(language) for _ in range(paragraphs)]
+            for _ in range(tables):
+                blocks.append(self.table(language))
+            content.append(blocks)
+        return content
+
+
+def _wrap(text: str, width: int = 90) -> list[str]:
+    lines: list[str] = []
+    line: str = ''
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f'{line} {word}' if line else word
+    return lines + [line] if line else lines
+
+
+class _PdfEncoder:
+    """Encodes text for the PDF font, mapping non ASCII letters to free codes."""
+
+    def __init__(self) -> None:
+        self.codes: dict[str, int] = {}
+
+    def encode(self, text: str) -> bytes:
+        encoded: bytearray = bytearray()
+        for char in text:
+            if ' ' <= char <= '~':
+                code: int = ord(char)
+            else:
+                code = self.codes.setdefault(char, 0x80 + len(self.codes))
+            if code in (0x28, 0x29, 0x5C):
+                encoded.append(0x5C)
+            encoded.append(code)
+        return bytes(encoded)
+
+    def to_unicode(self) -> bytes:
+        entries: list[str] = [f'<{code:02X}> <{ord(char):04X}>'
+                              for char, code in self.codes.items()]
+        body: str = ''.join(
+            f'{len(chunk)} beginbfchar\n' + '\n'.join(chunk) + '\nendbfchar\n'
+            for chunk in (entries[i:i + 100] for i in range(0, len(entries), 100)))
+        return (
+            '/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n'
+            '/CMapName /Raed-UCS def /CMapType 2 def\n'
+            '1 begincodespacerange <00> <FF> endcodespacerange\n'
+            f'{body}endcmap CMapName currentdict /CMap defineresource pop end end'
+        ).encode()
+
+
+def render_pdf(pages: list[list], rtl: bool = False) -> bytes:
+    """Renders the blocks of every page into a PDF.
+
+    Args:
+        pages (list[list]): The paragraphs and tables of every page.
+        rtl (bool): Whether the text is right-to-left, it is then written in visual
+            order like word processors do.
+
+    Returns:
+        bytes: The PDF file.
+    """
+    encoder = _PdfEncoder()
+    order = (lambda text: text[::-1]) if rtl else (lambda text: text)
+    streams: list[bytes] = []
+    for number, blocks in enumerate(pages, 1):
+        commands: list[bytes] = [b'BT /F1 9 Tf 11 TL 40 815 Td',
+                                 b'(' + encoder.encode(HEADER) + b') Tj T* T*']
+        for block in blocks:
+            if isinstance(block, str):
+                for line in _wrap(block):
+                    commands.append(b'(' + encoder.encode(order(line)) + b') Tj T*')
+            else:
+                for row in block:
+                    for column, cell in enumerate(row):
+                        # every cell at its own position, like the tables of word processors
+                        commands.append(b'%d 0 Td (' % (column and 100) +
+                                        encoder.encode(order(cell)) + b') Tj')
+                    commands.append(b'%d -11 Td' % -(100 * (len(row) - 1)))
+            commands.append(b'T*')
+        commands.append(b'ET BT /F1 9 Tf 280 30 Td (Page %d of %d) Tj ET' % (number, len(pages)))
+        streams.append(b'\n'.join(commands))
+
+    # 1 catalog, 2 pages, 3 font, 4 ToUnicode, then a page and its content per page
+    objects: list[bytes] = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % (5 + 2 * i) for i in range(len(pages))), len(pages)),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /ToUnicode 4 0 R >>',
+    ]
+    to_unicode: bytes = encoder.to_unicode()
+    objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(to_unicode), to_unicode))
+    for i, stream in enumerate(streams):
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (6 + 2 * i))
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+
+    pdf: bytearray = bytearray(b'%PDF-1.4\n')
+    offsets: list[int] = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref: int = len(pdf)
+    pdf += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    pdf += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    pdf += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def render_docx(pages: list[list]) -> bytes:
+    """Renders the blocks of every page into a DOCX, with a page break between pages.
+
+    Args:
+        pages (list[list]): The paragraphs and tables of every page.
+
+    Returns:
+        bytes: The DOCX file.
+    """
+    from docx import Document as DocxDocument
+    from docx.enum.text import WD_BREAK
+
+    document = DocxDocument()
+    for index, blocks in enumerate(pages):
+        if index:
+            document.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+        for block in blocks:
+            if isinstance(block, str):
+                document.add_paragraph(block)
+                continue
+            table = document.add_table(rows=len(block), cols=len(block[0]))
+            for row, cells in zip(table.rows, block):
+                for cell, text in zip(row.cells, cells):
+                    cell.text = text
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def convert_to_doc(docx: bytes) -> Optional[bytes]:
+    """Converts a DOCX into a DOC with LibreOffice, None when it is not installed."""
+    soffice: Optional[str] = shutil.which('soffice') or shutil.which('libreoffice')
+    if soffice is None:
+        return None
+    with tempfile.TemporaryDirectory() as directory:
+        source: str = os.path.join(directory, 'document.docx')
+        with open(source, 'wb') as file:
+            file.write(docx)
+        subprocess.run([soffice, '--headless', '--convert-to', 'doc', '--outdir',
+                        directory, source], capture_output=True, check=True, timeout=300)
+        with open(os.path.join(directory, 'document.doc'), 'rb') as file:
+            return file.read()
+
+
+def build_corpus(scale: float = 1, seed: int = 1,
+                 formats: Iterable[str] = ('pdf', 'docx', 'doc')) -> list[Document]:
+    """Generates the documents of the corpus.
+
+    Args:
+        scale (float): The factor of the number of pages of every document.
+        seed (int): Seeds the generated text.
+        formats (Iterable[str]): The formats generated.
+
+    Returns:
+        list[Document]: The documents, DOC files only if LibreOffice is installed.
+    """
+    writer = _Writer(seed)
+    documents: list[Document] = []
+    for name, language, pages, paragraphs, tables in LAYOUTS:
+        count: int = max(1, round(pages * scale))
+        content: list[list] = writer.pages(language, count, paragraphs, tables)
+        if 'pdf' in formats:
+            documents.append(Document(name, 'pdf', language, count, render_pdf(content, language == 'ar')))
+        if 'docx' in formats or 'doc' in formats:
+            docx: bytes = render_docx(content)
+            if 'docx' in formats:
+                documents.append(Document(name, 'docx', language, count, docx))
+            doc: Optional[bytes] = convert_to_doc(docx) if 'doc' in formats else None
+            if doc is not None:
+                documents.append(Document(name, 'doc', language, count, doc))
+    return documents
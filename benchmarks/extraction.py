@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Benchmark of the text extraction of the uploaded documents.
+
+Every document of the generated corpus (`benchmarks/corpus.py`) is extracted by
+every backend of its format: `bot` is `extract_text_from_file` as the handlers
+call it, `raw` the same without normalizing the text, the others are the
+alternatives already installed with textract. Every
+extraction is run once to warm up, then `--repeat` times to measure:
+
+    pages_per_second, mb_per_second  the throughput, from the median duration
+    seconds                          p50/p95/p99 of the durations
+    memory_peak                      peak bytes allocated by Python (tracemalloc,
+                                     in a separate run, memory of C libraries
+                                     like libxml2 is not included)
+    output_chars                     characters of the extracted text
+
+The measures are also totalled by format and backend, over the whole corpus. The
+results are written as JSON, together with the versions of the parsers, and can
+be compared with a baseline to flag a slower parser or a parser upgrade. Only the
+throughput and the peak memory are compared: single durations are too noisy on
+shared machines.
+
+Run with `python -m benchmarks.extraction --output results.json`, and add
+`--baseline previous.json` to fail when a measure regressed.
+
+Functions:
+    run_benchmark(options) -> dict:
+        Extracts the corpus with every backend and returns the results.
+"""
+import argparse
+import gc
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+from io import BytesIO, StringIO
+from typing import Callable
+
+from bot.utils.utilties import extract_pages, extract_text_from_file
+from benchmarks.common import percentiles, report
+from benchmarks.corpus import Document, build_corpus
+
+# throughput and memory, see `benchmarks.common.compare`
+COMPARED: tuple[str, ...] = ('per_second', 'peak')
+PACKAGES: tuple[str, ...] = ('pypdf', 'python-docx', 'lxml', 'textract', 'pdfminer.six',
+                             'docx2txt')
+
+
+def _bot(document: Document) -> str:
+    return extract_text_from_file(BytesIO(document.data), document.file_name)
+
+
+def _raw(document: Document) -> str:
+    return '\n'.join(extract_pages(BytesIO(document.data), document.file_name))
+
+
+def _pdfminer(document: Document) -> str:
+    from pdfminer.high_level import extract_text_to_fp
+
+    output = StringIO()
+    extract_text_to_fp(BytesIO(document.data), output)
+    return output.getvalue()
+
+
+def _python_docx(document: Document) -> str:
+    from docx import Document as DocxDocument
+
+    return '\n'.join(paragraph.text for paragraph in DocxDocument(BytesIO(document.data)).paragraphs)
+
+
+def _docx2txt(document: Document) -> str:
+    import docx2txt
+
+    return docx2txt.process(BytesIO(document.data))
+
+
+# the extractors of every format, `bot` is the one used by the handlers and `raw`
+# the same without the normalization of the text
+BACKENDS: dict[str, dict[str, Callable[[Document], str]]] = {
+    'pdf': {'bot': _bot, 'raw': _raw, 'pdfminer': _pdfminer},
+    'docx': {'bot': _bot, 'raw': _raw, 'python-docx': _python_docx, 'docx2txt': _docx2txt},
+    'doc': {'bot': _bot, 'raw': _raw},
+}
+
+
+def _versions() -> dict[str, str]:
+    versions: dict[str, str] = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def measure(extract: Callable[[Document], str], document: Document, repeat: int = 5) -> dict:
+    """Measures the extraction of a document by a backend.
+
+    Args:
+        extract (Callable[[Document], str]): The backend.
+        document (Document): The document.
+        repeat (int): The number of measured extractions.
+
+    Returns:
+        dict: The throughput, durations, peak memory and output size of the extraction.
+    """
+    text: str = extract(document) or ''
+    durations: list[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        started: float = time.perf_counter()
+        extract(document)
+        durations.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        extract(document)
+        memory_peak: int = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    median: float = max(statistics.median(durations), 1e-9)
+    return {
+        'pages_per_second': round(document.pages / median, 3),
+        'mb_per_second': round(len(document.data) / 1024 / 1024 / median, 3),
+        'seconds': percentiles(durations),
+        'memory_peak': memory_peak,
+        'output_chars': len(text),
+    }
+
+
+def run_benchmark(options: argparse.Namespace) -> dict:
+    """Extracts the corpus with every backend and returns the results.
+
+    Args:
+        options (argparse.Namespace): The options of the command line, see `parse_args`.
+
+    Returns:
+        dict: The configuration, versions, and measures by format and by document.
+    """
+    corpus: list[Document] = build_corpus(options.scale, options.seed, options.formats)
+    documents: dict[str, dict] = {}
+    totals: dict[str, dict[str, dict]] = {}
+    for document in corpus:
+        backends: dict[str, dict] = {}
+        for name, extract in BACKENDS[document.format].items():
+            if options.backends and name not in options.backends:
+                continue
+            try:
+                backends[name] = measure(extract, document, options.repeat)
+            except Exception as e:
+                # e.g. antiword, used by textract for DOC files, is not installed
+                backends[name] = {'error': f'{type(e).__name__}: {e}'}
+                continue
+            total: dict = totals.setdefault(document.format, {}).setdefault(
+                name, {'pages': 0, 'bytes': 0, 'seconds': 0.0, 'memory_peak': 0})
+            total['pages'] += document.pages
+            total['bytes'] += len(document.data)
+            total['seconds'] += backends[name]['seconds']['p50']
+            total['memory_peak'] = max(total['memory_peak'], backends[name]['memory_peak'])
+        documents[document.file_name] = {
+            'language': document.language, 'pages': document.pages,
+            'bytes': len(document.data), 'backends': backends,
+        }
+
+    for backends in totals.values():
+        for total in backends.values():
+            seconds: float = max(total.pop('seconds'), 1e-9)
+            total['pages_per_second'] = round(total['pages'] / seconds, 3)
+            total['mb_per_second'] = round(total['bytes'] / 1024 / 1024 / seconds, 3)
+
+    generated: set[str] = {document.format for document in corpus}
+    return {
+        'config': {key: value for key, value in vars(options).items()
+                   if key not in ('output', 'baseline', 'tolerance')},
+        'versions': _versions(),
+        # DOC files need LibreOffice to be generated
+        'skipped': sorted(set(options.formats) - generated),
+        'totals': totals,
+        'documents': documents,
+    }
+
+
+def parse_args(args: list[str] = None) -> argparse.Namespace:
+    """Parses the options of the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--scale', type=float, default=1,
+                        help='factor of the number of pages of the documents')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='measured extractions of every document')
+    parser.add_argument('--formats', nargs='+', default=['pdf', 'docx', 'doc'],
+                        choices=sorted(BACKENDS))
+    parser.add_argument('--backends', nargs='+', help='only these backends, e.g. bot')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='file the JSON results are written to')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative regression allowed from the baseline')
+    return parser.parse_args(args)
+
+
+def main(args: list[str] = None) -> int:
+    """Runs the benchmark and reports its results."""
+    options: argparse.Namespace = parse_args(args)
+    logging.basicConfig(level=logging.WARNING)
+    results: dict = run_benchmark(options)
+    return report(results, options.output, options.baseline, options.tolerance, COMPARED)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
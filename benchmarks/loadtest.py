@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""End-to-end load test of the conversation.
+
+The application of `bot/app.py`, with its real `ConversationHandler`, talks to a
+local fake of the Bot API (`tests/fake_bot_api.py`) and generates with a fake model
+whose latency and output size follow log-normal distributions. Virtual users go
+through a scripted flow, one step after the other:
+
+    /start -> language -> analysis tools -> problem tree -> concept note
+    -> document upload -> concept note input
+
+Their updates are put in the update queue of the application like the updates of
+the updater, so they are processed as in production. A step lasts from putting its
+update in the queue until the application processed it. The results are written
+as JSON: the throughput, the p50/p95/p99 of the steps by state, the memory used
+and the requests the overload controller served degraded (see `bot/utils/overload.py`,
+its thresholds are set with the `OVERLOAD_*` environment variables).
+
+Run with `python -m benchmarks.loadtest --users 1000 --output results.json`, and add
+`--baseline previous.json` to fail when a measure regressed. With `--cassette` the
+generations recorded with `GEMINI_BACKEND=record` are replayed instead of the fake
+model, with their timing scaled by `--time-scale`.
+
+Classes:
+    FakeGenerativeModel: Stands in for `GenerativeModel` with random latency and output size.
+    VirtualUser: A user going through the scripted flow.
+
+Functions:
+    async def run_load_test(options) -> dict:
+        Runs the virtual users against the application and returns the results.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from itertools import count
+from types import SimpleNamespace
+from typing import Optional
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder, ContextTypes, TypeHandler
+
+from bot.app import build_application
+from bot.gemini import base
+from bot.config import system_config
+from bot.gemini.backends import ReplayBackend
+from bot.gemini.base import Gemini, FULL_PROPOSAL_SECTIONS
+from bot.utils import memory, sessions
+from bot.utils.export import render_docx
+from bot.utils.journal import journal
+from bot.utils.overload import overload_requests
+from benchmarks.common import percentiles, report
+from tests.fake_bot_api import FakeBotAPI
+
+# the fake Bot API accepts any token
+TOKEN: str = '123456:loadtest'
+PROFILE: str = (
+    "Sudanese Youth Network is a volunteer organization working on water access "
+    "and peacebuilding in Darfur since 2019. "
+) * 40
+PROBLEM: str = "Villages around Nyala lack clean water since the wells were destroyed."
+WORDS: tuple[str, ...] = (
+    'water', 'community', 'access', 'النزاع', 'المجتمع', 'youth', 'المياه', 'training'
+)
+
+
+class FakeResponse:
+    """A streamed response of the fake model."""
+
+    def __init__(self, chunks: list[str], delays: list[float], prompt: str) -> None:
+        self.chunks: list[str] = chunks
+        self.delays: list[float] = delays
+        self.text: str = ''.join(chunks)
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4, candidates_token_count=len(self.text) // 4)
+
+    def __iter__(self):
+        for chunk, delay in zip(self.chunks, self.delays):
+            time.sleep(delay)
+            yield self
+
+
+class FakeGenerativeModel:
+    """Stands in for `GenerativeModel` with random latency and output size.
+
+    Like the real client, it blocks the thread calling it.
+    """
+
+    def __init__(self, latency: float = 0.5, latency_sigma: float = 0.5,
+                 output_chars: int = 3000, size_sigma: float = 0.5,
+                 chunks: int = 5, seed: int = None) -> None:
+        """Initializes the model.
+
+        Args:
+            latency (float): The median seconds of a generation.
+            latency_sigma (float): The sigma of the log-normal latency.
+            output_chars (int): The median characters of a generation.
+            size_sigma (float): The sigma of the log-normal output size.
+            chunks (int): The chunks a response is streamed in.
+            seed (int, optional): Seeds the distributions.
+        """
+        self.latency: float = latency
+        self.latency_sigma: float = latency_sigma
+        self.output_chars: int = output_chars
+        self.size_sigma: float = size_sigma
+        self.chunks: int = chunks
+        self.random = random.Random(seed)
+        self.calls: int = 0
+
+    def _sample(self, median: float, sigma: float) -> float:
+        return self.random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+    def _text(self, chars: int) -> str:
+        words: list[str] = []
+        while sum(map(len, words)) + len(words) < chars:
+            words.append(self.random.choice(WORDS))
+        return ' '.join(words)
+
+    def generate_content(self, prompt: str, stream: bool = False) -> FakeResponse:
+        self.calls += 1
+        chars: int = max(int(self._sample(self.output_chars, self.size_sigma)), 1)
+        # papers are asked section by section, answer with every requested heading.
+        headings: list[str] = [h for h in FULL_PROPOSAL_SECTIONS if f"<b>{h}:</b> " in prompt]
+        text: str = '\n'.join(
+            f"<b>{heading}:</b> {self._text(chars // len(headings))}" for heading in headings
+        ) if headings else self._text(chars)
+
+        size: int = math.ceil(len(text) / self.chunks)
+        chunks: list[str] = [text[i:i + size] for i in range(0, len(text), size)]
+        delays: list[float] = [self._sample(self.latency, self.latency_sigma) / len(chunks)
+                               ] * len(chunks)
+        response = FakeResponse(chunks, delays, prompt)
+        if not stream:
+            time.sleep(sum(delays))
+        return response
+
+
+class VirtualUser:
+    """A user going through the scripted flow.
+    """
+
+    _update_ids = count(1)
+    _message_ids = count(1)
+
+    def __init__(self, user_id: int, lang: str, application, completed: dict,
+                 think: float = 0, step_timeout: float = 300) -> None:
+        """Initializes the user.
+
+        Args:
+            user_id (int): The id of the user and of its private chat.
+            lang (str): The language the user picks.
+            application (Application): The application under test.
+            completed (dict): The futures resolved when an update is processed, by update id.
+            think (float): The maximum seconds the user waits between two steps.
+            step_timeout (float): The seconds a step may take before the user gives up.
+        """
+        self.user: dict = {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}',
+                           'language_code': lang}
+        self.chat: dict = {'id': user_id, 'type': 'private'}
+        self.lang: str = lang
+        self.application = application
+        self.completed: dict = completed
+        self.think: float = think
+        self.step_timeout: float = step_timeout
+        self.timings: list[tuple[str, float]] = []
+        self.error: Optional[str] = None
+
+    def _message(self, **content) -> dict:
+        return {'update_id': next(self._update_ids), 'message': {
+            'message_id': next(self._message_ids), 'date': int(time.time()),
+            'chat': self.chat, 'from': self.user, **content}}
+
+    def command(self, command: str) -> dict:
+        return self._message(text=command, entities=[
+            {'type': 'bot_command', 'offset': 0, 'length': len(command)}])
+
+    def text(self, text: str) -> dict:
+        return self._message(text=text)
+
+    def document(self, file_id: str, file_name: str) -> dict:
+        return self._message(document={
+            'file_id': file_id, 'file_unique_id': file_id, 'file_name': file_name})
+
+    def callback(self, data: str) -> dict:
+        return {'update_id': next(self._update_ids), 'callback_query': {
+            'id': str(next(self._update_ids)), 'from': self.user, 'chat_instance': '1',
+            'data': data, 'message': {
+                'message_id': next(self._message_ids), 'date': int(time.time()),
+                'chat': self.chat, 'text': '...'}}}
+
+    def flow(self) -> list[tuple[str, dict]]:
+        """Returns the steps of the flow, named after the state the user is in."""
+        return [
+            ('start', self.command('/start')),
+            ('SET_LANGUAGE', self.callback(self.lang)),
+            ('SET_TASKS', self.callback('ANALYSIS_TOOLS')),
+            ('ANALYSIS_TOOLS', self.callback('PROBLEM_TREE_ANALYSIS')),
+            ('PROBLEM_TREE_ANALYSIS', self.text(f"{PROBLEM} ({self.user['id']})")),
+            ('SET_TASKS', self.callback('CONCEPT_NOTE')),
+            ('SET_PAPER', self.callback('Yes')),
+            ('SET_DOCUMENT', self.document('profile', 'profile.docx')),
+            ('CONCEPT_NOTE', self.text(f"A water project for Nyala ({self.user['id']})")),
+        ]
+
+    async def run(self, delay: float = 0) -> None:
+        """Goes through the flow, stopping at the first step that times out."""
+        await asyncio.sleep(delay)
+        loop = asyncio.get_running_loop()
+        for state, data in self.flow():
+            if self.think:
+                await asyncio.sleep(random.uniform(0, self.think))
+            update: Update = Update.de_json(data, self.application.bot)
+            done: asyncio.Future = loop.create_future()
+            self.completed[update.update_id] = done
+            started: float = time.perf_counter()
+            await self.application.update_queue.put(update)
+            try:
+                await asyncio.wait_for(done, self.step_timeout)
+            except asyncio.TimeoutError:
+                self.error = f'{state} timed out'
+                return
+            finally:
+                self.completed.pop(update.update_id, None)
+            self.timings.append((state, time.perf_counter() - started))
+
+
+def _peak_rss() -> int:
+    """Returns the peak resident memory of the process in bytes."""
+    peak: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+async def run_load_test(options: argparse.Namespace) -> dict:
+    """Runs the virtual users against the application and returns the results.
+
+    Args:
+        options (argparse.Namespace): The options of the command line, see `parse_args`.
+
+    Returns:
+        dict: The configuration, throughput, step latencies by state and memory of the run.
+    """
+    random.seed(options.seed)
+    api: FakeBotAPI = await FakeBotAPI().start()
+    api.add_file('profile', render_docx(PROFILE, 'Profile'))
+
+    workdir: str = tempfile.mkdtemp(prefix='raed-loadtest-')
+    journal.path = os.path.join(workdir, 'journal.sqlite3')
+    journal.ledger.path = os.path.join(workdir, 'usage.sqlite3')
+    journal.workspaces.path = os.path.join(workdir, 'workspaces.sqlite3')
+    memory.manager.spill_dir = os.path.join(workdir, 'spill')
+    model = Gemini(backend=ReplayBackend(
+        options.cassette, options.time_scale, system_config) if options.cassette
+        else FakeGenerativeModel(options.model_latency, options.latency_sigma,
+                                 options.output_chars, options.size_sigma, seed=options.seed))
+
+    builder = (ApplicationBuilder().updater(None)
+               .base_url(api.base_url).base_file_url(api.base_file_url))
+    if options.concurrent_updates:
+        builder = builder.concurrent_updates(options.concurrent_updates)
+    application = build_application(builder, metrics_port=0, token=TOKEN)
+
+    completed: dict[int, asyncio.Future] = {}
+
+    async def processed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        done: Optional[asyncio.Future] = completed.get(update.update_id)
+        if done is not None and not done.done():
+            done.set_result(None)
+
+    # the last group, it runs once the conversation handled the update.
+    application.add_handler(TypeHandler(Update, processed), group=100)
+
+    users: list[VirtualUser] = [
+        VirtualUser(100000 + i, random.choice(('en', 'ar')), application, completed,
+                    options.think, options.step_timeout)
+        for i in range(options.users)
+    ]
+    user_data_peak: int = 0
+
+    async def sample_memory() -> None:
+        nonlocal user_data_peak
+        while True:
+            user_data_peak = max(user_data_peak, memory.manager.total)
+            await asyncio.sleep(0.1)
+
+    degraded: dict[tuple, float] = dict(overload_requests.values)
+    base._model = base._reduced_model = model
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    sampler: asyncio.Task = asyncio.create_task(sample_memory())
+    started: float = time.perf_counter()
+    try:
+        await asyncio.gather(*(
+            user.run(options.ramp * i / max(len(users), 1)) for i, user in enumerate(users)))
+        duration: float = time.perf_counter() - started
+    finally:
+        sampler.cancel()
+        await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+        await api.stop()
+        base._model = base._reduced_model = None
+
+    timings: dict[str, list[float]] = {}
+    for user in users:
+        for state, seconds in user.timings:
+            timings.setdefault(state, []).append(seconds)
+    steps: int = sum(len(user.timings) for user in users)
+    flows: int = sum(user.error is None for user in users)
+    errors: dict[str, int] = {}
+    for user in users:
+        if user.error:
+            errors[user.error] = errors.get(user.error, 0) + 1
+
+    return {
+        'config': {key: value for key, value in vars(options).items()
+                   if key not in ('output', 'baseline', 'tolerance')},
+        'completed': flows,
+        'failed': len(users) - flows,
+        'errors': errors,
+        'handler_errors': int(sum(sessions.handler_errors.values.values())),
+        'duration': round(duration, 3),
+        'throughput': {
+            'updates_per_second': round(steps / duration, 3),
+            'flows_per_second': round(flows / duration, 3),
+        },
+        'states': {state: percentiles(values) for state, values in timings.items()},
+        'model': {'calls': model._model.calls},
+        'degraded': {key[0]: int(value - degraded.get(key, 0))
+                     for key, value in overload_requests.values.items()},
+        'memory': {'rss_peak': _peak_rss(), 'user_data_peak': user_data_peak},
+    }
+
+
+def parse_args(args: list[str] = None) -> argparse.Namespace:
+    """Parses the options of the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=200, help='virtual users')
+    parser.add_argument('--ramp', type=float, default=10,
+                        help='seconds over which the users start')
+    parser.add_argument('--think', type=float, default=0,
+                        help='maximum seconds a user waits between two steps')
+    parser.add_argument('--model-latency', type=float, default=0.5,
+                        help='median seconds of a generation')
+    parser.add_argument('--latency-sigma', type=float, default=0.5,
+                        help='sigma of the log-normal generation latency')
+    parser.add_argument('--output-chars', type=int, default=3000,
+                        help='median characters of a generation')
+    parser.add_argument('--size-sigma', type=float, default=0.5,
+                        help='sigma of the log-normal generation size')
+    parser.add_argument('--cassette',
+                        help='replays the recorded generations instead of the fake model')
+    parser.add_argument('--time-scale', type=float, default=1,
+                        help='factor of the recorded timing of the cassette, 0 does not wait')
+    parser.add_argument('--concurrent-updates', type=int, default=0,
+                        help='updates processed concurrently, 0 keeps the setting of the app')
+    parser.add_argument('--step-timeout', type=float, default=300,
+                        help='seconds a step may take before the user gives up')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='file the JSON results are written to')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='relative regression allowed from the baseline')
+    return parser.parse_args(args)
+
+
+def main(args: list[str] = None) -> int:
+    """Runs the load test and reports its results."""
+    options: argparse.Namespace = parse_args(args)
+    logging.basicConfig(level=logging.WARNING)
+    results: dict = asyncio.run(run_load_test(options))
+    return report(results, options.output, options.baseline, options.tolerance)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,9 +11,18 @@ Constants:
     CONCEPT_NOTE (int): Identifier for concept note.
     FULL_PROPOSAL (int): Identifier for full proposal.
     SET_DOCUMENT (int): Identifier for upload document.
+    STATE_NAMES (dict[int, str]): The name of every state.
 """
 (
     SET_LANGUAGE, SET_TASKS,
     ANALYSIS_TOOLS, PROBLEM_TREE_ANALYSIS,
     SWOT_ANALYSIS, PESTEL_ANALYSIS,
     CONCEPT_NOTE, SET_DOCUMENT, SET_PAPER) = range(9)
+
+# names of the states, used in logs and metrics
+STATE_NAMES = {
+    SET_LANGUAGE: 'SET_LANGUAGE', SET_TASKS: 'SET_TASKS',
+    ANALYSIS_TOOLS: 'ANALYSIS_TOOLS', PROBLEM_TREE_ANALYSIS: 'PROBLEM_TREE_ANALYSIS',
+    SWOT_ANALYSIS: 'SWOT_ANALYSIS', PESTEL_ANALYSIS: 'PESTEL_ANALYSIS',
+    CONCEPT_NOTE: 'CONCEPT_NOTE', SET_DOCUMENT: 'SET_DOCUMENT', SET_PAPER: 'SET_PAPER',
+}
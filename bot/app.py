@@ -7,22 +7,36 @@
     The bot uses a conversation-based flow to guide
     users through various tasks.
 
+    Classes:
+        RaedApplication: The application, profiling the dispatch of updates.
+
     Functions:
+        build_application(builder, persistence, metrics_port, token): Builds the bot
+        application with its handlers and jobs.
+
         main(): Initializes the bot application, sets up handlers,
         and starts polling for messages.
+
 """
+import asyncio
 import logging
-import logging.handlers
+import signal
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     MessageHandler,
     filters,
-    ConversationHandler, CallbackQueryHandler
+    ConversationHandler, CallbackQueryHandler,
+    ContextTypes, TypeHandler,
+    BasePersistence
 )
+from telegram import Update
 
-import os
-from .config import BOT_KEY
+from .config import (
+    BOT_KEY, CONVERSATION_TIMEOUT, STATE_TIMEOUTS, SWEEP_INTERVAL, DRAIN_TIMEOUT,
+    BOT_API_URL, BOT_FILE_URL, METRICS_HOST, METRICS_PORT, ADMIN_IDS
+)
 from . import (SET_LANGUAGE, SET_TASKS,
                ANALYSIS_TOOLS, PROBLEM_TREE_ANALYSIS,
                SWOT_ANALYSIS, PESTEL_ANALYSIS,
@@ -39,84 +53,216 @@ from .states.tools.pestel_analysis import pestel_analysis_method
 
 from .states.papers_handler import generate_papers
 from .states.papers.concept_note_handler import concept_note
+from .states.papers.full_proposal_handler import expand_proposal
 from .states.documents_handler import handle_documents_upload
 
 from .states.fallbacks import cancel
+from .states.admin import profile_command, usage_command
+from .states.pager import page_callback
+from .states.workspace_handler import workspace_command
+from .states.voice_handler import accept_voice
+from .utils.catalog import catalog
+from .utils.workers import shutdown_pools
+from .utils.memory import UserData
+from .utils.journal import journal
+from .utils.ratelimit import OutboundLimiter
+from .utils.network import build_requests
+from .utils.metrics import Gauge, serve_metrics
+from .utils.watchdog import watchdog
+from .utils.profiling import profiler
+from .utils.logs import setup_logging
+from .utils.sessions import (
+    track_conversation, sweep, expire_conversation, guard_expired, state_name
+)
 
+logger = logging.getLogger(__name__)
 
-def main():
-    """Initializes and runs the bot application.
-    This function sets up the bot application using the ApplicationBuilder with the provided BOT_KEY.
-    It defines a ConversationHandler with various states and corresponding handlers for different
-    user interactions.
+update_queue_depth = Gauge(
+    'raed_update_queue_depth', 'Updates waiting to be processed by the application.')
+
+# the analysis and concept-note states are answered by text or by voice
+TEXT_OR_VOICE = (filters.TEXT & (~filters.COMMAND)) | filters.VOICE | filters.AUDIO
+
+# serves the metrics of this process, see `on_startup`
+metrics_server: asyncio.Server = None
+
+
+class RaedApplication(Application):
+    """The application, profiling the dispatch of updates when profiling is on.
+    """
+
+    async def process_update(self, update: object) -> None:
+        if not profiler.enabled or not isinstance(update, Update):
+            return await super().process_update(update)
+        user_data: dict = self.user_data.get(
+            update.effective_user.id) if update.effective_user else None
+        return await profiler.dispatch(
+            super().process_update(update), update.update_id,
+            state_name((user_data or {}).get('_state')))
+
+
+def stop_gracefully(application: Application) -> None:
+    """Stops accepting generation jobs and stops the application.
+
+    Running jobs may finish within `DRAIN_TIMEOUT` seconds, the others are
+    resumed on the next start.
+
+    Args:
+        application (Application): The bot application.
+    """
+    journal.close(DRAIN_TIMEOUT)
+    application.stop_running()
+
+
+async def on_startup(application: Application) -> None:
+    """Resumes the jobs left unfinished by the previous run, handles stop signals,
+    serves the metrics and watches the event loop for blocking calls.
+
+    Args:
+        application (Application): The bot application.
+    """
+    global metrics_server
+    watchdog.start()
+    update_queue_depth.track(application.update_queue.qsize)
+    port: int = application.bot_data.get('metrics_port')
+    if port:
+        metrics_server = await serve_metrics(METRICS_HOST, port)
+        logger.info("Serving metrics on %s:%s/metrics", METRICS_HOST, port)
+    journal.prune()
+    application.create_task(journal.resume(application.bot))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGABRT):
+        try:
+            loop.add_signal_handler(sig, stop_gracefully, application)
+        except NotImplementedError:
+            # not supported on Windows, stopping with Ctrl+C still works.
+            break
+
+
+async def on_shutdown(application: Application) -> None:
+    """Drains the running jobs and releases the worker pools once the application stops.
+
+    Args:
+        application (Application): The bot application.
     """
+    watchdog.stop()
+    await journal.drain()
+    # work still running after the drain deadline is left to finish in its thread,
+    # the jobs it belongs to are resumed on the next start.
+    shutdown_pools(wait=False)
+    if metrics_server is not None:
+        metrics_server.close()
+        await metrics_server.wait_closed()
+
 
-    application = ApplicationBuilder().token(BOT_KEY).build()
+def build_application(builder: ApplicationBuilder = None,
+                      persistence: BasePersistence = None,
+                      metrics_port: int = METRICS_PORT, token: str = None) -> Application:
+    """Builds the bot application with its handlers and jobs.
+
+    Args:
+        builder (ApplicationBuilder, optional): A builder to start from, e.g. without an updater.
+        persistence (BasePersistence, optional): Persists the conversations and user_data.
+        metrics_port (int, optional): The port the metrics are served on, 0 disables them.
+        token (str, optional): The token of the bot, `BOT_KEY` by default.
+
+    Returns:
+        Application: The bot application.
+    """
+    request, get_updates_request = build_requests()
+    builder = (
+        (builder or ApplicationBuilder())
+        .application_class(RaedApplication)
+        .token(token or BOT_KEY)
+        .request(request)
+        .get_updates_request(get_updates_request)
+        .context_types(ContextTypes(user_data=UserData))
+        .rate_limiter(OutboundLimiter())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    if BOT_API_URL:
+        builder = builder.base_url(BOT_API_URL)
+    if BOT_FILE_URL:
+        builder = builder.base_file_url(BOT_FILE_URL)
+    application = builder.build()
+    application.bot_data['metrics_port'] = metrics_port
     conversation = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
         states={
             SET_LANGUAGE: [CallbackQueryHandler(set_language)],
-            SET_TASKS: [CallbackQueryHandler(set_tasks)],
+            SET_TASKS: [
+                CallbackQueryHandler(
+                    expand_proposal, pattern='^EXPAND_PROPOSAL$'),
+                CallbackQueryHandler(set_tasks)
+            ],
             ANALYSIS_TOOLS: [CallbackQueryHandler(set_analysis_method)],
             PROBLEM_TREE_ANALYSIS: [MessageHandler(
-                filters.TEXT & (~filters.COMMAND),
-                problem_tree_method
+                TEXT_OR_VOICE,
+                accept_voice(problem_tree_method)
             )],
             SWOT_ANALYSIS: [MessageHandler(
-                            filters.TEXT & (~filters.COMMAND),
-                            swot_analysis_method
+                            TEXT_OR_VOICE,
+                            accept_voice(swot_analysis_method)
                             )],
             PESTEL_ANALYSIS: [MessageHandler(
-                filters.TEXT & (~filters.COMMAND),
-                pestel_analysis_method
+                TEXT_OR_VOICE,
+                accept_voice(pestel_analysis_method)
             )],
             SET_PAPER: [CallbackQueryHandler(
                 generate_papers
             )],
             CONCEPT_NOTE: [MessageHandler(
-                filters.TEXT & (~filters.COMMAND),
-                concept_note
+                TEXT_OR_VOICE,
+                accept_voice(concept_note)
             )],
             SET_DOCUMENT: [MessageHandler(
                 filters.Document.ALL & (~filters.COMMAND),
                 handle_documents_upload
             )],
+            ConversationHandler.TIMEOUT: [TypeHandler(
+                Update, expire_conversation
+            )],
             # END: [CallbackQueryHandler(end_conversation)]
         },
-        fallbacks=[CommandHandler('cancel', cancel)]
+        fallbacks=[CommandHandler('cancel', cancel)],
+        # idle users are expired per state by the sweeper, this is only a backstop.
+        conversation_timeout=max(
+            CONVERSATION_TIMEOUT, *STATE_TIMEOUTS.values()) + SWEEP_INTERVAL,
+        allow_reentry=True,
+        name='raed',
+        persistent=persistence is not None
     )
-    application.add_handler(conversation)
-    application.run_polling()
+    application.add_handler(CommandHandler(
+        'profile', profile_command, filters.User(ADMIN_IDS)), group=-2)
+    application.add_handler(CommandHandler(
+        'usage', usage_command, filters.User(ADMIN_IDS)), group=-2)
+    application.add_handler(CallbackQueryHandler(page_callback, pattern='^page:'), group=-2)
+    application.add_handler(CommandHandler('workspace', workspace_command), group=-2)
+    application.add_handler(TypeHandler(Update, guard_expired), group=-1)
+    application.add_handler(track_conversation(conversation))
+    application.job_queue.run_repeating(sweep, interval=SWEEP_INTERVAL)
+    return application
+
+
+def main():
+    """Initializes and runs the bot application.
+    This function sets up the bot application using the ApplicationBuilder with the provided BOT_KEY.
+    It defines a ConversationHandler with various states and corresponding handlers for different
+    user interactions.
+    """
+
+    for lang, keys in catalog.validate().items():
+        logger.warning(
+            "Locale '%s' is missing %s keys, falling back to '%s': %s",
+            lang, len(keys), catalog.default_language, ', '.join(sorted(keys)))
+
+    application = build_application()
+    application.run_polling(stop_signals=None)
 
 
 if __name__ == '__main__':
-    os.makedirs('logs', exist_ok=True)
-
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
-    # file handler for logs.
-    file_handler = logging.handlers.TimedRotatingFileHandler(
-        filename='logs/bot.log',
-        when='midnight',
-        interval=1,
-        backupCount=7,
-        encoding='utf-8'
-    )
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.INFO)
-
-    # stream (console) handler for logs.
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(formatter)
-    console_handler.setLevel(logging.INFO)
-
-    logging.basicConfig(
-        level=logging.INFO,
-        handlers=[
-            file_handler  # , console_handler # for test purposes
-        ]
-    )
-    # reduce httpx
-    logging.getLogger('httpx').setLevel(logging.WARNING)
+    setup_logging()
     main()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""Multi-process deployment of the bot behind a webhook.
+
+    A front process receives the webhook updates from Telegram, drops the ones it
+    already received (Telegram retries updates that were not acknowledged in time)
+    and routes every update to one of `WORKERS` worker processes by hashing the id
+    of its sender. All the updates of a user, in their private chat or in a group,
+    are handled by the same worker, in order, which owns their user_data and
+    conversations. Workers
+    that crash are restarted, and continue the conversations from the state shared
+    in Redis. The front serves its metrics on `METRICS_PORT` and every worker on
+    the following ports.
+
+    Every worker keeps the generation jobs in a journal of its own, e.g.
+    `journal-1.sqlite3`. When `WORKERS` is reduced, the journals of the workers that
+    no longer run are adopted by worker 0 on its start, which resumes and drains
+    their unfinished jobs with its own.
+
+    Run with `python -m bot.cluster`.
+
+    Functions:
+        sender_of(update) -> int: Returns the user an update comes from.
+
+        route(owner_id, workers) -> int: Returns the worker handling a user.
+
+        orphaned_journals(path, workers) -> list: Returns the journals of workers that no longer run.
+
+        run_worker(index, workers, updates): Runs a worker process.
+
+        main(): Sets the webhook, starts the workers and receives the updates.
+"""
+import asyncio
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import zlib
+from http import HTTPStatus
+
+from telegram import Bot, Update
+from telegram.ext import Application, ApplicationBuilder
+
+from .config import (
+    BOT_KEY, DRAIN_TIMEOUT, JOURNAL_PATH, SPILL_DIR, WORKERS,
+    WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, METRICS_HOST, METRICS_PORT
+)
+from .utils.http import Request, serve_http
+from .utils.metrics import Counter, serve_metrics
+from .utils.shared import SharedPersistence, get_store
+
+logger = logging.getLogger(__name__)
+
+# seconds an update id is remembered to drop retried updates
+UPDATE_TTL = 3600
+SUPERVISE_INTERVAL = 5
+
+routed_updates = Counter(
+    'raed_routed_updates_total', 'Webhook updates routed to a worker.', labels=('worker',))
+dropped_updates = Counter(
+    'raed_dropped_updates_total', 'Webhook updates dropped for being received twice.')
+worker_restarts = Counter(
+    'raed_worker_restarts_total', 'Worker processes restarted after they exited.')
+
+
+def sender_of(update: dict) -> int:
+    """Returns the user an update comes from.
+
+    Args:
+        update (dict): The update as sent by Telegram.
+
+    Returns:
+        int: The id of the user, or of the chat for updates without a sender
+        (e.g. channel posts), or the update id for anything else.
+    """
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        if 'from' in value:
+            return value['from']['id']
+        chat: dict = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+    return update.get('update_id', 0)
+
+
+def route(owner_id: int, workers: int) -> int:
+    """Returns the worker handling a user.
+
+    The hash is stable across processes and restarts, unlike `hash()`.
+
+    Args:
+        owner_id (int): The id of the user, or of the chat of updates without a sender.
+        workers (int): The number of workers.
+
+    Returns:
+        int: The index of the worker.
+    """
+    return zlib.crc32(str(owner_id).encode()) % workers
+
+
+def _worker_path(path: str, index: int) -> str:
+    """Returns a path of its own for a worker, e.g. `journal-1.sqlite3`."""
+    root, ext = os.path.splitext(path)
+    return f'{root}-{index}{ext}'
+
+
+def orphaned_journals(path: str, workers: int) -> list[str]:
+    """Returns the journals of workers that no longer run, e.g. after `WORKERS` was reduced.
+
+    Args:
+        path (str): The path of the journal, before the index of the worker is added.
+        workers (int): The number of workers.
+
+    Returns:
+        list[str]: The paths of the journals of the workers at or above `workers`.
+    """
+    root, ext = os.path.splitext(path)
+    orphaned: list[str] = []
+    for candidate in glob.glob(f'{glob.escape(root)}-*{glob.escape(ext)}'):
+        index: str = candidate[len(root) + 1:len(candidate) - len(ext)]
+        if index.isdigit() and int(index) >= workers:
+            orphaned.append(candidate)
+    return sorted(orphaned)
+
+
+def _feed(application: Application, loop: asyncio.AbstractEventLoop,
+          updates: multiprocessing.Queue) -> None:
+    """Moves the updates routed to the worker into the application, until told to stop."""
+    from .app import stop_gracefully
+
+    while (data := updates.get()) is not None:
+        update: Update = Update.de_json(json.loads(data), application.bot)
+        loop.call_soon_threadsafe(application.update_queue.put_nowait, update)
+    try:
+        loop.call_soon_threadsafe(stop_gracefully, application)
+    except RuntimeError:
+        # the worker already stopped on a signal.
+        pass
+
+
+def run_worker(index: int, workers: int, updates: multiprocessing.Queue) -> None:
+    """Runs a worker process.
+
+    Every worker has its own log file, journal and spill directory, and only
+    loads the shared state of the users routed to it. Worker 0 also adopts the
+    journals of the workers that no longer run.
+
+    Args:
+        index (int): The index of the worker.
+        workers (int): The number of workers.
+        updates (multiprocessing.Queue): The updates routed to the worker, as JSON.
+    """
+    from .app import build_application
+    from .utils.logs import setup_logging
+    from .utils.journal import journal
+    from .utils.memory import manager
+
+    setup_logging(f'logs/worker-{index}.log')
+    journal.path = _worker_path(JOURNAL_PATH, index)
+    if index == 0:
+        for path in orphaned_journals(JOURNAL_PATH, workers):
+            logger.info("Adopted %s unfinished jobs of %s", journal.adopt(path), path)
+    manager.spill_dir = os.path.join(SPILL_DIR, f'worker-{index}')
+
+    persistence = SharedPersistence(owns=lambda user_id: route(user_id, workers) == index)
+    application = build_application(
+        ApplicationBuilder().updater(None), persistence,
+        metrics_port=METRICS_PORT and METRICS_PORT + 1 + index)
+
+    # the same steps as `Application.run_polling`, with updates from the front.
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(application.initialize())
+        loop.run_until_complete(application.post_init(application))
+        loop.run_until_complete(application.start())
+        threading.Thread(target=_feed, args=(application, loop, updates), daemon=True).start()
+        logger.info("Worker %s of %s started", index, workers)
+        loop.run_forever()
+    finally:
+        if application.running:
+            loop.run_until_complete(application.stop())
+        loop.run_until_complete(application.shutdown())
+        loop.run_until_complete(application.post_shutdown(application))
+        loop.close()
+        logger.info("Worker %s stopped", index)
+
+
+class Front:
+    """Receives the webhook updates and routes them to the workers.
+    """
+
+    def __init__(self, workers: int = WORKERS, store=None) -> None:
+        """Initializes the front.
+
+        Args:
+            workers (int): The number of worker processes.
+            store (LocalStore | RedisStore, optional): Remembers the received update ids.
+        """
+        self.workers: int = workers
+        self.store = store if store is not None else get_store()
+        self.context = multiprocessing.get_context('spawn')
+        self.queues: list = [self.context.Queue() for _ in range(workers)]
+        self.processes: list = [None] * workers
+
+    def start_worker(self, index: int) -> None:
+        """Starts (or restarts) a worker process."""
+        self.processes[index] = self.context.Process(
+            target=run_worker, args=(index, self.workers, self.queues[index]),
+            name=f'raed-worker-{index}')
+        self.processes[index].start()
+
+    async def receive(self, request: Request) -> tuple[int, str, bytes]:
+        """Receives a webhook update and routes it to its worker.
+
+        Args:
+            request (Request): The webhook request.
+
+        Returns:
+            tuple[int, str, bytes]: The status, content type and body of the response.
+        """
+        if request.method != 'POST':
+            return HTTPStatus.NOT_FOUND, 'text/plain', b''
+        if WEBHOOK_SECRET and request.headers.get(
+                'x-telegram-bot-api-secret-token') != WEBHOOK_SECRET:
+            return HTTPStatus.FORBIDDEN, 'text/plain', b''
+        try:
+            update: dict = json.loads(request.body)
+            update_id: int = update['update_id']
+        except (ValueError, KeyError, TypeError):
+            return HTTPStatus.BAD_REQUEST, 'text/plain', b''
+
+        if await self.store.set(f'raed:update:{update_id}', b'1', ttl=UPDATE_TTL, nx=True):
+            worker: int = route(sender_of(update), self.workers)
+            self.queues[worker].put(request.body)
+            routed_updates.inc(worker=worker)
+        else:
+            dropped_updates.inc()
+            logger.info("Dropped update %s, it was already received", update_id)
+        return HTTPStatus.OK, 'text/plain', b''
+
+    async def supervise(self, stopping: asyncio.Event) -> None:
+        """Restarts the workers that stopped, until the front is stopping."""
+        while not stopping.is_set():
+            for index, process in enumerate(self.processes):
+                if process is None or process.exitcode is not None:
+                    if process is not None:
+                        worker_restarts.inc()
+                        logger.error(
+                            "Worker %s exited with %s, restarting it", index, process.exitcode)
+                    self.start_worker(index)
+            try:
+                await asyncio.wait_for(stopping.wait(), SUPERVISE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop_workers(self) -> None:
+        """Lets the workers drain their jobs and stops them."""
+        for queue in self.queues:
+            queue.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self.processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, DRAIN_TIMEOUT + 10)
+            if process.exitcode is None:
+                logger.warning("%s did not stop in time, killing it", process.name)
+                process.kill()
+
+    async def run(self) -> None:
+        """Sets the webhook, starts the workers and receives the updates until stopped."""
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stopping.set)
+
+        async with Bot(BOT_KEY) as bot:
+            await bot.set_webhook(
+                WEBHOOK_URL, secret_token=WEBHOOK_SECRET, allowed_updates=Update.ALL_TYPES)
+        server = await serve_http(self.receive, WEBHOOK_HOST, WEBHOOK_PORT)
+        metrics = await serve_metrics(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+        logger.info("Receiving updates on %s:%s for %s workers",
+                    WEBHOOK_HOST, WEBHOOK_PORT, self.workers)
+        try:
+            await self.supervise(stopping)
+        finally:
+            for listening in filter(None, (server, metrics)):
+                listening.close()
+                await listening.wait_closed()
+            await self.stop_workers()
+            await self.store.close()
+
+
+def main():
+    """Sets the webhook, starts the workers and receives the updates.
+    """
+    from .utils.logs import setup_logging
+
+    if not WEBHOOK_URL:
+        raise SystemExit("WEBHOOK_URL is required to run the bot as several processes")
+    setup_logging('logs/front.log')
+    asyncio.run(Front().run())
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,74 @@ Functions:
 Environment Variables:
     BOT_KEY: API key for the bot.
     GEMINI_KEY: API key for the Gemini model.
+    GEMINI_BACKEND: 'genai' (default) to call the Gemini API, 'record' to also record
+        its generations to GEMINI_CASSETTE, or 'replay' to serve the recorded ones.
+    GEMINI_CASSETTE: JSON lines file the generations are recorded to and replayed from.
+    GEMINI_TIME_SCALE: Factor of the recorded timing of a replay, 0 does not wait.
+    REDUCED_MODEL: Cheaper Gemini model generating the results while the model is overloaded.
+    REDUCED_OUTPUT_TOKENS: Output budget of the results generated while overloaded.
+    OVERLOAD_QUEUE: Generations waiting or running per generation worker from which
+        the model counts as overloaded.
+    OVERLOAD_ERROR_RATE: Share of failed generations from which the model counts as overloaded.
+    OVERLOAD_LATENCY: Median seconds of a generation from which the model counts as overloaded.
+    OVERLOAD_WINDOW: Seconds of recent generations the error rate and latency are measured on.
+    OVERLOAD_COOLDOWN: Seconds the load must stay lower before the degradation steps down.
+    RESPONSE_CACHE_SIZE: Results kept in the response cache served while overloaded.
+    RESPONSE_CACHE_TTL: Seconds a result stays in the response cache.
+    DEFAULT_LANGUAGE: Language used when a message is missing in the user's language.
+    MAX_DOCUMENT_CHARS: Characters of an uploaded document kept after its normalization,
+        0 keeps them all.
+    SUMMARY_CHARS: Characters of the summary sent first to low-bandwidth users.
+    PAGE_CHARS: Characters of every page of a result read in low-bandwidth mode.
+    EXPORT_WORKERS: Number of threads rendering exported documents.
+    EXPORT_TEMPLATE: Optional path of a .docx file used as template for exported documents.
+    COMPRESS_THRESHOLD: Size in bytes from which values in user_data are compressed.
+    USER_MEMORY_BUDGET: Bytes of user_data a single user may keep in memory.
+    TOTAL_MEMORY_BUDGET: Bytes of user_data all users together may keep in memory.
+    SPILL_DIR: Directory user_data values are spilled to when over budget.
+    CONVERSATION_TIMEOUT: Seconds a user may stay idle in a conversation state.
+    SET_DOCUMENT_TIMEOUT: Seconds a user may stay idle while uploading a document.
+    SET_TASKS_TIMEOUT: Seconds a user may stay idle while choosing a task.
+    SWEEP_INTERVAL: Seconds between two sweeps of idle conversations.
+    GENERATION_WORKERS: Number of threads waiting on the Gemini model.
+    VOICE_ENGINE: 'sphinx' (default) to transcribe the voice messages offline with
+        CMU Sphinx, or 'stub' to answer a fixed transcript, e.g. in tests.
+    VOICE_MAX_SECONDS: Longest voice message transcribed, in seconds.
+    VOICE_TIMEOUT: Seconds the conversion and transcription of a voice message may take.
+    TRANSCRIPTION_WORKERS: Number of threads converting and transcribing voice messages.
+    JOURNAL_PATH: Path of the SQLite journal of generation jobs.
+    DRAIN_TIMEOUT: Seconds running generations may take to finish on shutdown.
+    USAGE_PATH: Path of the SQLite ledger of the tokens used per user, organization and day.
+    USER_DAILY_TOKENS: Tokens a user may use per day (UTC), 0 for no quota.
+    ORG_DAILY_TOKENS: Tokens the users of an organization may use together per day, 0 for no quota.
+    WORKSPACE_PATH: Path of the SQLite store of the workspaces shared by teams.
+    WORKSPACE_VERSIONS: Versions of every shared document or result kept in a workspace.
+    REDIS_URL: Url of the Redis server sharing state between the bot processes.
+    PERSISTENCE_INTERVAL: Seconds between two writes of the shared state.
+    WORKERS: Number of worker processes handling updates in webhook mode.
+    WEBHOOK_URL: Public url Telegram sends the updates to in webhook mode.
+    WEBHOOK_SECRET: Secret token Telegram sends with every webhook update.
+    WEBHOOK_HOST: Address the webhook receiver listens on.
+    WEBHOOK_PORT: Port the webhook receiver listens on.
+    BOT_API_URL: Optional url of a local Bot API server, e.g. http://localhost:8081/bot.
+    BOT_FILE_URL: Optional url of the files of a local Bot API server.
+    API_POOL_SIZE: Connections used for API calls.
+    API_TIMEOUT: Seconds an API call may take to send or receive.
+    FILE_POOL_SIZE: Connections used for file downloads and uploads.
+    FILE_TIMEOUT: Seconds a file transfer may take to send or receive.
+    METRICS_HOST: Address the Prometheus metrics are served on.
+    METRICS_PORT: Port the metrics are served on, 0 disables them. In webhook mode
+        the front uses it and worker N uses METRICS_PORT + 1 + N.
+    LAG_THRESHOLD: Seconds of event loop lag from which the blocking stack is reported.
+    LAG_INTERVAL: Seconds between two measures of the event loop lag.
+    LAG_REPORT_INTERVAL: Seconds between two reports of the same blocking location.
+    ADMIN_IDS: Comma separated ids of the users allowed to use the admin commands.
+    PROFILE_RATE: Fraction of the updates profiled, 0 by default.
+    PROFILE_MATCH: Comma separated handlers or states whose updates are always profiled.
+    PROFILE_DIR: Directory the profiles of the updates are written to.
+    PROFILE_KEEP: Number of profiles kept in PROFILE_DIR.
+    LOG_QUEUE_SIZE: Log records waiting to be written, more are dropped.
+    LOG_SAMPLE_RATE: Fraction of the INFO and DEBUG log records written, 1 by default.
 
 Configuration:
     instruction: Tuple containing instructions for the Gemini model.
@@ -17,11 +85,125 @@ Configuration:
 from dotenv import load_dotenv
 import os
 
+from . import SET_DOCUMENT, SET_TASKS
+
 # load environment variables from .env file
 load_dotenv()
 
 BOT_KEY = os.getenv('API')
 GEMINI_KEY = os.getenv("GEMINI_KEY")
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_LANGUAGE", "en")
+
+# backend of the model, generations can be recorded and replayed offline
+GEMINI_BACKEND = os.getenv("GEMINI_BACKEND", "genai")
+GEMINI_CASSETTE = os.getenv("GEMINI_CASSETTE", "data/cassettes/gemini.jsonl")
+GEMINI_TIME_SCALE = float(os.getenv("GEMINI_TIME_SCALE", 1))
+
+# degradation when the model is overloaded: results from the cache first, then
+# from a cheaper model with a shorter output, then busy replies
+REDUCED_MODEL = os.getenv("REDUCED_MODEL", "gemini-1.5-flash-8b")
+REDUCED_OUTPUT_TOKENS = int(os.getenv("REDUCED_OUTPUT_TOKENS", 2048))
+OVERLOAD_QUEUE = float(os.getenv("OVERLOAD_QUEUE", 2))
+OVERLOAD_ERROR_RATE = float(os.getenv("OVERLOAD_ERROR_RATE", 0.3))
+OVERLOAD_LATENCY = float(os.getenv("OVERLOAD_LATENCY", 60))
+OVERLOAD_WINDOW = float(os.getenv("OVERLOAD_WINDOW", 120))
+OVERLOAD_COOLDOWN = float(os.getenv("OVERLOAD_COOLDOWN", 60))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 256))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 6 * 3600))
+
+# uploaded documents are cut to this many characters, they end up in the prompts
+MAX_DOCUMENT_CHARS = int(os.getenv("MAX_DOCUMENT_CHARS", 30000))
+
+# low-bandwidth mode, results are sent as a summary then page by page on demand
+SUMMARY_CHARS = int(os.getenv("SUMMARY_CHARS", 400))
+PAGE_CHARS = int(os.getenv("PAGE_CHARS", 1000))
+
+# size of the worker pools running blocking work off the event loop
+WORKER_POOLS = {
+    'default': 4,
+    'export': int(os.getenv("EXPORT_WORKERS", 2)),
+    'generation': int(os.getenv("GENERATION_WORKERS", 4)),
+    'transcription': int(os.getenv("TRANSCRIPTION_WORKERS", 2)),
+}
+EXPORT_TEMPLATE = os.getenv("EXPORT_TEMPLATE")
+
+# memory limits of user_data
+COMPRESS_THRESHOLD = int(os.getenv("COMPRESS_THRESHOLD", 4 * 1024))
+USER_MEMORY_BUDGET = int(os.getenv("USER_MEMORY_BUDGET", 256 * 1024))
+TOTAL_MEMORY_BUDGET = int(os.getenv("TOTAL_MEMORY_BUDGET", 256 * 1024 * 1024))
+SPILL_DIR = os.getenv("SPILL_DIR", "data/spill")
+
+# idle timeouts of the conversation, per state
+CONVERSATION_TIMEOUT = int(os.getenv("CONVERSATION_TIMEOUT", 15 * 60))
+STATE_TIMEOUTS = {
+    SET_DOCUMENT: int(os.getenv("SET_DOCUMENT_TIMEOUT", 60 * 60)),
+    SET_TASKS: int(os.getenv("SET_TASKS_TIMEOUT", 10 * 60)),
+}
+SWEEP_INTERVAL = int(os.getenv("SWEEP_INTERVAL", 60))
+
+# voice messages, transcribed off the event loop by a pluggable engine
+VOICE_ENGINE = os.getenv("VOICE_ENGINE", "sphinx")
+VOICE_MAX_SECONDS = int(os.getenv("VOICE_MAX_SECONDS", 120))
+VOICE_TIMEOUT = float(os.getenv("VOICE_TIMEOUT", 60))
+
+# journal of generation jobs, resumed after a restart
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", "data/journal.sqlite3")
+DRAIN_TIMEOUT = int(os.getenv("DRAIN_TIMEOUT", 30))
+
+# ledger of the tokens used, checked against the daily quotas before generating
+USAGE_PATH = os.getenv("USAGE_PATH", "data/usage.sqlite3")
+USER_DAILY_TOKENS = int(os.getenv("USER_DAILY_TOKENS", 0))
+ORG_DAILY_TOKENS = int(os.getenv("ORG_DAILY_TOKENS", 0))
+
+# workspaces sharing documents and results between the members of a team
+WORKSPACE_PATH = os.getenv("WORKSPACE_PATH", "data/workspaces.sqlite3")
+WORKSPACE_VERSIONS = int(os.getenv("WORKSPACE_VERSIONS", 10))
+
+# multi-process deployment behind a webhook
+REDIS_URL = os.getenv("REDIS_URL")
+PERSISTENCE_INTERVAL = int(os.getenv("PERSISTENCE_INTERVAL", 5))
+WORKERS = int(os.getenv("WORKERS", os.cpu_count() or 1))
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8443))
+
+# connections to the Bot API, every kind of traffic has its own pool
+BOT_API_URL = os.getenv("BOT_API_URL")
+BOT_FILE_URL = os.getenv("BOT_FILE_URL")
+NETWORK_POOLS = {
+    'updates': {'size': 1, 'timeout': 5},
+    'api': {
+        'size': int(os.getenv("API_POOL_SIZE", 16)),
+        'timeout': float(os.getenv("API_TIMEOUT", 10)),
+    },
+    'files': {
+        'size': int(os.getenv("FILE_POOL_SIZE", 4)),
+        'timeout': float(os.getenv("FILE_TIMEOUT", 120)),
+    },
+}
+
+# Prometheus metrics, served on /metrics
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9464))
+
+# watchdog of the event loop, reporting blocking calls
+LAG_THRESHOLD = float(os.getenv("LAG_THRESHOLD", 0.25))
+LAG_INTERVAL = float(os.getenv("LAG_INTERVAL", 0.1))
+LAG_REPORT_INTERVAL = float(os.getenv("LAG_REPORT_INTERVAL", 5 * 60))
+
+# users allowed to use the admin commands, e.g. /profile
+ADMIN_IDS = [int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()]
+
+# opt-in profiling of updates
+PROFILE_RATE = float(os.getenv("PROFILE_RATE", 0))
+PROFILE_MATCH = [m.strip() for m in os.getenv("PROFILE_MATCH", "").split(",") if m.strip()]
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+
+# logs are written as JSON lines by a background thread
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 1))
 
 # config gemini model
 system_config = (
@@ -47,7 +229,7 @@ system_config = (
     """,
     """Your Response:
     Should be in Arabi.
-    formatted in plain text only without any special characters or emojis.
+    formatted in plain text only without any special characters or emojis, except the markers and headings of the elements asked for.
     Dont't ask the user for additional information.
     """
 )
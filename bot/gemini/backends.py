@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""This module provides the backends the Gemini class generates with.
+
+A backend has the interface of `google.generativeai.GenerativeModel` used by
+`Gemini._generate`: `generate_content(prompt, stream)` returns a response that
+yields its chunks when iterated and has the `text` and `usage_metadata` of the
+whole generation.
+
+Besides the Gemini API, generations can be recorded to a cassette and replayed
+from it, so tests and benchmarks run offline and with the same responses every
+time. A cassette is a JSON lines file, one generation per line:
+
+    {"key": ..., "instruction": ..., "prompt": ..., "chunks": [...],
+     "offsets": [...], "latency": ..., "usage": {"prompt_token_count": ...,
+     "candidates_token_count": ...}, "recorded": ...}
+
+`offsets` are the seconds from the request to every chunk. The replay waits the
+recorded offsets multiplied by `time_scale`: 1 replays the recorded timing, 0.5
+twice as fast and 0 without waiting. A prompt missing from the cassette, e.g.
+after a prompt was changed, is answered with the recording of the closest prompt
+(the longest common prefix, i.e. the same operation) and its prompt tokens are
+estimated from the recorded tokens per character, unless the replay is strict.
+
+Classes:
+    CassetteMiss: Raised when a strict replay has no recording of a prompt.
+    CassetteResponse: A recorded response, streamed with its recorded timing.
+    RecordingBackend: Records the generations of another backend to a cassette.
+    ReplayBackend: Serves the generations of a cassette.
+
+Functions:
+    cassette_key(prompt, instruction) -> str:
+        Returns the key of a prompt in a cassette.
+    genai_backend(instruction, model_name, max_output_tokens) -> GenerativeModel:
+        Returns a model of the Gemini API.
+    make_backend(instruction, kind, cassette, time_scale, model_name, max_output_tokens) -> Any:
+        Returns the backend configured by `GEMINI_BACKEND`.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from logging import getLogger
+from types import SimpleNamespace
+from typing import Any, Iterator, Optional
+
+from ..config import GEMINI_BACKEND, GEMINI_CASSETTE, GEMINI_KEY, GEMINI_TIME_SCALE
+
+logger = getLogger(__name__)
+
+MODEL_NAME: str = "gemini-1.5-flash"
+
+
+def cassette_key(prompt: str, instruction: Optional[str] = None) -> str:
+    """Returns the key of a prompt in a cassette."""
+    return hashlib.sha256(f"{instruction or ''}\0{prompt}".encode()).hexdigest()
+
+
+def genai_backend(instruction: Optional[str] = None, model_name: str = MODEL_NAME,
+                  max_output_tokens: Optional[int] = None) -> Any:
+    """Returns a model of the Gemini API.
+
+    Args:
+        instruction (str, optional): System instruction for the generative model.
+        model_name (str): The Gemini model.
+        max_output_tokens (int, optional): The output budget of every generation.
+
+    Returns:
+        GenerativeModel: The model.
+    """
+    import google.generativeai as genai
+
+    genai.configure(api_key=GEMINI_KEY)
+    generation_config: dict = {'max_output_tokens': max_output_tokens} if max_output_tokens else None
+    return genai.GenerativeModel(
+        model_name, system_instruction=instruction, generation_config=generation_config)
+
+
+class CassetteMiss(KeyError):
+    """Raised when a strict replay has no recording of a prompt.
+    """
+
+
+class CassetteResponse:
+    """A recorded response, streamed with its recorded timing.
+    """
+
+    def __init__(self, recording: dict, time_scale: float = 1.0,
+                 prompt_tokens: Optional[int] = None) -> None:
+        """Initializes the response.
+
+        Args:
+            recording (dict): The generation recorded in the cassette.
+            time_scale (float): The factor of the recorded timing, 0 does not wait.
+            prompt_tokens (int, optional): The prompt tokens reported instead of the recorded ones.
+        """
+        self.recording: dict = recording
+        self.time_scale: float = time_scale
+        self.text: str = ''.join(recording['chunks'])
+        usage: Optional[dict] = recording.get('usage')
+        self.usage_metadata = SimpleNamespace(**{
+            **usage,
+            'prompt_token_count': (usage['prompt_token_count'] if prompt_tokens is None
+                                   else prompt_tokens),
+        }) if usage else None
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        started: float = time.perf_counter()
+        for chunk, offset in zip(self.recording['chunks'], self.recording['offsets']):
+            delay: float = offset * self.time_scale - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            yield SimpleNamespace(text=chunk)
+
+    def wait(self) -> None:
+        """Waits for the whole response, as a call without streaming does."""
+        delay: float = self.recording['latency'] * self.time_scale
+        if delay > 0:
+            time.sleep(delay)
+
+
+class _RecordedStream:
+    """Streams the response of a backend and records it once it was read."""
+
+    def __init__(self, response: Any, started: float, on_done) -> None:
+        self._response = response
+        self._started: float = started
+        self._on_done = on_done
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    def __iter__(self) -> Iterator[Any]:
+        chunks: list[str] = []
+        offsets: list[float] = []
+        for chunk in self._response:
+            chunks.append(getattr(chunk, 'text', '') or '')
+            offsets.append(time.perf_counter() - self._started)
+            yield chunk
+        self._on_done(self._response, chunks, offsets)
+
+
+class RecordingBackend:
+    """Records the generations of another backend to a cassette.
+
+    Only the generations that succeed and are read to their end are recorded.
+    """
+
+    def __init__(self, backend: Any, path: str = GEMINI_CASSETTE,
+                 instruction: Optional[str] = None) -> None:
+        """Initializes the backend.
+
+        Args:
+            backend (Any): The backend generating, e.g. the Gemini API.
+            path (str): The cassette the generations are appended to.
+            instruction (str, optional): The system instruction of the backend.
+        """
+        self.backend = backend
+        self.path: str = path
+        self.instruction: Optional[str] = instruction
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        started: float = time.perf_counter()
+        response = self.backend.generate_content(prompt, stream=stream)
+
+        def record(result: Any, chunks: list[str], offsets: list[float]) -> None:
+            self._append(prompt, result, chunks, offsets, time.perf_counter() - started)
+
+        if stream:
+            return _RecordedStream(response, started, record)
+        record(response, [response.text], [time.perf_counter() - started])
+        return response
+
+    def _append(self, prompt: str, response: Any, chunks: list[str],
+                offsets: list[float], latency: float) -> None:
+        """Appends a generation to the cassette."""
+        usage = getattr(response, 'usage_metadata', None)
+        recording: dict = {
+            'key': cassette_key(prompt, self.instruction),
+            'instruction': self.instruction,
+            'prompt': prompt,
+            'chunks': chunks,
+            'offsets': [round(offset, 4) for offset in offsets],
+            'latency': round(latency, 4),
+            'usage': {
+                'prompt_token_count': usage.prompt_token_count,
+                'candidates_token_count': usage.candidates_token_count,
+            } if usage is not None else None,
+            'recorded': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        line: str = json.dumps(recording, ensure_ascii=False)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as cassette:
+                cassette.write(line + '\n')
+        logger.info("Recorded a generation of %.2fs to %s", latency, self.path)
+
+
+class ReplayBackend:
+    """Serves the generations of a cassette.
+
+    Prompts recorded several times are answered with their recordings in turn.
+    """
+
+    def __init__(self, path: str = GEMINI_CASSETTE, time_scale: float = GEMINI_TIME_SCALE,
+                 instruction: Optional[str] = None, strict: bool = False) -> None:
+        """Initializes the backend.
+
+        Args:
+            path (str): The cassette.
+            time_scale (float): The factor of the recorded timing, 0 does not wait.
+            instruction (str, optional): The system instruction the prompts were recorded with.
+            strict (bool): Whether a prompt missing from the cassette raises `CassetteMiss`.
+        """
+        self.path: str = path
+        self.time_scale: float = time_scale
+        self.instruction: Optional[str] = instruction
+        self.strict: bool = strict
+        self.recordings: dict[str, list[dict]] = {}
+        self.calls: int = 0
+        self.misses: int = 0
+        self._served: dict[str, int] = {}
+        self._lock = threading.Lock()
+        with open(path, encoding='utf-8') as cassette:
+            for line in cassette:
+                if line.strip():
+                    recording: dict = json.loads(line)
+                    self.recordings.setdefault(recording['key'], []).append(recording)
+
+    def _closest(self, prompt: str) -> str:
+        """Returns the key of the recorded prompt sharing the longest prefix with the prompt."""
+        return max(self.recordings, key=lambda key: len(os.path.commonprefix(
+            (prompt, self.recordings[key][0]['prompt']))))
+
+    def generate_content(self, prompt: str, stream: bool = False) -> CassetteResponse:
+        key: str = cassette_key(prompt, self.instruction)
+        prompt_tokens: Optional[int] = None
+        with self._lock:
+            self.calls += 1
+            if key not in self.recordings:
+                self.misses += 1
+                if self.strict or not self.recordings:
+                    raise CassetteMiss(f"No recording of the prompt {key[:12]} in {self.path}")
+                key = self._closest(prompt)
+            served: int = self._served.get(key, 0)
+            self._served[key] = served + 1
+            recordings: list[dict] = self.recordings[key]
+            recording: dict = recordings[served % len(recordings)]
+
+        if recording['prompt'] != prompt and recording.get('usage'):
+            # tokens per character of the recorded prompt, applied to the new one
+            prompt_tokens = round(len(prompt) * recording['usage']['prompt_token_count']
+                                  / max(len(recording['prompt']), 1))
+        response = CassetteResponse(recording, self.time_scale, prompt_tokens)
+        if not stream:
+            response.wait()
+        return response
+
+
+def make_backend(instruction: Optional[str] = None, kind: str = GEMINI_BACKEND,
+                 cassette: str = GEMINI_CASSETTE,
+                 time_scale: float = GEMINI_TIME_SCALE, model_name: str = MODEL_NAME,
+                 max_output_tokens: Optional[int] = None) -> Any:
+    """Returns the backend configured by `GEMINI_BACKEND`.
+
+    Args:
+        instruction (str, optional): System instruction for the generative model.
+        kind (str): 'genai' for the Gemini API, 'record' to record its generations
+            or 'replay' to serve the recorded ones.
+        cassette (str): The cassette recorded to or replayed from.
+        time_scale (float): The factor of the recorded timing of a replay.
+        model_name (str): The Gemini model, not used by a replay.
+        max_output_tokens (int, optional): The output budget of every generation, not
+            used by a replay.
+
+    Returns:
+        Any: The backend.
+    """
+    if kind == 'replay':
+        logger.info("Replaying the generations of %s", cassette)
+        return ReplayBackend(cassette, time_scale, instruction)
+    if kind == 'record':
+        logger.info("Recording the generations to %s", cassette)
+        return RecordingBackend(
+            genai_backend(instruction, model_name, max_output_tokens), cassette, instruction)
+    if kind != 'genai':
+        raise ValueError(f"Unknown Gemini backend: {kind}")
+    return genai_backend(instruction, model_name, max_output_tokens)
@@ -1,30 +1,96 @@
 #!/usr/bin/env python3
 """This module provides the Gemini class for interacting with the Gemini generative AI model.
+
+The model is called through a backend, see `bot/gemini/backends.py`: the Gemini
+API, or a cassette of recorded generations replayed offline.
+
+Every model call is measured: its duration, the time to its first streamed chunk and
+the prompt and output tokens reported in its `usage_metadata`. The tokens are also
+counted for the usage ledger of the user the call is made for.
+
+While the model is overloaded, results are generated by a reduced client: a
+cheaper model (`REDUCED_MODEL`), a shorter output budget (`REDUCED_OUTPUT_TOKENS`)
+and an instruction to keep the response brief.
+
+Functions:
+    get_model() -> Gemini:
+        Returns the shared Gemini client, creating it on first use.
+
+    get_reduced_model() -> Gemini:
+        Returns the shared reduced Gemini client, creating it on first use.
 """
-import google.generativeai as genai
+import time
 from logging import getLogger
-from ..config import GEMINI_KEY
-from ..config import system_config
+from typing import Any
+from ..config import REDUCED_MODEL, REDUCED_OUTPUT_TOKENS, system_config
+from ..utils.artifacts import ArtifactStore, section_marker, split_sections, stitch_sections
+from ..utils.metrics import Counter, Histogram
+from ..utils.usage import count_tokens
+from .backends import MODEL_NAME, make_backend
 
 logger = getLogger(__name__)
 
+model_seconds = Histogram(
+    'raed_model_seconds', 'Duration of the calls to the model.', labels=('operation',))
+first_token_seconds = Histogram(
+    'raed_model_first_token_seconds', 'Seconds until the model streamed its first chunk.',
+    labels=('operation',))
+model_tokens = Counter(
+    'raed_model_tokens_total', 'Tokens of the prompts and outputs of the model.',
+    labels=('operation', 'kind'))
+model_errors = Counter(
+    'raed_model_errors_total', 'Calls to the model that failed.', labels=('operation',))
+split_failures = Counter(
+    'raed_paper_split_failures_total',
+    'Generated papers that could not be split into their sections, so none were stored.',
+    labels=('operation',))
+
+# appended to the system instruction of the reduced client, about 0.6 words per token
+REDUCED_INSTRUCTION: str = (
+    "The service is under heavy load: keep your response brief, at most "
+    f"{int(REDUCED_OUTPUT_TOKENS * 0.6)} words, and cover every requested element in short.")
+
+CONCEPT_NOTE_SECTIONS: dict[str, str] = {
+    "Introduction (Context)": "Provide background and context about the project.",
+    "The Problem": "Describe the specific problem that needs to be addressed.",
+    "General Goal": "State the overall goal of the project.",
+    "Objectives/Goals": "List the specific objectives that support the general goal.",
+    "Target Audience": "Identify the primary beneficiaries and stakeholders of the project.",
+    "Expected Outcome": "Detail the anticipated results and impact of the project.",
+}
+
+FULL_PROPOSAL_SECTIONS: dict[str, str] = {
+    "Introduction (Context)": CONCEPT_NOTE_SECTIONS["Introduction (Context)"],
+    "Project Importance": "Explain why the project is important and its relevance.",
+    "The Problem": CONCEPT_NOTE_SECTIONS["The Problem"],
+    "General Goal": CONCEPT_NOTE_SECTIONS["General Goal"],
+    "Objectives/Goals": CONCEPT_NOTE_SECTIONS["Objectives/Goals"],
+    "Target Audience": CONCEPT_NOTE_SECTIONS["Target Audience"],
+    "Activities": "Outline the activities that will be implemented to reach the objectives.",
+    "Expected Outcome": CONCEPT_NOTE_SECTIONS["Expected Outcome"],
+    "Partnerships": "Explain any partnerships or collaborations involved.",
+    "Sustainability": "Outline how the project will be sustained over time.",
+}
+
 
 class Gemini:
     """A class to configure and interact with the Gemini generative AI model.
     """
 
-    def __init__(self, **kwargs: dict) -> None:
+    def __init__(self, backend: Any = None, **kwargs: dict) -> None:
         """Initializes the Gemini class with the specified configuration.
 
         Args:
+            backend(Any, optional): The backend generating, the one configured by
+                `GEMINI_BACKEND` by default.
             **kwargs(dict): Optional keyword arguments for model configuration.
             - instruction(str, optional): System instruction for the generative model.
+            - model_name(str, optional): The Gemini model.
+            - max_output_tokens(int, optional): The output budget of every generation.
         """
-        genai.configure(api_key=GEMINI_KEY)
-        self._model = genai.GenerativeModel(
-            "gemini-1.5-flash",
-            system_instruction=kwargs.get("instruction", None),
-        )
+        self._model = backend or make_backend(
+            kwargs.get("instruction", None), model_name=kwargs.get("model_name", MODEL_NAME),
+            max_output_tokens=kwargs.get("max_output_tokens", None))
 
     def problem_tree_analysis(self, user_input: str) -> str:
         """Analyzes the user's described issue using the Problem Tree method. Identifies the core problem,
@@ -43,12 +109,7 @@ class Gemini:
             "Recommendations: [Actionable steps tailored to Sudanese civil society’s capacity]."
             f"Issue: `{user_input}`"
         ))
-        try:
-            response = self._model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            return None
+        return self._generate(prompt, 'problem_tree_analysis')
 
     def swot_analysis(self, user_input: str) -> str:
         """Conducts a SWOT analysis on the user's input. Identifies strengths, weaknesses, opportunities,
@@ -68,12 +129,7 @@ class Gemini:
                 "Threats: Government crackdowns, misinformation, shrinking civic space. Highlight Sudan-specific factors (e.g., how currency inflation weakens budgets, or how youth-led protests create opportunities). Propose ways to leverage strengths against threats (e.g., using community radio to counter internet shutdowns). Ask for details if the input lacks focus."
             )
         )
-        try:
-            response = self._model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            return None
+        return self._generate(prompt, 'swot_analysis')
 
     def pestel_analysis(self, user_input: str) -> str:
         """Analyzes the user's challenge through a PESTEL lens, focusing on Sudan’s context.
@@ -96,74 +152,191 @@ class Gemini:
                 f"here is the user's input: ``{user_input}``"
             )
         )
-        try:
-            response = self._model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            return None
+        return self._generate(prompt, 'pestel_analysis')
 
-    def generate_concept_note(self, user_input: str, profile: str) -> str:
+    def generate_concept_note(self, user_input: str, profile: str,
+                              store: ArtifactStore = None) -> str:
         """Generates a concept note based on the user's input and profile data.
 
         Args:
             user_input(str): The user's input for the concept note.
             profile(str): The user's profile data.
+            store(ArtifactStore, optional): The user's artifact store, used to reuse
+                previously generated sections.
         Returns:
             str: The generated concept note.
         """
-        prompt = ''.join(
-            (
-                "Generate a concept note based on the user’s input and profile data. Include the following elements:"
-                "<b>Introduction (Context):</b> Provide background and context about the project."
-                "<b>The Problem:</b> Describe the specific problem that needs to be addressed."
-                "<b>General Goal:</b> State the overall goal of the project."
-                "<b>Objectives/Goals:</b> List the specific objectives that support the general goal."
-                "<b>Target Audience:</b> Identify the primary beneficiaries and stakeholders of the project."
-                "<b>Expected Outcome:</b> Detail the anticipated results and impact of the project."
-                f"User's input: ``{user_input}``"
-                f"User's profile: ``{profile}``"
-            )
+        return self._generate_paper(
+            "Generate a concept note based on the user’s input and profile data. Include the following elements:",
+            CONCEPT_NOTE_SECTIONS, user_input, profile, store, 'concept_note'
         )
-        try:
-            response = self._model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            return None
 
-    def generate_full_proposal(self, user_input: str, profile: str) -> str:
+    def generate_full_proposal(self, user_input: str, profile: str,
+                               store: ArtifactStore = None) -> str:
         """Generates a full proposal based on the user's input and profile data.
 
         Args:
             user_input(str): The user's input for the concept note.
             profile(str): The user's profile data.
+            store(ArtifactStore, optional): The user's artifact store, used to reuse
+                sections already generated for a concept note.
         Returns:
             str: The generated proposal.
         """
-        prompt = ''.join(
-            (
-                 "Generate a full proposal based on the user’s input and profile data. Include the following elements:"
-                "<b>Introduction (Context):</b> Provide background and context about the project."
-                "<b>Project Importance:</b> Explain why the project is important and its relevance."
-                 "<b>The Problem:</b> Describe the specific problem that needs to be addressed."
-                "<b>General Goal:</b> State the overall goal of the project."
-                "<b>Objectives/Goals:</b> List the specific objectives that support the general goal."
-                "<b>Target Audience:</b> Identify the primary beneficiaries and stakeholders of the project."
-                "<b>Activities:</b> Outline the activities that will be implemented to reach the objectives."
-                "<b>Expected Outcome:</b> Detail the anticipated results and impact of the project."
-                "<b>Partnerships:</b> Explain any partnerships or collaborations involved."
-                "<b>Sustainability:</b> Outline how the project will be sustained over time."
-                f"User's input: ``{user_input}``"
-                f"User's profile: ``{profile}``"
-            )
+        return self._generate_paper(
+            "Generate a full proposal based on the user’s input and profile data. Include the following elements:",
+            FULL_PROPOSAL_SECTIONS, user_input, profile, store, 'full_proposal'
         )
+
+    def _generate_paper(self, instruction: str, sections: dict[str, str],
+                        user_input: str, profile: str,
+                        store: ArtifactStore = None, operation: str = 'paper') -> str:
+        """Generates a paper section by section, reusing the stored sections whose
+        inputs did not change and generating only the remaining ones.
+
+        Args:
+            instruction(str): The opening instruction of the prompt.
+            sections(dict[str, str]): The description of each section by heading.
+            user_input(str): The user's input for the paper.
+            profile(str): The user's profile data.
+            store(ArtifactStore, optional): The user's artifact store.
+            operation(str, optional): The name of the call in the metrics.
+        Returns:
+            str: The generated paper.
+        """
+        headings: list[str] = list(sections)
+        if store is None:
+            return self._generate(
+                self._paper_prompt(instruction, sections, user_input, profile), operation)
+
+        fingerprints: dict[str, str] = {
+            heading: ArtifactStore.fingerprint(
+                heading, description, user_input, profile)
+            for heading, description in sections.items()
+        }
+        reused: dict[str, str] = store.lookup(fingerprints)
+        missing: dict[str, str] = {
+            heading: description for heading, description in sections.items()
+            if heading not in reused
+        }
+        if not missing:
+            logger.info("All %s sections reused from the artifact store", len(headings))
+            return stitch_sections(reused, headings)
+
+        response = self._generate(self._paper_prompt(
+            instruction, missing, user_input, profile, reused), operation)
+        if response is None:
+            return None
+
+        generated: dict[str, str] = split_sections(response, list(missing))
+        if len(generated) != len(missing):
+            split_failures.inc(operation=operation)
+            logger.warning("Generated paper could not be split into its sections, found %s of %s",
+                           len(generated), len(missing))
+            return '\n\n'.join(filter(None, (stitch_sections(reused, headings), response)))
+
+        store.save(generated, fingerprints)
+        logger.info(
+            "Generated %s sections, reused %s from the artifact store",
+            len(generated), len(reused))
+        return stitch_sections({**reused, **generated}, headings)
+
+    @staticmethod
+    def _paper_prompt(instruction: str, sections: dict[str, str],
+                      user_input: str, profile: str,
+                      existing: dict[str, str] = None) -> str:
+        """Builds the prompt for the given paper sections.
+
+        Args:
+            instruction(str): The opening instruction of the prompt.
+            sections(dict[str, str]): The description of each section to generate.
+            user_input(str): The user's input for the paper.
+            profile(str): The user's profile data.
+            existing(dict[str, str], optional): Sections already written for the paper.
+        Returns:
+            str: The prompt.
+        """
+        parts: list[str] = [instruction]
+        parts.extend(
+            f"{section_marker(index)} <b>{heading}:</b> {description}"
+            for index, (heading, description) in enumerate(sections.items(), 1)
+        )
+        parts.append(
+            "Start every element on a new line with its marker exactly as written above, "
+            "e.g. [[1]], followed by its heading.")
+        if existing:
+            parts.append(
+                "The following elements are already written, keep the new elements consistent with them and do not repeat them:"
+                f"``{stitch_sections(existing, list(existing))}``"
+            )
+        parts.append(f"User's input: ``{user_input}``")
+        parts.append(f"User's profile: ``{profile}``")
+        return ''.join(parts)
+
+    def _generate(self, prompt: str, operation: str = 'generate') -> str:
+        """Sends the prompt to the generative model.
+
+        The response is streamed to measure the time to its first chunk.
+
+        Args:
+            prompt(str): The prompt.
+            operation(str, optional): The name of the call in the metrics.
+        Returns:
+            str: The generated text, or None if the generation failed.
+        """
+        started: float = time.perf_counter()
         try:
-            response = self._model.generate_content(prompt)
-            return response.text
+            response = self._model.generate_content(prompt, stream=True)
+            for index, _ in enumerate(response):
+                if index == 0:
+                    first_token_seconds.observe(
+                        time.perf_counter() - started, operation=operation)
+            text: str = response.text
         except Exception as e:
-            logger.error(f"Error: {e}")
+            model_errors.inc(operation=operation)
+            logger.error("Error: %s", e)
             return None
+        finally:
+            model_seconds.observe(time.perf_counter() - started, operation=operation)
+
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            model_tokens.inc(usage.prompt_token_count, operation=operation, kind='prompt')
+            model_tokens.inc(usage.candidates_token_count, operation=operation, kind='output')
+            count_tokens(usage.prompt_token_count, usage.candidates_token_count)
+        return text
+
+
+_model: Gemini = None
+
 
+def get_model() -> Gemini:
+    """Returns the shared Gemini client, creating it on first use.
 
-Model = Gemini(instruction=system_config)
+    The client (and the `google.generativeai` package) is only loaded when the
+    first analysis or paper is generated, which keeps startup fast.
+
+    Returns:
+        Gemini: The shared Gemini client.
+    """
+    global _model
+    if _model is None:
+        _model = Gemini(instruction=system_config)
+    return _model
+
+
+_reduced_model: Gemini = None
+
+
+def get_reduced_model() -> Gemini:
+    """Returns the shared reduced Gemini client, creating it on first use.
+
+    Returns:
+        Gemini: The client generating while the model is overloaded.
+    """
+    global _reduced_model
+    if _reduced_model is None:
+        _reduced_model = Gemini(
+            instruction=(*system_config, REDUCED_INSTRUCTION), model_name=REDUCED_MODEL,
+            max_output_tokens=REDUCED_OUTPUT_TOKENS)
+    return _reduced_model
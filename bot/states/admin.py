@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""This module provides the admin commands of the bot, outside of the conversation.
+
+Functions:
+    profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        Shows or changes which updates are profiled.
+
+    usage_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        Shows the tokens used per user and organization, or assigns users to organizations.
+"""
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from logging import getLogger
+from ..utils.profiling import profiler
+from ..utils.usage import ledger
+
+logger = getLogger(__name__)
+
+PROFILE_USAGE = (
+    "/profile - show what is profiled\n"
+    "/profile 0.05 - profile 5% of the updates\n"
+    "/profile concept_note SET_DOCUMENT - profile the updates of these handlers or states\n"
+    "/profile off - stop profiling"
+)
+
+USAGE_USAGE = (
+    "/usage - show today's usage\n"
+    "/usage 7 - show the usage of the last 7 days\n"
+    "/usage user 12345 [7] - show the usage of a user\n"
+    "/usage org 12345 unicef - assign a user to an organization, '-' for none"
+)
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Shows or changes which updates are profiled.
+
+    The command is only handled for `ADMIN_IDS` and does not reach the conversation.
+
+    Args:
+        update (Update): The update object that contains the command.
+        context (ContextTypes.DEFAULT_TYPE): The context object, `context.args` holds the
+            rate, the handlers or states, or `off`.
+    Raises:
+        ApplicationHandlerStop: Always, the command is not passed to the conversation.
+    """
+    args: list[str] = context.args or []
+    if args == ['off']:
+        profiler.configure()
+    elif args:
+        try:
+            profiler.configure(rate=float(args[0]), match=args[1:])
+        except ValueError:
+            profiler.configure(rate=profiler.rate, match=args)
+        logger.info("User %s changed the profiling", update.effective_user.id)
+
+    status: str = (
+        f"Profiling {profiler.rate:.1%} of the updates and the updates of "
+        f"{', '.join(sorted(profiler.match)) or 'no handler'}.\n"
+        f"Profiles are written to {profiler.directory}."
+    ) if profiler.enabled else "Profiling is off."
+    await update.message.reply_text(f"{status}\n\n{PROFILE_USAGE}")
+    raise ApplicationHandlerStop
+
+
+def _usage_line(name: str, row: dict) -> str:
+    """Formats the usage of a user, organization or day on one line."""
+    return (f"{name}: {row['tokens'] or 0:,} tokens ({row['prompt_tokens'] or 0:,} prompt, "
+            f"{row['output_tokens'] or 0:,} output), {row['calls'] or 0} calls, "
+            f"{row['cached'] or 0} cached, {row['seconds'] or 0:.0f}s")
+
+
+async def usage_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Shows the tokens used per user and organization, or assigns users to organizations.
+
+    The command is only handled for `ADMIN_IDS` and does not reach the conversation.
+
+    Args:
+        update (Update): The update object that contains the command.
+        context (ContextTypes.DEFAULT_TYPE): The context object, `context.args` holds the
+            days, `user <id> [days]` or `org <id> <organization>`.
+    Raises:
+        ApplicationHandlerStop: Always, the command is not passed to the conversation.
+    """
+    args: list[str] = context.args or []
+    try:
+        if args[:1] == ['org'] and len(args) == 3:
+            org: str = '' if args[2] == '-' else args[2]
+            ledger.set_org(int(args[1]), org)
+            logger.info("User %s assigned user %s to organization %r",
+                        update.effective_user.id, args[1], org)
+            text: str = f"User {args[1]} now belongs to {org or 'no organization'}."
+        elif args[:1] == ['user'] and len(args) in (2, 3):
+            days: int = int(args[2]) if len(args) == 3 else 7
+            report: dict = ledger.report(days, user_id=int(args[1]))
+            text = '\n'.join([
+                f"Usage of user {args[1]} ({ledger.org_of(int(args[1])) or 'no organization'}) "
+                f"over {days} days",
+                _usage_line('Total', report['totals']), '',
+                *(_usage_line(row['day'], row) for row in report['days']), '',
+                *(_usage_line(row['kind'], row) for row in report['kinds'])])
+        elif len(args) <= 1:
+            days = int(args[0]) if args else 1
+            report = ledger.report(days)
+            text = '\n'.join([
+                f"Usage over {days} day{'s' if days > 1 else ''} (UTC)",
+                _usage_line('Total', report['totals']), '', 'Users:',
+                *(_usage_line(str(row['user_id']), row) for row in report['users']), '',
+                'Organizations:',
+                *(_usage_line(row['org'] or '(none)', row) for row in report['orgs'])])
+        else:
+            raise ValueError(f"Unknown arguments {args}")
+    except ValueError:
+        text = USAGE_USAGE
+    await update.message.reply_text(text)
+    raise ApplicationHandlerStop
@@ -5,12 +5,15 @@ Functions:
     handle_documents_upload(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         Asynchronously handles the document upload process, processes the document,
         and sends a success or error message to the user based on the outcome.
+        Documents of workspace members are shared with their workspace.
 """
 from telegram import Update, Document
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from logging import getLogger
-from ..utils.utilties import define_lang, process_documents
+from ..utils.utilties import process_documents
+from ..utils.catalog import catalog
+from ..utils.workspaces import workspaces
 from .. import CONCEPT_NOTE, SET_DOCUMENT
 
 logger = getLogger(__name__)
@@ -25,6 +28,9 @@ async def handle_documents_upload(update: Update, context: ContextTypes.DEFAULT_
     stores the document content in the user's data and sends a success message.
     If an error occurs during the upload, it sends an error message and logs the error.
 
+    The document of a workspace member is stored once in their workspace instead,
+    and a file already shared in the workspace is not downloaded again.
+
     Args:
         update (Update): The update object that contains the document uploaded by the user.
         context (ContextTypes.DEFAULT_TYPE): The context object that provides access to bot data and user data.
@@ -33,60 +39,36 @@ async def handle_documents_upload(update: Update, context: ContextTypes.DEFAULT_
         int: The next state in the conversation flow.
     """
 
-    conversation: dict[str, str] = {
-        'upload_error': {
-            'en': ''.join([
-                '<b>Upload Failed ❌</b>\n\n',
-                'The document could not be uploaded. Please ensure:\n',
-                '- The file is in .docx or .pdf format.\n',
-                '- The file size is within the allowed limit.\n\n',
-                '<i>Please try again.</i>'
-            ]),
-            'ar': ''.join([
-                '<b>فشل التحميل ❌</b>\n\n',
-                'تعذر تحميل المستند. يرجى التأكد من:\n',
-                '- أن الملف بصيغة .docx أو .pdf.\n',
-                '- أن حجم الملف ضمن الحد المسموح.\n\n',
-                '<i>الرجاء المحاولة مرة أخرى.</i>'
-            ])
-        },
-        'upload_success': {
-            'en': ''.join([
-                '<b>Upload Successful ✅</b>\n\n',
-                'Your document has been uploaded successfully!\n\n',
-                'To proceed, please provide details about your project or the problem you want to address. ',
-                'This will help us create a well-structured concept note for you.\n\n'
-            ]),
-            'ar': ''.join([
-                '<b>تم التحميل بنجاح ✅</b>\n\n',
-                'تم تحميل المستند بنجاح!\n\n',
-                'للمتابعة، يرجى توضيح تفاصيل مشروعك أو المشكلة التي ترغب في معالجتها، ',
-                'سيساعدنا ذلك في إنشاء مذكرة مفهوم منظمة جيدًا لك.\n\n'
-            ])
-        }
-
-    }
-
     try:
         document: Document = update.message.document
-        file = await context.bot.get_file(document.file_id)
-        content = process_documents(file, document.file_name)
-        context.user_data["document"] = content
+        lang: str = context.user_data['language_code']
+        shared: dict = workspaces.document(update.effective_user.id)
+        if shared is not None and shared['fingerprint'] == document.file_unique_id:
+            logger.info("Document %s is already shared in the workspace", document.file_name)
+            version: int = shared['version']
+        else:
+            file = await context.bot.get_file(document.file_id)
+            content = await process_documents(file, document.file_name)
+            version = workspaces.save_document(
+                update.effective_user.id, content, document.file_unique_id)
+            if version is None:
+                context.user_data["document"] = content
+        text: str = catalog.text('documents.upload_success', lang)
+        if version is not None:
+            text += catalog.text('workspace.document_saved', lang, version=version)
         await update.message.reply_text(
-            define_lang(
-                conversation['upload_success'], context.user_data['language_code']
-            ),
+            text,
             parse_mode=ParseMode.HTML
         )
-        logger.info(f"Document uploaded successfully: {document.file_name}")
+        logger.info("Document uploaded successfully: %s", document.file_name)
         return CONCEPT_NOTE
     except Exception as e:
         await update.message.reply_text(
-            define_lang(
-                conversation['upload_error'], context.user_data['language_code']
+            catalog.text(
+                'documents.upload_error', context.user_data['language_code']
             ),
             parse_mode=ParseMode.HTML
         )
         logger.error(
-            f"File upload error: {e}\n")
+            "File upload error: %s\n", e)
         return SET_DOCUMENT
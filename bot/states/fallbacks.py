@@ -14,6 +14,8 @@ from telegram.ext import (
 
 )
 
+from ..utils.catalog import catalog
+
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles the cancellation of the conversation and sends a goodbye message.
@@ -23,5 +25,7 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     Returns:
         int: The end state of the conversation.
     """
-    await update.message.reply_text("GoodBye!", reply_markup=ReplyKeyboardRemove())
+    await update.message.reply_text(
+        catalog.text('cancel.goodbye', context.user_data.get('language_code')),
+        reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
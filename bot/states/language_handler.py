@@ -4,19 +4,17 @@
     Functions:
         set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         Asynchronously sets the language for the user based on their selection
-        and updates the conversation state.
+        and updates the conversation state. Selections ending in `:lite` also turn
+        on the low-bandwidth delivery of the results.
 """
 
-from telegram import (
-    Update, InlineKeyboardButton,
-    InlineKeyboardMarkup, CallbackQuery
-)
+from telegram import Update, CallbackQuery
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 from logging import getLogger
 
 from .. import SET_TASKS
-from ..utils.utilties import define_lang
+from ..utils.catalog import catalog
 
 logger = getLogger(__name__)
 
@@ -34,50 +32,25 @@ async def set_language(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     query: CallbackQuery = update.callback_query
     await query.answer()
-    lang: str = query.data
+    lang, _, mode = query.data.partition(':')
 
     context.user_data.update(
-        {'language_code': lang}
+        {'language_code': lang, 'low_bandwidth': mode == 'lite'}
     )
 
-    conversation: dict = {
-        'query': {
-            'en': f'Your language has been set to {lang}. 🌐',
-            'ar': f'تم تعيين اللغة إلى {lang}. 🌐'
-        },
-        'message': {
-            'en': ''.join([
-                '<b>What would you like to do next?</b>\n\n',
-                '1. Use analysis tools 🔍\n',
-                '2. Generate a concept note 📄\n',
-            ]),
-            'ar': ''.join([
-                '<b>ماذا تريد أن تفعل بعد ذلك؟</b>\n\n',
-                '1. استخدام أدوات التحليل 🔍\n',
-                '2. إنشاء مذكرة مفاهيمية 📄\n',
-            ])
-        }
-    }
-
-    await query.edit_message_text(
-        define_lang(conversation['query'], lang),
-        parse_mode=ParseMode.HTML)
+    text: str = catalog.text('language.set', lang, language=lang)
+    if mode == 'lite':
+        text += '\n\n' + catalog.text('language.lite_on', lang)
+    await query.edit_message_text(text, parse_mode=ParseMode.HTML)
 
     # next State
-    message: str = define_lang(conversation['message'], lang)
     await context.bot.send_message(
-        text=message, chat_id=context._chat_id,
-        reply_markup=InlineKeyboardMarkup(
-            [
-                [InlineKeyboardButton(
-                    'Use Analysis Tools', callback_data='ANALYSIS_TOOLS')],
-                [InlineKeyboardButton(
-                    'Generate A Concept Note', callback_data='CONCEPT_NOTE')],
-            ]
-        ),
+        text=catalog.text('language.next', lang), chat_id=context._chat_id,
+        reply_markup=catalog.keyboard('tasks', lang),
         parse_mode=ParseMode.HTML
     )
 
     logger.info(
-        f"User {update.effective_user.id} set their language to {lang}")
+        "User %s set their language to %s (low bandwidth: %s)",
+        update.effective_user.id, lang, mode == 'lite')
     return SET_TASKS
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""This module pages through the results sent in low-bandwidth mode, outside of the conversation.
+
+Functions:
+    page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        Shows a page of a stored result in place of the previous one, or sends it as a DOCX file.
+"""
+from telegram import CallbackQuery, Update
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from logging import getLogger
+from ..utils.catalog import catalog
+from ..utils.delivery import delivered_bytes, pager_keyboard, result_pages
+from ..utils.export import export_docx
+from ..utils.formatting import strip_html
+from ..utils.journal import KINDS, PAPERS
+
+logger = getLogger(__name__)
+
+
+async def page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Shows a page of a stored result in place of the previous one, or sends it as a DOCX file.
+
+    The buttons stay usable after the conversation ended, as long as the result is
+    in the user's data.
+
+    Args:
+        update (Update): The update object that contains the callback query,
+            `page:<key>:<page>` or `page:<key>:docx`.
+        context (ContextTypes.DEFAULT_TYPE): The context object, `context.user_data`
+            holds the result.
+    Raises:
+        ApplicationHandlerStop: Always, the query is not passed to the conversation.
+    """
+    query: CallbackQuery = update.callback_query
+    lang: str = context.user_data.get('language_code')
+    _, key, page = query.data.split(':', 2)
+    text: str = context.user_data.get(key) if key in KINDS else None
+    if not text:
+        await query.answer(catalog.text('pager.expired', lang), show_alert=True)
+        raise ApplicationHandlerStop
+
+    await query.answer()
+    if page == 'docx' and key in PAPERS:
+        document: bytes = await export_docx(text, catalog.text(f'paper.{key}_title', lang))
+        delivered_bytes.inc(len(document), mode='low_bandwidth')
+        await query.message.reply_document(
+            document, filename=f'{key}.docx', caption=catalog.text('paper.document', lang))
+        raise ApplicationHandlerStop
+
+    pages: list[str] = result_pages(text)
+    number: int = min(max(int(page) if page.isdigit() else 1, 1), len(pages))
+    body: str = catalog.text('pager.page', lang, page=number, pages=len(pages)) + pages[number - 1]
+    markup = pager_keyboard(key, number, len(pages), lang, document=key in PAPERS)
+    delivered_bytes.inc(len(body.encode()), mode='low_bandwidth')
+    try:
+        await query.edit_message_text(body, parse_mode=ParseMode.HTML, reply_markup=markup)
+    except BadRequest as e:
+        logger.warning("Sending the page as plain text, HTML was rejected: %s", e)
+        await query.edit_message_text(strip_html(body), reply_markup=markup)
+    logger.info("User %s read page %s of %s of their %s", context._user_id, number,
+                len(pages), key)
+    raise ApplicationHandlerStop
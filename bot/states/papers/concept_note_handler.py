@@ -6,16 +6,32 @@ Functions:
     concept_note(update: Update, context: ContextTypes.DEFAULT_TYPE) -> str:
         Asynchronously generates a concept note based on user input and replies with the generated note.
         Handles errors by sending an appropriate error message to the user.
+
+    send_paper(message: Message, paper: str, text: str, user_data: dict) -> None:
+        Sends a generated paper as a DOCX file, or as text messages if the export fails.
+        In low-bandwidth mode only its summary is sent.
+
+    generate_paper(message: Message, context: ContextTypes.DEFAULT_TYPE, text: str,
+                   user_id: int) -> int:
+        Generates the paper selected by the user (concept note or full proposal) and replies with it.
 """
 
-from telegram import Update
+from telegram import Update, Message
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
 from logging import getLogger
 
-from ...utils.utilties import define_lang
-from ...gemini.base import Model
-from ... import CONCEPT_NOTE
+from ...utils.catalog import catalog
+from ...utils.artifacts import ArtifactStore
+from ...utils.delivery import (
+    persist_result, pending_result, clear_pending, send_html, send_summary
+)
+from ...utils.export import export_docx
+from ...utils.journal import journal, Interrupted
+from ...utils.overload import Overloaded
+from ...utils.usage import QuotaExceeded
+from ...utils.workspaces import workspaces
+from ... import CONCEPT_NOTE, SET_TASKS
 
 logger = getLogger(__name__)
 
@@ -24,62 +40,149 @@ async def concept_note(update: Update, context: ContextTypes.DEFAULT_TYPE) -> st
     """
     Handle the concept note generation process for the user.
 
-    This function receives an update and context, processes the user's input to generate a concept note,
-    and sends the generated note back to the user. If an error occurs during the generation process,
-    an error message is sent to the user.
+    This function receives an update and context, processes the user's input to generate a concept note
+    (or a full proposal, depending on the selected task), and sends the generated paper back to the user.
+    If an error occurs during the generation process, an error message is sent to the user.
 
     Args:
         update (Update): The update object that contains the user's message.
         context (ContextTypes.DEFAULT_TYPE): The context object that contains user data and other information.
 
     Returns:
-        str: The state of the conversation. Returns ConversationHandler.END if the process is successful,
-             otherwise returns CONCEPT_NOTE to indicate an error occurred.
+        str: The state of the conversation. Returns SET_TASKS after a concept note so it can be expanded
+             into a full proposal, ConversationHandler.END after a full proposal, otherwise returns
+             CONCEPT_NOTE to indicate an error occurred.
     """
 
-    conversation: dict[str, str] = {
-        'error': {
-
-            'en': ''.join([
-                '<b>Error Generating Concept Note ❌</b>\n\n',
-                'We encountered an issue while generating your concept note.\n\n',
-                'Please check your input and try again. If the problem persists, ensure that all necessary details are provided or contact support for assistance.\n\n'
-            ]),
-            'ar': ''.join([
-                '<b>خطأ في إنشاء مذكرة المفهوم ❌</b>\n\n',
-                'حدثت مشكلة أثناء إنشاء مذكرة المفهوم الخاصة بك.\n\n',
-                'يرجى التحقق من المدخلات والمحاولة مرة أخرى. إذا استمرت المشكلة، تأكد من تقديم جميع التفاصيل الضرورية أو تواصل مع الدعم للمساعدة.\n\n'
-            ])
-        },
-        'END': {
-            'en': 'Thank you for using Raed. Have a great day! 👋',
-            'ar': 'شكرًا لاستخدام رائد. أتمنى لك يومًا سعيدًا! 👋'
-
-        }
-    }
     text: str = update.message.text
+    context.user_data['paper_input'] = text
+    return await generate_paper(update.message, context, text, update.effective_user.id)
+
+
+async def send_paper(message: Message, paper: str, text: str, user_data: dict) -> None:
+    """Sends a generated paper as a DOCX file, or as text messages if the export fails.
+
+    In low-bandwidth mode only the summary of the paper is sent, with buttons to
+    read it page by page or download the DOCX file.
+
+    Args:
+        message (Message): The message to reply to.
+        paper (str): The paper, CONCEPT_NOTE or FULL_PROPOSAL.
+        text (str): The generated paper.
+        user_data (dict): The `context.user_data` of the user, holding the paper.
+    """
+    lang: str = user_data['language_code']
+    if user_data.get('low_bandwidth'):
+        await send_summary(message, user_data, paper.lower(), text, document=True)
+        return
+    try:
+        document: bytes = await export_docx(
+            text, catalog.text(f'paper.{paper.lower()}_title', lang))
+        await message.reply_document(
+            document,
+            filename=f'{paper.lower()}.docx',
+            caption=catalog.text('paper.document', lang)
+        )
+    except Exception as e:
+        logger.error("Error exporting %s, sending it as text: %s", paper.lower(), e)
+        await send_html(message, text)
+
+
+async def generate_paper(message: Message, context: ContextTypes.DEFAULT_TYPE, text: str,
+                         user_id: int) -> int:
+    """Generates the paper selected by the user and replies with it.
+
+    Sections already generated for the same input and profile are reused from the
+    user's artifact store, so expanding a concept note into a full proposal only
+    generates the new sections. The paper is sent as a single DOCX file, or as
+    text messages if the export fails. Members of a workspace without a document of
+    their own use the document shared in their workspace.
+
+    Args:
+        message (Message): The message to reply to.
+        context (ContextTypes.DEFAULT_TYPE): The context object that contains user data and other information.
+        text (str): The user's description of the project or problem.
+        user_id (int): The user the paper is generated for, the message may be the bot's.
+
+    Returns:
+        int: The next state of the conversation.
+    """
+
+    paper: str = context.user_data.get('paper', 'CONCEPT_NOTE')
 
     try:
         profile: str = context.user_data.get("document")
-        response: str = Model.generate_concept_note(
-            text, profile)
-        await update.message.reply_text(
-            response,
+        if profile is None:
+            shared: dict = workspaces.document(user_id)
+            profile = shared['content'] if shared else None
+        lang: str = context.user_data['language_code']
+        # the sections are generated in a worker thread, on a copy of the user's store.
+        sections: dict = {ArtifactStore.KEY: context.user_data.get(ArtifactStore.KEY)}
+        response: str = pending_result(context.user_data, paper.lower(), text, profile)
+        if response is None:
+            response = await journal.generate(
+                context._chat_id, user_id, lang, paper.lower(),
+                text, profile, store=ArtifactStore(sections))
+            if sections[ArtifactStore.KEY]:
+                context.user_data[ArtifactStore.KEY] = sections[ArtifactStore.KEY]
+        if not response:
+            raise ValueError("The model returned no response")
+        persist_result(context.user_data, paper.lower(), response, text, profile)
+
+        with journal.delivering(
+                journal.job_id(context._chat_id, paper.lower(), text, profile)) as owned:
+            if owned:
+                await send_paper(message, paper, response, context.user_data)
+        clear_pending(context.user_data)
+
+        if paper == 'CONCEPT_NOTE':
+            await message.reply_text(
+                catalog.text('paper.next',
+                             context.user_data['language_code']),
+                parse_mode=ParseMode.HTML,
+                reply_markup=catalog.keyboard(
+                    'paper_next', context.user_data['language_code']),
+            )
+            logger.info(
+                "Concept note generated successfully for user %s", user_id)
+            return SET_TASKS
+
+        await message.reply_text(
+            catalog.text('common.goodbye',
+                         context.user_data['language_code']),
+            parse_mode=ParseMode.HTML
+        )
+        logger.info(
+            "Full proposal generated successfully for user %s", user_id)
+        return ConversationHandler.END
+    except Interrupted as e:
+        await message.reply_text(
+            catalog.text('journal.interrupted',
+                         context.user_data['language_code']),
             parse_mode=ParseMode.HTML
         )
-        await update.message.reply_text(
-            define_lang(conversation['END'],
-                        context.user_data['language_code']),
+        logger.warning("%s", e)
+        return ConversationHandler.END
+    except QuotaExceeded as e:
+        await message.reply_text(
+            catalog.text(f'usage.{e.scope}_quota', context.user_data['language_code']),
             parse_mode=ParseMode.HTML
         )
-        logger.info(
-            f"Concept note generated successfully for user {update.effective_user.id}")
+        logger.warning("%s", e)
         return ConversationHandler.END
+    except Overloaded as e:
+        await message.reply_text(
+            catalog.text('overload.busy', context.user_data['language_code'],
+                         minutes=e.minutes),
+            parse_mode=ParseMode.HTML
+        )
+        logger.warning("%s", e)
+        return CONCEPT_NOTE
     except Exception as e:
-        await update.message.reply_text(
-            define_lang(conversation['error'],
-                        context.user_data['language_code']),
+        await message.reply_text(
+            catalog.text('paper.error',
+                         context.user_data['language_code']),
             parse_mode=ParseMode.HTML
         )
-        logger.error(f"Error generating concept note: {e}")
+        logger.error("Error generating %s: %s", paper.lower(), e)
         return CONCEPT_NOTE
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+This module handles the expansion of a generated concept note into a full proposal.
+
+Functions:
+    expand_proposal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+        Generates a full proposal from the input of the user's last concept note.
+"""
+
+from telegram import Update, CallbackQuery
+from telegram.ext import ContextTypes
+from telegram.constants import ParseMode
+from logging import getLogger
+
+from ...utils.catalog import catalog
+from .concept_note_handler import generate_paper
+
+logger = getLogger(__name__)
+
+
+async def expand_proposal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Expands the user's last concept note into a full proposal.
+
+    The sections shared with the concept note are reused from the user's artifact
+    store, only the sections specific to the full proposal are generated.
+
+    Args:
+        update (Update): The update object that contains the callback query.
+        context (ContextTypes.DEFAULT_TYPE): The context object that contains user data and other information.
+
+    Returns:
+        int: The next state of the conversation.
+    """
+
+    query: CallbackQuery = update.callback_query
+    await query.answer()
+
+    await query.edit_message_text(
+        catalog.text('paper.expanding', context.user_data['language_code']),
+        parse_mode=ParseMode.HTML
+    )
+
+    context.user_data['paper'] = 'FULL_PROPOSAL'
+    logger.info(
+        "User %s expanded the concept note into a full proposal.", update.effective_user.id)
+    return await generate_paper(
+        query.message, context, context.user_data.get('paper_input'), update.effective_user.id)
@@ -12,7 +12,8 @@ from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
 
 from logging import getLogger
-from ..utils.utilties import define_lang
+from ..utils.catalog import catalog
+from ..utils.workspaces import workspaces
 from .. import SET_DOCUMENT, CONCEPT_NOTE
 
 
@@ -24,7 +25,8 @@ async def generate_papers(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     This function processes the user's callback query to either prompt them to upload a document
     or describe a problem for generating a concept note. The response is based on the user's
-    selection and their current context.
+    selection and their current context. Members whose workspace already has a shared
+    document are not asked to upload one.
 
     Args:
         update(Update): The update object that contains the callback query.
@@ -35,58 +37,30 @@ async def generate_papers(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         int: The next state in the conversation flow, either SET_DOCUMENT or CONCEPT_NOTE.
     """
 
-    conversation: dict[str, str] = {
-        'Yes': {
-            'en': ''.join([
-                '<b>Upload Document 📂</b>\n\n',
-                'Please upload your document (organization profile, project details, etc.).\n\n',
-                '<b>Allowed formats:</b> .docx, .pdf\n\n',
-                '<i>Click the attachment icon or drag and drop your file.</i>'
-            ]),
-            'ar': ''.join([
-                '<b>تحميل المستند 📂</b>\n\n',
-                'الرجاء تحميل المستند الخاص بك (ملف تعريف المنظمة، تفاصيل المشروع، إلخ).\n\n',
-                '<b>الصيغ المسموحة:</b> .docx, .pdf\n\n',
-                '<i>انقر على أيقونة المرفق أو قم بسحب وإفلات الملف.</i>'
-            ])
-        },
-        'concept_note': {
-            'en': ''.join([
-                '<b>Concept Note Generation 📄</b>\n\n',
-                'A concept note is a concise document summarizing a project\'s purpose, objectives, and expected impact.\n\n',
-                '<b>Please describe the problem you want to address:</b>\n',
-                '<i>Example: "Lack of access to clean water in rural communities."</i>\n\n',
-                '<i>Type your response below.</i>'
-            ]),
-            'ar': ''.join([
-                '<b>إنشاء مذكرة مفاهيمية 📄</b>\n\n',
-                'المذكرة المفاهيمية هي وثيقة موجزة تُلخص الغرض، الأهداف، والأثر المتوقع للمشروع.\n\n',
-                '<b>الرجاء وصف المشكلة التي ترغب في معالجتها:</b>\n',
-                '<i>مثال: "نقص الوصول إلى المياه النظيفة في المجتمعات الريفية."</i>\n\n',
-                '<i>اكتب ردك أدناه.</i>'
-            ])
-        }
-    }
-
     query: CallbackQuery = update.callback_query
     await query.answer()
 
+    shared: dict = workspaces.document(update.effective_user.id) if query.data == 'Yes' else None
     if (query.data == 'Yes' and
-            context.user_data.get("document") == None):
+            context.user_data.get("document") == None and shared is None):
         await query.edit_message_text(
-            text=define_lang(conversation['Yes'],
-                             context.user_data['language_code']),
+            text=catalog.text('papers.upload',
+                              context.user_data['language_code']),
             parse_mode=ParseMode.HTML
         )
         logger.info("Prompting user to upload a document.")
         return SET_DOCUMENT
 
     else:
+        paper: str = context.user_data.get('paper', 'CONCEPT_NOTE').lower()
+        text: str = catalog.text(f'papers.{paper}', context.user_data['language_code'])
+        if shared and context.user_data.get("document") is None:
+            text = catalog.text('workspace.shared_document', context.user_data['language_code'],
+                                version=shared['version']) + text
         await query.edit_message_text(
-            text=define_lang(conversation['concept_note'],
-                             context.user_data['language_code']),
+            text=text,
             parse_mode=ParseMode.HTML
         )
         logger.info(
-            "Prompting user to describe the problem for the concept note.")
+            "Prompting user to describe the problem for the %s.", paper.replace('_', ' '))
         return CONCEPT_NOTE
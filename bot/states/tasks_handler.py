@@ -3,13 +3,10 @@
 """
 
 import logging
-from telegram import (
-    Update, CallbackQuery,
-    InlineKeyboardButton, InlineKeyboardMarkup
-)
+from telegram import Update, CallbackQuery
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
-from ..utils.utilties import define_lang
+from ..utils.catalog import catalog
 from .. import ANALYSIS_TOOLS, SET_PAPER
 
 logger = logging.getLogger(__name__)
@@ -31,111 +28,38 @@ async def set_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await query.answer()
     task: str = query.data
 
-    conversaion: dict[str, str] = {
-        'query': {
-            'en': f'Your task has been set to: {task.replace("_", " ").lower()}. ✅',
-            'ar': f'تم تعيين المهمة إلى: {task.replace("_", " ").lower()}. ✅'
-        },
-        'ANALYSIS_TOOLS': {
-            'en': ''.join([
-                '<b>Analysis Tools Overview 🔍</b>\n\n',
-                'Please choose an analysis method:\n\n',
-                '1. <u>Problem Tree Method</u> 🌳\n',
-                '   - Identifies root causes, effects, and core issues\n\n',
-                '2. <u>SWOT Analysis</u> 📊\n',
-                '   - Evaluates Strengths, Weaknesses, Opportunities, Threats\n\n',
-                '3. <u>PESTEL Analysis</u> 🌐\n',
-                '   - Examines Political, Economic, Social, Technological, Environmental, Legal factors\n\n',
-            ]),
-            'ar': ''.join([
-                '<b>نظرة عامة على أدوات التحليل 🔍</b>\n\n',
-                'الرجاء اختيار أداة التحليل:\n\n',
-                '1. <u>طريقة شجرة المشكلة</u> 🌳\n',
-                '   - تحدد الأسباب الجذرية، الآثار، والقضايا الأساسية\n\n',
-                '2. <u>تحليل سوات (SWOT)</u> 📊\n',
-                '   - يقيم النقاط القوة، الضعف، الفرص، التهديدات\n\n',
-                '3. <u>تحليل بيستل (PESTEL)</u> 🌐\n',
-                '   - يدرس العوامل السياسية، الاقتصادية، الاجتماعية، التكنولوجية، البيئية، القانونية\n\n',
-            ])
-        },
-
-        'CONCEPT_NOTE': {
-            'en': ''.join([
-                '<b>Would you like to upload a document (e.g., organization profile) to adjust the response?</b>\n',
-
-            ]),
-            'ar': ''.join([
-                '<b>هل ترغب في تحميل مستند (مثل ملف تعريف المنظمة) لتعديل الرد بناءً عليه؟</b>\n',
-            ])
-        },
-        'END': {
-            'en': 'Thank you for using Raed. Have a great day! 👋',
-            'ar': 'شكرًا لاستخدام رائد. أتمنى لك يومًا سعيدًا! 👋'
-
-        }
-    }
+    lang: str = context.user_data['language_code']
 
     await query.edit_message_text(
-        define_lang(conversaion['query'], context.user_data['language_code'])
+        catalog.text('tasks.set', lang, task=task.replace("_", " ").lower())
     )
     if task == 'ANALYSIS_TOOLS':
         await context.bot.send_message(
-            text=define_lang(
-                conversaion[task], context.user_data['language_code']
-            ),
+            text=catalog.text('tasks.analysis_tools', lang),
             chat_id=context._chat_id,
-            reply_markup=InlineKeyboardMarkup(
-                [
-                    [
-                        InlineKeyboardButton(
-                            'Problem Tree Method', callback_data='PROBLEM_TREE_ANALYSIS')
-                    ],
-                    [
-                        InlineKeyboardButton(
-                            'SWOT Analysis', callback_data='SWOT_ANALYSIS')
-                    ],
-                    [
-                        InlineKeyboardButton(
-                            'PESTEL Analysis', callback_data='PESTEL_ANALYSIS')
-                    ]
-                ]
-            ),
+            reply_markup=catalog.keyboard('analysis_tools', lang),
             parse_mode=ParseMode.HTML
         )
         logger.info(
-            f"User {update.effective_user.id} selected Analysis Tools task.")
+            "User %s selected Analysis Tools task.", update.effective_user.id)
         return ANALYSIS_TOOLS
-    elif task == 'CONCEPT_NOTE':
+    elif task in ('CONCEPT_NOTE', 'FULL_PROPOSAL'):
+        context.user_data['paper'] = task
         await context.bot.send_message(
-            text=define_lang(
-                conversaion[task], context.user_data['language_code']
-            ),
+            text=catalog.text('tasks.paper', lang),
             chat_id=context._chat_id,
-            reply_markup=InlineKeyboardMarkup(
-                [
-                    [
-                        InlineKeyboardButton(
-                            'Yes ✅', callback_data='Yes')
-                    ],
-                    [
-                        InlineKeyboardButton(
-                            'No ❌', callback_data='No')
-                    ],
-                ]
-            ),
+            reply_markup=catalog.keyboard('paper_upload', lang),
             parse_mode=ParseMode.HTML
         )
 
         logger.info(
-            f"User {update.effective_user.id} selected Concept Note task.")
+            "User %s selected %s task.", update.effective_user.id, task.replace('_', ' ').title())
         return SET_PAPER
     else:
-        message: str = define_lang(
-            conversaion['END'], context.user_data['language_code'])
         await context.bot.send_message(
-            text=message,
+            text=catalog.text('common.goodbye', lang),
             chat_id=context._chat_id,
         )
 
-        logger.info(f"User {update.effective_user.id} selected task: {task}")
-        ConversationHandler.END
+        logger.info("User %s selected task: %s", update.effective_user.id, task)
+        return ConversationHandler.END
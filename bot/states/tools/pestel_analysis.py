@@ -9,8 +9,13 @@ from telegram import Update
 
 from telegram.ext import ContextTypes, ConversationHandler
 from logging import getLogger
-from ...gemini.base import Model
-from ...utils.utilties import define_lang
+from ...utils.catalog import catalog
+from ...utils.delivery import (
+    persist_result, pending_result, clear_pending, send_result
+)
+from ...utils.journal import journal, Interrupted
+from ...utils.overload import Overloaded
+from ...utils.usage import QuotaExceeded
 from ... import PESTEL_ANALYSIS
 
 logger = getLogger(__name__)
@@ -25,36 +30,56 @@ async def pestel_analysis_method(update: Update, context: ContextTypes.DEFAULT_T
        Returns:
            int: The next state of the conversation flow.
     """
-    conversation: dict[str, str] = {
-        'success': {
-            'en': 'Thank you for using Raed. Have a great day! 👋',
-            'ar': 'شكرًا لاستخدام رائد. أتمنى لك يومًا سعيدًا! 👋'
-        },
-        'error': {
-            'en': 'Please try again. ❌',
-            'ar': 'يرجى المحاولة مرة أخرى ❌'
-        }
-    }
-
+    text: str = update.message.text
     try:
-        response: str = Model.pestel_analysis(update.message.text)
-        context.user_data['pestel_analysis'] = response
-        await update.message.reply_text(
-            response,
-            parse_mode='HTML',
-        )
+        response: str = (pending_result(context.user_data, 'pestel_analysis', text)
+                         or await journal.generate(
+                             context._chat_id, context._user_id,
+                             context.user_data['language_code'], 'pestel_analysis', text))
+        if not response:
+            raise ValueError("The model returned no response")
+        persist_result(context.user_data, 'pestel_analysis', response, text)
+
+        with journal.delivering(
+                journal.job_id(context._chat_id, 'pestel_analysis', text)) as owned:
+            if owned:
+                await send_result(update.message, context.user_data, 'pestel_analysis', response)
+        clear_pending(context.user_data)
 
         await update.message.reply_text(
-            define_lang(conversation['success'],
-                        context.user_data['language_code']),
+            catalog.text('common.goodbye',
+                         context.user_data['language_code']),
             parse_mode='HTML'
         )
         logger.info(
             "PESTEL analysis completed and response sent to user.")
         return ConversationHandler.END
+    except Interrupted as e:
+        await update.message.reply_text(
+            catalog.text('journal.interrupted',
+                         context.user_data['language_code']),
+            parse_mode='HTML'
+        )
+        logger.warning("%s", e)
+        return ConversationHandler.END
+    except QuotaExceeded as e:
+        await update.message.reply_text(
+            catalog.text(f'usage.{e.scope}_quota', context.user_data['language_code']),
+            parse_mode='HTML'
+        )
+        logger.warning("%s", e)
+        return ConversationHandler.END
+    except Overloaded as e:
+        await update.message.reply_text(
+            catalog.text('overload.busy', context.user_data['language_code'],
+                         minutes=e.minutes),
+            parse_mode='HTML'
+        )
+        logger.warning("%s", e)
+        return PESTEL_ANALYSIS
     except Exception as e:
-        text = define_lang(
-            conversation['error'], context.user_data['language_code']
+        text = catalog.text(
+            'common.try_again', context.user_data['language_code']
         )
         await update.message.reply_text(
             text,
@@ -62,5 +87,5 @@ async def pestel_analysis_method(update: Update, context: ContextTypes.DEFAULT_T
         )
 
         logger.error(
-            f"Error: {e}\n return to PESTEL Analysis")
+            "Error: %s\n return to PESTEL Analysis", e)
         return PESTEL_ANALYSIS
@@ -6,13 +6,18 @@ Functions:
         Handles the problem tree analysis by receiving user input, performing analysis, and providing options for further actions.
 """
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes
+from telegram import Update
+from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
 from logging import getLogger
 
-from ...gemini.base import Model
-from ...utils.utilties import define_lang
+from ...utils.catalog import catalog
+from ...utils.delivery import (
+    persist_result, pending_result, clear_pending, send_result
+)
+from ...utils.journal import journal, Interrupted
+from ...utils.overload import Overloaded
+from ...utils.usage import QuotaExceeded
 from ... import SET_TASKS, PROBLEM_TREE_ANALYSIS
 
 logger = getLogger(__name__)
@@ -30,53 +35,57 @@ async def problem_tree_method(update: Update, context: ContextTypes.DEFAULT_TYPE
     Returns:
         int: The next state in the conversation flow.
     """
-    conversation: dict[str, str] = {
-        'success': {
-            'en': ''.join([
-                '<b>Based on the analysis provided:</b>\n\n',
-                '1. Generate a concept note 📄\n',
-                '2. Generate a full proposal 📑\n',
-                '3. End the conversation 👋\n\n',
-            ]),
-            'ar': ''.join([
-                '<b>بناءً على التحليل المقدم:</b>\n\n',
-                '1. إنشاء مذكرة مفاهيمية 📄\n',
-                '2. إنشاء مقترح كامل 📑\n',
-                '3. إنهاء المحادثة 👋\n\n',
-
-            ]),
-        },
-        'error': {
-            'en': 'Please try again. ❌',
-            'ar': 'يرجى المحاولة مرة أخرى ❌'
-        }
-    }
-
+    text: str = update.message.text
+    lang: str = context.user_data['language_code']
     try:
-        response: str = Model.problem_tree_analysis(
-            update.message.text)
-        context.user_data['tree_analysis'] = response
-        await update.message.reply_text(
-            response,
-            parse_mode=ParseMode.HTML
-        )
+        response: str = (pending_result(context.user_data, 'tree_analysis', text)
+                         or await journal.generate(
+                             context._chat_id, context._user_id,
+                             context.user_data['language_code'], 'tree_analysis', text))
+        if not response:
+            raise ValueError("The model returned no response")
+        persist_result(context.user_data, 'tree_analysis', response, text)
+
+        with journal.delivering(
+                journal.job_id(context._chat_id, 'tree_analysis', text)) as owned:
+            if owned:
+                await send_result(update.message, context.user_data, 'tree_analysis', response)
+        clear_pending(context.user_data)
 
-        success: str = define_lang(conversation['success'],
-                                   context.user_data['language_code'])
         await update.message.reply_text(
-            success,
+            catalog.text('problem_tree.next', lang),
             parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton('Generate A Concept Note', callback_data='CONCEPT_NOTE')
-                 ],
-                [InlineKeyboardButton('Generate A Proposal', callback_data='FULL_PROPOSAL')
-                 ],
-                [InlineKeyboardButton('End the Conversation', callback_data='END')
-                 ],
-            ]),
+            reply_markup=catalog.keyboard('problem_tree_next', lang),
         )
         logger.info("Problem tree analysis completed successfully.")
         return SET_TASKS
+    except Interrupted as e:
+        await update.message.reply_text(
+            catalog.text('journal.interrupted',
+                         context.user_data['language_code']),
+            parse_mode='HTML'
+        )
+        logger.warning("%s", e)
+        return ConversationHandler.END
+    except QuotaExceeded as e:
+        await update.message.reply_text(
+            catalog.text(f'usage.{e.scope}_quota', context.user_data['language_code']),
+            parse_mode=ParseMode.HTML
+        )
+        logger.warning("%s", e)
+        return ConversationHandler.END
+    except Overloaded as e:
+        await update.message.reply_text(
+            catalog.text('overload.busy', context.user_data['language_code'],
+                         minutes=e.minutes),
+            parse_mode=ParseMode.HTML
+        )
+        logger.warning("%s", e)
+        return PROBLEM_TREE_ANALYSIS
     except Exception as e:
-        logger.error(f"Error: {e}")
+        await update.message.reply_text(
+            catalog.text('common.try_again', lang),
+            parse_mode=ParseMode.HTML
+        )
+        logger.error("Error: %s", e)
         return PROBLEM_TREE_ANALYSIS
@@ -9,8 +9,13 @@ from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 
 from logging import getLogger
-from ...gemini.base import Model
-from ...utils.utilties import define_lang
+from ...utils.catalog import catalog
+from ...utils.delivery import (
+    persist_result, pending_result, clear_pending, send_result
+)
+from ...utils.journal import journal, Interrupted
+from ...utils.overload import Overloaded
+from ...utils.usage import QuotaExceeded
 
 from ... import SWOT_ANALYSIS
 
@@ -27,40 +32,60 @@ async def swot_analysis_method(update: Update, context: ContextTypes.DEFAULT_TYP
         int: The next state of the conversation flow.
     """
 
-    conversation: dict[str, str] = {
-        'success': {
-            'en': 'Thank you for using Raed. Have a great day! 👋',
-            'ar': 'شكرًا لاستخدام رائد. أتمنى لك يومًا سعيدًا! 👋'
-        },
-        'error': {
-            'en': 'Please try again. ❌',
-            'ar': 'يرجى المحاولة مرة أخرى ❌'
-        }
-    }
-
+    text: str = update.message.text
     try:
-        response: str = Model.swot_analysis(update.message.text)
-        context.user_data['swot_analysis'] = response
+        response: str = (pending_result(context.user_data, 'swot_analysis', text)
+                         or await journal.generate(
+                             context._chat_id, context._user_id,
+                             context.user_data['language_code'], 'swot_analysis', text))
+        if not response:
+            raise ValueError("The model returned no response")
+        persist_result(context.user_data, 'swot_analysis', response, text)
+
+        with journal.delivering(
+                journal.job_id(context._chat_id, 'swot_analysis', text)) as owned:
+            if owned:
+                await send_result(update.message, context.user_data, 'swot_analysis', response)
+        clear_pending(context.user_data)
 
         await update.message.reply_text(
-            response,
+            catalog.text('common.goodbye',
+                         context.user_data['language_code']),
             parse_mode='HTML'
         )
+        logger.info("SWOT analysis completed and response sent to user.")
+
+        return ConversationHandler.END
+    except Interrupted as e:
         await update.message.reply_text(
-            define_lang(conversation['success'],
-                        context.user_data['language_code']),
+            catalog.text('journal.interrupted',
+                         context.user_data['language_code']),
             parse_mode='HTML'
         )
-        logger.info("SWOT analysis completed and response sent to user.")
-
+        logger.warning("%s", e)
         return ConversationHandler.END
+    except QuotaExceeded as e:
+        await update.message.reply_text(
+            catalog.text(f'usage.{e.scope}_quota', context.user_data['language_code']),
+            parse_mode='HTML'
+        )
+        logger.warning("%s", e)
+        return ConversationHandler.END
+    except Overloaded as e:
+        await update.message.reply_text(
+            catalog.text('overload.busy', context.user_data['language_code'],
+                         minutes=e.minutes),
+            parse_mode='HTML'
+        )
+        logger.warning("%s", e)
+        return SWOT_ANALYSIS
     except Exception as e:
         await update.message.reply_text(
-            define_lang(
-                conversation['error'], context.user_data['language_code']
+            catalog.text(
+                'common.try_again', context.user_data['language_code']
             ),
             parse_mode='HTML'
         )
 
-        logger.error(f"Error: {e}\n return to SWOT Analysis")
+        logger.error("Error: %s\n return to SWOT Analysis", e)
         return SWOT_ANALYSIS
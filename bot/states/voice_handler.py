@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""This module lets the users answer the analysis and concept-note states by voice.
+
+Functions:
+    accept_voice(callback: Callable) -> Callable:
+        Wraps a text callback of the conversation to also accept voice messages.
+"""
+from functools import wraps
+from typing import Callable, Union
+
+from telegram import Audio, Message, Update, Voice
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from logging import getLogger
+from ..utils.catalog import catalog
+from ..utils.voice import VoiceTooLong, transcriber
+
+logger = getLogger(__name__)
+
+# the transcript echoed to the user is cut to this many characters
+ECHO_CHARS: int = 500
+
+
+def accept_voice(callback: Callable) -> Callable:
+    """Wraps a text callback of the conversation to also accept voice messages.
+
+    A voice message (or an audio file) is transcribed off the event loop, the
+    transcript is echoed to the user and the callback handles it as if the user
+    had typed it, so it goes through the same generation. When the message cannot
+    be transcribed the user is told why and the conversation stays in its state.
+
+    Args:
+        callback (Callable): The callback handling the text of the user.
+
+    Returns:
+        Callable: The wrapped callback.
+    """
+    @wraps(callback)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        message: Message = update.message
+        audio: Union[Voice, Audio] = (message.voice or message.audio) if message else None
+        if audio is None:
+            return await callback(update, context)
+
+        lang: str = context.user_data.get('language_code')
+        try:
+            text: str = await transcriber.transcribe(context.bot, audio, lang)
+        except VoiceTooLong as e:
+            await message.reply_text(
+                catalog.text('voice.too_long', lang, seconds=e.limit),
+                parse_mode=ParseMode.HTML
+            )
+            logger.warning("%s", e)
+            return None
+        except Exception as e:
+            await message.reply_text(
+                catalog.text('voice.failed', lang),
+                parse_mode=ParseMode.HTML
+            )
+            logger.error("Transcription error: %s", e)
+            return None
+        if not text:
+            await message.reply_text(
+                catalog.text('voice.not_understood', lang),
+                parse_mode=ParseMode.HTML
+            )
+            return None
+
+        echoed: str = text if len(text) <= ECHO_CHARS else text[:ECHO_CHARS] + '…'
+        await message.reply_text(
+            catalog.text('voice.transcript', lang, text=echoed),
+            parse_mode=ParseMode.HTML
+        )
+        transcribed: Message = Message.de_json({**message.to_dict(), 'text': text}, context.bot)
+        return await callback(Update(update.update_id, message=transcribed), context)
+
+    return wrapper
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""This module handles the `/workspace` command, outside of the conversation.
+
+Functions:
+    workspace_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        Creates, joins, leaves or shows the workspace of the user.
+"""
+from datetime import datetime, timezone
+
+from telegram import Chat, Update
+from telegram.constants import ChatType, ParseMode
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from logging import getLogger
+from ..utils.catalog import catalog
+from ..utils.workspaces import workspaces
+
+logger = getLogger(__name__)
+
+
+def _status(workspace: dict, lang: str) -> str:
+    """Describes a workspace and the last version of its artifacts."""
+    lines: list[str] = [catalog.text(
+        'workspace.status', lang, name=workspace['name'], code=workspace['code'],
+        members=workspace['members'])]
+    for artifact in workspaces.artifacts(workspace['id']):
+        lines.append(catalog.text(
+            'workspace.artifact', lang, name=artifact['name'], version=artifact['version'],
+            date=datetime.fromtimestamp(artifact['updated'], timezone.utc).strftime('%Y-%m-%d')))
+    if len(lines) == 1:
+        lines.append(catalog.text('workspace.empty', lang))
+    return '\n'.join(lines)
+
+
+async def workspace_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Creates, joins, leaves or shows the workspace of the user.
+
+    In a group chat, `/workspace` makes the user a member of the workspace of the
+    group. In a private chat, `/workspace new <name>` creates a workspace,
+    `/workspace join <code>` joins one with its invite code and `/workspace` shows
+    the user's workspace. `/workspace leave` leaves it.
+
+    Args:
+        update (Update): The update object that contains the command.
+        context (ContextTypes.DEFAULT_TYPE): The context object, `context.args` holds the
+            action and its argument.
+    Raises:
+        ApplicationHandlerStop: Always, the command is not passed to the conversation.
+    """
+    args: list[str] = context.args or []
+    lang: str = context.user_data.get('language_code') or update.effective_user.language_code
+    user_id: int = update.effective_user.id
+    chat: Chat = update.effective_chat
+    action: str = args[0].lower() if args else ''
+
+    if action == 'leave':
+        workspace: dict = workspaces.leave(user_id)
+        text: str = (catalog.text('workspace.left', lang, name=workspace['name'])
+                     if workspace else catalog.text('workspace.none', lang))
+    elif chat.type in (ChatType.GROUP, ChatType.SUPERGROUP):
+        workspace = workspaces.for_chat(chat.id, chat.title or str(chat.id), user_id)
+        text = catalog.text('workspace.joined', lang, name=workspace['name'],
+                            members=workspace['members'])
+    elif action == 'new' and len(args) > 1:
+        workspace = workspaces.create(' '.join(args[1:]), user_id)
+        text = catalog.text('workspace.created', lang, name=workspace['name'],
+                            code=workspace['code'])
+    elif action == 'join' and len(args) == 2:
+        workspace = workspaces.join(args[1], user_id)
+        text = (catalog.text('workspace.joined', lang, name=workspace['name'],
+                             members=workspace['members'])
+                if workspace else catalog.text('workspace.unknown_code', lang))
+    else:
+        workspace = workspaces.of(user_id)
+        text = _status(workspace, lang) if workspace else catalog.text('workspace.none', lang)
+
+    logger.info("User %s ran /workspace %s", user_id, action)
+    await update.message.reply_text(text, parse_mode=ParseMode.HTML)
+    raise ApplicationHandlerStop
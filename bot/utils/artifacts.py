@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""This module provides a per-user store for generated paper sections.
+
+Concept notes and full proposals share most of their sections. Every section is
+stored together with a fingerprint of the inputs it was generated from, so a later
+paper only has to generate the sections whose inputs changed or which are new.
+
+The model is asked to start every section with a numbered marker, e.g. `[[2]]`,
+which does not depend on the language or formatting it writes the headings in. The
+markers are stripped after splitting. A response without them is split on its
+headings, with or without `<b>` tags, Markdown emphasis or numbering.
+
+Classes:
+    ArtifactStore: Keeps generated sections of a single user keyed by their fingerprint.
+
+Functions:
+    section_marker(index) -> str:
+        Returns the marker starting the section at an index of the prompt.
+
+    split_sections(text, headings) -> dict:
+        Splits a generated paper into its sections, on their markers or headings.
+
+    stitch_sections(sections, headings) -> str:
+        Joins sections back into a single paper in the given order.
+"""
+import re
+from hashlib import sha256
+
+MARKER_RE = re.compile(r'\[\[\s*(\d+)\s*\]\]')
+
+
+def section_marker(index: int) -> str:
+    """Returns the marker starting the section at an index of the prompt, from 1."""
+    return f'[[{index}]]'
+
+
+def _heading_re(heading: str) -> re.Pattern:
+    """Matches a heading in `<b>` tags, or alone at the start of a line before a colon
+    or the end of the line, optionally numbered or emphasized in Markdown."""
+    name: str = re.escape(heading)
+    return re.compile(
+        rf'<b>\s*{name}\s*:?\s*</b>'
+        rf'|^[ \t]*(?:#+[ \t]*)?(?:\d+[.)][ \t]*)?(?:\*\*|__)?[ \t]*{name}[ \t]*'
+        rf'(?::[ \t]*(?:\*\*|__)?|(?:\*\*|__)?[ \t]*:?[ \t]*$)',
+        re.IGNORECASE | re.MULTILINE)
+
+
+def split_sections(text: str, headings: list[str]) -> dict[str, str]:
+    """Splits a generated paper into its sections, on their markers or headings.
+
+    A section is found by its marker, the one of its index in `headings`, or else
+    by its heading. The markers are removed from the sections.
+
+    Args:
+        text (str): The generated paper.
+        headings (list[str]): The section headings to look for, in the order of the prompt.
+
+    Returns:
+        dict[str, str]: The text of each section found, including its heading.
+    """
+    positions: dict[str, int] = {}
+    for match in MARKER_RE.finditer(text):
+        index: int = int(match.group(1)) - 1
+        if 0 <= index < len(headings):
+            positions.setdefault(headings[index], match.start())
+    for heading in headings:
+        if heading not in positions:
+            match = _heading_re(heading).search(text)
+            if match:
+                positions[heading] = match.start()
+    starts: list[tuple[int, str]] = sorted((start, heading) for heading, start in positions.items())
+
+    sections: dict[str, str] = {}
+    for index, (start, heading) in enumerate(starts):
+        end = starts[index + 1][0] if index + 1 < len(starts) else len(text)
+        sections[heading] = MARKER_RE.sub('', text[start:end]).strip()
+    return sections
+
+
+def stitch_sections(sections: dict[str, str], headings: list[str]) -> str:
+    """Joins sections back into a single paper in the given order.
+
+    Args:
+        sections (dict[str, str]): The text of each section, including its heading.
+        headings (list[str]): The order of the sections in the paper.
+
+    Returns:
+        str: The stitched paper.
+    """
+    return '\n\n'.join(
+        sections[heading] for heading in headings if heading in sections
+    )
+
+
+class ArtifactStore:
+    """Keeps the generated paper sections of a single user keyed by their fingerprint.
+
+    The sections live in the user's `user_data` under the `sections` key and are
+    written back on every change, so the store works with any mapping.
+    """
+
+    KEY: str = 'sections'
+    MAX_SECTIONS: int = 32
+
+    def __init__(self, user_data: dict) -> None:
+        """Initializes the store on top of the user's data.
+
+        Args:
+            user_data (dict): The `context.user_data` of the user.
+        """
+        self._user_data = user_data
+
+    @staticmethod
+    def fingerprint(*parts: str) -> str:
+        """Computes the fingerprint of the inputs a section is generated from.
+
+        Returns:
+            str: The hex digest of the inputs.
+        """
+        digest = sha256()
+        for part in parts:
+            digest.update((part or '').encode('utf-8'))
+            digest.update(b'\x1f')
+        return digest.hexdigest()
+
+    def lookup(self, fingerprints: dict[str, str]) -> dict[str, str]:
+        """Returns the stored sections whose fingerprint still matches.
+
+        Args:
+            fingerprints (dict[str, str]): The current fingerprint of each heading.
+
+        Returns:
+            dict[str, str]: The reusable sections by heading.
+        """
+        stored: dict[str, str] = self._user_data.get(self.KEY) or {}
+        return {
+            heading: stored[fingerprint]
+            for heading, fingerprint in fingerprints.items()
+            if fingerprint in stored
+        }
+
+    def save(self, sections: dict[str, str], fingerprints: dict[str, str]) -> None:
+        """Stores generated sections under their fingerprint.
+
+        Args:
+            sections (dict[str, str]): The generated sections by heading.
+            fingerprints (dict[str, str]): The fingerprint of each heading.
+        """
+        stored: dict[str, str] = dict(self._user_data.get(self.KEY) or {})
+        for heading, text in sections.items():
+            stored.pop(fingerprints[heading], None)
+            stored[fingerprints[heading]] = text
+        while len(stored) > self.MAX_SECTIONS:
+            stored.pop(next(iter(stored)))
+        self._user_data[self.KEY] = stored
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""This module provides the message catalog of the bot.
+
+Every language lives in its own JSON file in `bot/locales/` holding the name of the
+language, the HTML messages and the inline keyboards. The files are loaded once at
+startup and the keyboard markups are built once per language, so handlers only do
+dictionary lookups. Adding a language means adding a file.
+
+Classes:
+    Catalog: Loads the locale files and resolves messages and keyboards.
+
+Attributes:
+    catalog (Catalog): The catalog loaded from `bot/locales/`.
+"""
+import json
+from html import escape
+from logging import getLogger
+from pathlib import Path
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from ..config import DEFAULT_LANGUAGE
+
+logger = getLogger(__name__)
+
+LOCALES_DIR: Path = Path(__file__).resolve().parent.parent / 'locales'
+
+
+class Catalog:
+    """Loads the locale files and resolves messages and keyboards by language.
+    """
+
+    def __init__(self, path: Path, default_language: str = DEFAULT_LANGUAGE) -> None:
+        """Loads every locale file in the given directory.
+
+        Args:
+            path (Path): The directory of the locale files.
+            default_language (str): The language used when a message is missing.
+        """
+        self.default_language: str = default_language
+        self._names: dict[str, str] = {}
+        self._messages: dict[str, dict[str, str]] = {}
+        self._keyboards: dict[str, dict[str, InlineKeyboardMarkup]] = {}
+        self._language_keyboard: InlineKeyboardMarkup = None
+
+        for file in sorted(Path(path).glob('*.json')):
+            with open(file, encoding='utf-8') as f:
+                data: dict = json.load(f)
+            lang: str = file.stem
+            self._names[lang] = data.get('name', lang)
+            self._messages[lang] = data.get('messages', {})
+            self._keyboards[lang] = {
+                name: InlineKeyboardMarkup([
+                    [InlineKeyboardButton(label, callback_data=callback)
+                     for label, callback in row]
+                    for row in rows
+                ])
+                for name, rows in data.get('keyboards', {}).items()
+            }
+
+        if self.default_language not in self._messages:
+            raise ValueError(
+                f"Default language '{self.default_language}' has no locale file in {path}")
+
+    @property
+    def languages(self) -> list[str]:
+        """The codes of the available languages."""
+        return list(self._messages)
+
+    def resolve(self, lang: str) -> str:
+        """Resolves a language code to an available language.
+
+        Regional codes such as `ar-SD` fall back to their base language, unknown
+        languages fall back to the default language.
+
+        Args:
+            lang (str): The requested language code.
+
+        Returns:
+            str: The code of an available language.
+        """
+        if lang in self._messages:
+            return lang
+        base: str = (lang or '').split('-')[0].lower()
+        return base if base in self._messages else self.default_language
+
+    def text(self, key: str, lang: str, **kwargs: str) -> str:
+        """Returns a message in the user's language.
+
+        Args:
+            key (str): The key of the message.
+            lang (str): The user's language code.
+            **kwargs (str): Values for the placeholders of the message, HTML-escaped.
+
+        Returns:
+            str: The message, taken from the default language if it is missing.
+        """
+        lang = self.resolve(lang)
+        message: str = self._messages[lang].get(key)
+        if message is None:
+            message = self._messages[self.default_language][key]
+        if kwargs:
+            message = message.format(
+                **{name: escape(str(value)) for name, value in kwargs.items()})
+        return message
+
+    def keyboard(self, name: str, lang: str) -> InlineKeyboardMarkup:
+        """Returns an inline keyboard in the user's language.
+
+        Args:
+            name (str): The name of the keyboard.
+            lang (str): The user's language code.
+
+        Returns:
+            InlineKeyboardMarkup: The keyboard, taken from the default language if it is missing.
+        """
+        keyboards: dict = self._keyboards[self.resolve(lang)]
+        if name not in keyboards:
+            return self._keyboards[self.default_language][name]
+        return keyboards[name]
+
+    def language_keyboard(self) -> InlineKeyboardMarkup:
+        """Returns the inline keyboard listing every available language.
+
+        Every language has a second button, `<lang>:lite`, that also turns on the
+        low-bandwidth delivery of the results.
+
+        Returns:
+            InlineKeyboardMarkup: One row of buttons per language.
+        """
+        if self._language_keyboard is None:
+            self._language_keyboard = InlineKeyboardMarkup([
+                [InlineKeyboardButton(name, callback_data=lang),
+                 InlineKeyboardButton(self.text('language.lite_button', lang, language=name),
+                                      callback_data=f'{lang}:lite')]
+                for lang, name in self._names.items()
+            ])
+        return self._language_keyboard
+
+    def validate(self) -> dict[str, set[str]]:
+        """Finds the messages and keyboards missing from each language.
+
+        Returns:
+            dict[str, set[str]]: The missing keys by language, empty if the catalog is complete.
+        """
+        messages: set[str] = set(self._messages[self.default_language])
+        keyboards: set[str] = set(self._keyboards[self.default_language])
+        missing: dict[str, set[str]] = {}
+        for lang in self._messages:
+            keys: set[str] = (messages - set(self._messages[lang])) | {
+                f'keyboards.{name}' for name in keyboards - set(self._keyboards[lang])
+            }
+            if keys:
+                missing[lang] = keys
+        return missing
+
+
+catalog: Catalog = Catalog(LOCALES_DIR)
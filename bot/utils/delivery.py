@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""This module delivers generated text to the user.
+
+Generated text is stored in the user's data before it is sent, so a failed send
+never forces the model to generate it again.
+
+Users who picked the low-bandwidth mode with their language first get a short
+summary of a result. The full result stays in their data and is read page by
+page with inline buttons, every page replacing the previous one in the same
+message, so nothing is generated again and only the pages asked for are sent.
+
+Functions:
+    persist_result(user_data, key, text, *inputs) -> None:
+        Stores a generated result before it is sent.
+
+    pending_result(user_data, key, *inputs) -> str:
+        Returns a stored result for the same inputs that was not delivered yet.
+
+    clear_pending(user_data) -> None:
+        Marks the stored result as delivered.
+
+    async def send_html(message, text, **kwargs) -> list[Message]:
+        Sanitizes, splits and sends generated HTML, falling back to plain text.
+
+    async def send_html_to(bot, chat_id, text, **kwargs) -> list[Message]:
+        Sanitizes, splits and sends generated HTML to a chat, falling back to plain text.
+
+    summarize(text, limit) -> str:
+        Summarizes generated HTML with the first sentence of every paragraph.
+
+    result_pages(text, size) -> list[str]:
+        Splits generated HTML into the pages read in low-bandwidth mode.
+
+    pager_keyboard(key, page, pages, lang, document) -> InlineKeyboardMarkup:
+        Returns the buttons to move between the pages of a result.
+
+    async def send_summary(message, user_data, key, text, document) -> Message:
+        Sends the summary of a stored result, with a button to read it page by page.
+
+    async def send_result(message, user_data, key, text, **kwargs) -> list[Message]:
+        Sends a stored result in full, or its summary in low-bandwidth mode.
+"""
+import re
+from functools import partial
+from html import escape
+from logging import getLogger
+from typing import Callable
+
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from telegram.constants import ParseMode
+from telegram.error import BadRequest
+
+from ..config import PAGE_CHARS, SUMMARY_CHARS
+from .artifacts import ArtifactStore
+from .catalog import catalog
+from .formatting import sanitize_html, split_html, strip_html
+from .metrics import Counter
+
+logger = getLogger(__name__)
+
+SENTENCE_RE = re.compile(r'.+?(?:[.!?؟](?=\s)|$)', re.S)
+
+delivered_bytes = Counter(
+    'raed_delivered_bytes_total', 'Bytes of the results sent to the users, by delivery mode.',
+    labels=('mode',))
+
+
+def persist_result(user_data: dict, key: str, text: str, *inputs: str) -> None:
+    """Stores a generated result before it is sent.
+
+    Args:
+        user_data (dict): The `context.user_data` of the user.
+        key (str): The key of the result, e.g. `tree_analysis`.
+        text (str): The generated result.
+        *inputs (str): The inputs the result was generated from.
+    """
+    user_data[key] = text
+    user_data['pending'] = {
+        'key': key, 'fingerprint': ArtifactStore.fingerprint(key, *inputs)
+    }
+
+
+def pending_result(user_data: dict, key: str, *inputs: str) -> str:
+    """Returns a stored result for the same inputs that was not delivered yet.
+
+    Args:
+        user_data (dict): The `context.user_data` of the user.
+        key (str): The key of the result.
+        *inputs (str): The inputs of the current request.
+
+    Returns:
+        str: The stored result, or None if it has to be generated.
+    """
+    pending: dict = user_data.get('pending') or {}
+    if pending.get('fingerprint') == ArtifactStore.fingerprint(key, *inputs):
+        logger.info("Resending undelivered %s instead of generating it again", key)
+        return user_data.get(key)
+    return None
+
+
+def clear_pending(user_data: dict) -> None:
+    """Marks the stored result as delivered.
+
+    Args:
+        user_data (dict): The `context.user_data` of the user.
+    """
+    user_data.pop('pending', None)
+
+
+async def _send_chunks(send: Callable, text: str, **kwargs) -> list[Message]:
+    """Sends generated HTML in chunks with `send`, falling back to plain text."""
+    chunks: list[str] = split_html(sanitize_html(text))
+    sent: list[Message] = []
+    for index, chunk in enumerate(chunks):
+        extra: dict = kwargs if index == len(chunks) - 1 else {}
+        delivered_bytes.inc(len(chunk.encode()), mode='full')
+        try:
+            sent.append(await send(chunk, parse_mode=ParseMode.HTML, **extra))
+        except BadRequest as e:
+            logger.warning("Sending as plain text, HTML was rejected: %s", e)
+            sent.append(await send(strip_html(chunk), **extra))
+    return sent
+
+
+async def send_html(message: Message, text: str, **kwargs) -> list[Message]:
+    """Sanitizes, splits and sends generated HTML as replies to the message.
+
+    Messages that Telegram fails to parse are sent again as plain text.
+
+    Args:
+        message (Message): The message to reply to.
+        text (str): The generated HTML.
+        **kwargs: Extra arguments for the last message, e.g. `reply_markup`.
+
+    Returns:
+        list[Message]: The sent messages.
+    """
+    return await _send_chunks(message.reply_text, text, **kwargs)
+
+
+async def send_html_to(bot: Bot, chat_id: int, text: str, **kwargs) -> list[Message]:
+    """Sanitizes, splits and sends generated HTML to a chat.
+
+    Messages that Telegram fails to parse are sent again as plain text.
+
+    Args:
+        bot (Bot): The bot sending the messages.
+        chat_id (int): The chat to send the messages to.
+        text (str): The generated HTML.
+        **kwargs: Extra arguments for the last message, e.g. `reply_markup`.
+
+    Returns:
+        list[Message]: The sent messages.
+    """
+    return await _send_chunks(partial(bot.send_message, chat_id), text, **kwargs)
+
+
+def summarize(text: str, limit: int = SUMMARY_CHARS) -> str:
+    """Summarizes generated HTML with the first sentence of every paragraph.
+
+    Args:
+        text (str): The generated HTML.
+        limit (int): The maximum characters of the summary.
+
+    Returns:
+        str: The summary, as escaped plain text.
+    """
+    sentences: list[str] = []
+    for paragraph in strip_html(sanitize_html(text)).split('\n'):
+        match = SENTENCE_RE.match(paragraph.strip())
+        if match:
+            sentences.append(match.group().strip())
+    summary: str = '\n'.join(sentences)
+    if len(summary) > limit:
+        summary = summary[:limit].rsplit(' ', 1)[0] + '…'
+    return escape(summary, quote=False)
+
+
+def result_pages(text: str, size: int = PAGE_CHARS) -> list[str]:
+    """Splits generated HTML into the pages read in low-bandwidth mode.
+
+    Args:
+        text (str): The generated HTML.
+        size (int): The maximum characters of a page.
+
+    Returns:
+        list[str]: The pages, each with balanced tags.
+    """
+    return split_html(sanitize_html(text), size)
+
+
+def pager_keyboard(key: str, page: int, pages: int, lang: str,
+                   document: bool = False) -> InlineKeyboardMarkup:
+    """Returns the buttons to move between the pages of a result.
+
+    Args:
+        key (str): The key of the result in the user's data.
+        page (int): The page shown, 0 for the summary.
+        pages (int): The number of pages of the result.
+        lang (str): The language of the user.
+        document (bool): Whether the result can also be downloaded as a DOCX file.
+
+    Returns:
+        InlineKeyboardMarkup: The buttons, `page:<key>:<page>` or `page:<key>:docx`.
+    """
+    row: list[InlineKeyboardButton] = []
+    if page > 1:
+        row.append(InlineKeyboardButton(
+            catalog.text('pager.previous', lang), callback_data=f'page:{key}:{page - 1}'))
+    if page < pages:
+        row.append(InlineKeyboardButton(
+            catalog.text('pager.next' if page else 'pager.more', lang,
+                         page=page + 1, pages=pages),
+            callback_data=f'page:{key}:{page + 1}'))
+    rows: list[list[InlineKeyboardButton]] = [row] if row else []
+    if document:
+        rows.append([InlineKeyboardButton(
+            catalog.text('pager.document', lang), callback_data=f'page:{key}:docx')])
+    return InlineKeyboardMarkup(rows)
+
+
+async def send_summary(message: Message, user_data: dict, key: str, text: str,
+                       document: bool = False) -> Message:
+    """Sends the summary of a stored result, with a button to read it page by page.
+
+    Args:
+        message (Message): The message to reply to.
+        user_data (dict): The `context.user_data` of the user, holding the result.
+        key (str): The key of the result in the user's data.
+        text (str): The generated HTML.
+        document (bool): Whether the result can also be downloaded as a DOCX file.
+
+    Returns:
+        Message: The sent summary.
+    """
+    lang: str = user_data.get('language_code')
+    summary: str = catalog.text('pager.summary', lang) + summarize(text)
+    delivered_bytes.inc(len(summary.encode()), mode='low_bandwidth')
+    return await message.reply_text(
+        summary, parse_mode=ParseMode.HTML,
+        reply_markup=pager_keyboard(key, 0, len(result_pages(text)), lang, document))
+
+
+async def send_result(message: Message, user_data: dict, key: str, text: str,
+                      **kwargs) -> list[Message]:
+    """Sends a stored result in full, or its summary in low-bandwidth mode.
+
+    Args:
+        message (Message): The message to reply to.
+        user_data (dict): The `context.user_data` of the user, holding the result.
+        key (str): The key of the result in the user's data.
+        text (str): The generated HTML.
+        **kwargs: Extra arguments for the last message of a full result.
+
+    Returns:
+        list[Message]: The sent messages.
+    """
+    if user_data.get('low_bandwidth'):
+        return [await send_summary(message, user_data, key, text)]
+    return await send_html(message, text, **kwargs)
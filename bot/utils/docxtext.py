@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""This module extracts the text of DOCX files without loading their object model.
+
+The main part of the document (`word/document.xml`) is parsed incrementally with
+lxml's iterparse, straight from the zip file: every paragraph and table row is
+emitted in document order as soon as it is read, and its elements are freed, so
+the memory used does not grow with the size of the document. Table rows are
+emitted as their cells separated by ` | `, which keeps budgets and logframes
+readable in the prompts. Reading stops once the character budget is reached.
+
+Only the text of the body is extracted, like `python-docx` paragraphs: headers,
+footers, footnotes and deleted revisions are left out.
+
+Functions:
+    iter_docx_text(buf, limit) -> Iterator[str]:
+        Yields the paragraphs and table rows of a DOCX file in document order.
+"""
+import zipfile
+from typing import IO, Iterator, Optional
+
+W: str = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+RELATIONSHIPS: str = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+OFFICE_DOCUMENT: str = (
+    'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument')
+CELL_SEPARATOR: str = ' | '
+
+# the text of a run, tabs and line breaks included
+TEXT_TAGS: dict[str, Optional[str]] = {
+    f'{W}t': None, f'{W}tab': '\t', f'{W}br': '\n', f'{W}cr': '\n',
+}
+
+
+def _main_part(archive: zipfile.ZipFile) -> str:
+    """Returns the name of the main part of the document, from the package relationships."""
+    from lxml import etree
+
+    try:
+        relationships = etree.fromstring(archive.read('_rels/.rels'))
+    except KeyError:
+        return 'word/document.xml'
+    for relationship in relationships.iter(RELATIONSHIPS):
+        if relationship.get('Type') == OFFICE_DOCUMENT:
+            return relationship.get('Target').lstrip('/')
+    return 'word/document.xml'
+
+
+def _paragraph_text(paragraph) -> str:
+    return ''.join(
+        element.text or '' if TEXT_TAGS[element.tag] is None else TEXT_TAGS[element.tag]
+        for element in paragraph.iter(*TEXT_TAGS))
+
+
+def iter_docx_text(buf: IO[bytes], limit: int = 0) -> Iterator[str]:
+    """Yields the paragraphs and table rows of a DOCX file in document order.
+
+    Args:
+        buf (IO[bytes]): The DOCX file.
+        limit (int): Characters after which the reading stops, 0 reads the whole file.
+
+    Yields:
+        str: A paragraph, or the cells of a table row separated by ` | `.
+    """
+    from lxml import etree
+
+    with zipfile.ZipFile(buf) as archive, archive.open(_main_part(archive)) as document:
+        # rows being read, and for each row its cells; a cell holds its paragraphs
+        rows: list[list[list[str]]] = []
+        emitted: int = 0
+        for event, element in etree.iterparse(
+                document, events=('start', 'end'), tag=(f'{W}p', f'{W}tr', f'{W}tc'),
+                resolve_entities=False, no_network=True, huge_tree=True):
+            tag: str = element.tag
+            if event == 'start':
+                if tag == f'{W}tr':
+                    rows.append([])
+                elif tag == f'{W}tc' and rows:
+                    rows[-1].append([])
+                continue
+
+            if tag == f'{W}tc':
+                continue
+            if tag == f'{W}p':
+                text: str = _paragraph_text(element)
+                if rows and rows[-1]:
+                    rows[-1][-1].append(text)
+                    text = None
+            else:
+                cells: list[list[str]] = rows.pop()
+                text = CELL_SEPARATOR.join(' '.join(filter(None, cell)) for cell in cells)
+                if rows and rows[-1]:
+                    # a table nested in a cell belongs to the text of the cell
+                    rows[-1][-1].append(text)
+                    text = None
+
+            if not rows:
+                # the element was read, free it and the siblings read before it
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+            if text is not None:
+                yield text
+                emitted += len(text) + 1
+                if limit and emitted >= limit:
+                    return
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""This module exports generated concept notes and proposals as DOCX files.
+
+The document template is loaded once and cached. Documents are rendered in the
+`export` worker pool so rendering never blocks the event loop.
+
+Functions:
+    is_rtl(text) -> bool:
+        Checks whether the text is mostly written in a right-to-left script.
+
+    render_docx(text, title) -> bytes:
+        Renders a generated paper into a DOCX file.
+
+    async def export_docx(text, title) -> bytes:
+        Renders a generated paper into a DOCX file in the export worker pool.
+"""
+import re
+from functools import lru_cache
+from html import unescape
+from io import BytesIO
+
+from ..config import EXPORT_TEMPLATE
+from .formatting import sanitize_html
+from .workers import run_blocking
+
+# a `<b>`-headed section, e.g. `<b>The Problem:</b> ...`
+HEADING_RE = re.compile(r'^\s*<b>([^<]+?)</b>\s*(.*)$', re.S)
+RUN_RE = re.compile(r'<(/?)([\w-]+)[^>]*>|([^<]+)')
+RTL_RE = re.compile(r'[\u0590-\u08FF\uFB1D-\uFDFF\uFE70-\uFEFC]')
+LTR_RE = re.compile(r'[A-Za-z]')
+
+
+def is_rtl(text: str) -> bool:
+    """Checks whether the text is mostly written in a right-to-left script.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        bool: True if the text has more Arabic (or Hebrew) letters than Latin letters.
+    """
+    return len(RTL_RE.findall(text)) > len(LTR_RE.findall(text))
+
+
+@lru_cache(maxsize=1)
+def _template() -> bytes:
+    """Loads the document template once.
+
+    Returns:
+        bytes: The `EXPORT_TEMPLATE` file, or a default template.
+    """
+    if EXPORT_TEMPLATE:
+        with open(EXPORT_TEMPLATE, 'rb') as f:
+            return f.read()
+
+    from docx import Document
+    from docx.oxml.ns import qn
+    from docx.shared import Pt
+
+    document = Document()
+    for name in ('Normal', 'Title', 'Heading 1'):
+        style = document.styles[name]
+        style.font.name = 'Arial'
+        # the complex script font is used for Arabic text.
+        style.element.get_or_add_rPr().get_or_add_rFonts().set(qn('w:cs'), 'Arial')
+    document.styles['Normal'].font.size = Pt(11)
+
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _set_rtl(paragraph) -> None:
+    """Marks a paragraph and its runs as right-to-left."""
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import OxmlElement
+
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    paragraph._p.get_or_add_pPr().append(OxmlElement('w:bidi'))
+    for run in paragraph.runs:
+        run._r.get_or_add_rPr().append(OxmlElement('w:rtl'))
+
+
+def _add_runs(paragraph, html: str) -> None:
+    """Adds the text of sanitized HTML to a paragraph, keeping bold, italic and underline."""
+    active: dict[str, int] = {}
+    for closing, tag, text in RUN_RE.findall(html):
+        if text:
+            run = paragraph.add_run(unescape(text))
+            run.bold = bool(active.get('b') or active.get('strong')) or None
+            run.italic = bool(active.get('i') or active.get('em')) or None
+            run.underline = bool(active.get('u') or active.get('ins')) or None
+        else:
+            active[tag] = active.get(tag, 0) + (-1 if closing else 1)
+
+
+def render_docx(text: str, title: str = None) -> bytes:
+    """Renders a generated paper into a DOCX file.
+
+    Lines starting with a bold heading (e.g. `<b>The Problem:</b>`) become
+    headings, the rest becomes body paragraphs. Arabic paragraphs are laid
+    out right-to-left.
+
+    Args:
+        text (str): The generated paper.
+        title (str, optional): The title of the document.
+
+    Returns:
+        bytes: The DOCX file.
+    """
+    from docx import Document
+
+    document = Document(BytesIO(_template()))
+    paragraphs: list = []
+    if title:
+        paragraphs.append(document.add_heading(title, level=0))
+
+    for line in sanitize_html(text).split('\n'):
+        if not line.strip():
+            continue
+        match = HEADING_RE.match(line)
+        if match and (match.group(1).strip().endswith(':') or not match.group(2).strip()):
+            paragraphs.append(document.add_heading(
+                unescape(match.group(1)).strip().rstrip(':'), level=1))
+            line = match.group(2)
+            if not line.strip():
+                continue
+        paragraph = document.add_paragraph()
+        _add_runs(paragraph, line.strip())
+        paragraphs.append(paragraph)
+
+    for paragraph in paragraphs:
+        if is_rtl(paragraph.text):
+            _set_rtl(paragraph)
+
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+async def export_docx(text: str, title: str = None) -> bytes:
+    """Renders a generated paper into a DOCX file in the export worker pool.
+
+    Args:
+        text (str): The generated paper.
+        title (str, optional): The title of the document.
+
+    Returns:
+        bytes: The DOCX file.
+    """
+    return await run_blocking('export', render_docx, text, title)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""This module prepares model output for Telegram's HTML parse mode.
+
+Functions:
+    sanitize_html(text) -> str:
+        Keeps the tags supported by Telegram, escapes everything else and balances the tags.
+
+    split_html(text, limit) -> list[str]:
+        Splits sanitized HTML into messages within the length limit, keeping tags balanced.
+
+    strip_html(text) -> str:
+        Converts sanitized HTML into plain text.
+"""
+import re
+from html import escape, unescape
+
+# Telegram rejects messages longer than 4096 characters.
+MAX_MESSAGE_LENGTH: int = 4096
+
+# tags supported by Telegram and the attributes each of them may keep.
+ALLOWED_TAGS: dict[str, tuple[str, ...]] = {
+    'b': (), 'strong': (), 'i': (), 'em': (), 'u': (), 'ins': (),
+    's': (), 'strike': (), 'del': (), 'tg-spoiler': (), 'pre': (),
+    'a': ('href',), 'span': ('class',), 'code': ('class',),
+    'blockquote': ('expandable',),
+}
+
+# common HTML tags from model output that are replaced by line breaks.
+BLOCK_TAGS: set[str] = {
+    'br', 'p', 'div', 'li', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr'
+}
+
+TAG_RE = re.compile(r'<\s*(/?)\s*([a-zA-Z][\w-]*)([^<>]*?)/?\s*>')
+ATTR_RE = re.compile(r'([\w-]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
+AMP_RE = re.compile(r'&(?!(?:lt|gt|amp|quot|#\d+|#x[0-9a-fA-F]+);)')
+ENTITY_RE = re.compile(r'&([a-zA-Z]\w*);')
+ATOM_RE = re.compile(r'<[^<>]*>|&[#\w]+;|\n\n|\n| |[^<&\n ]+|&')
+
+BREAK_PRIORITY: dict[str, int] = {'\n\n': 3, '\n': 2, ' ': 1}
+
+
+def _escape_text(text: str) -> str:
+    """Escapes a text run, keeping the entities Telegram understands."""
+    text = ENTITY_RE.sub(
+        lambda m: m.group() if m.group(1) in ('lt', 'gt', 'amp', 'quot')
+        else unescape(m.group()), text)
+    return AMP_RE.sub('&amp;', text).replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _opening_tag(name: str, attrs: str) -> str:
+    """Builds a normalized opening tag, or None if the tag would be rejected."""
+    kept: list[str] = []
+    for match in ATTR_RE.finditer(attrs):
+        attr: str = match.group(1).lower()
+        value: str = next((v for v in match.groups()[1:] if v is not None), None)
+        if attr not in ALLOWED_TAGS[name]:
+            continue
+        kept.append(attr if value is None else
+                    f'{attr}="{escape(unescape(value), quote=True)}"')
+
+    if name == 'a' and not any(attr.startswith('href=') for attr in kept):
+        return None
+    if name == 'span' and 'class="tg-spoiler"' not in kept:
+        return None
+    return f"<{' '.join([name, *kept])}>"
+
+
+def sanitize_html(text: str) -> str:
+    """Keeps the tags supported by Telegram, escapes everything else and balances the tags.
+
+    Args:
+        text (str): The model output.
+
+    Returns:
+        str: HTML that Telegram accepts.
+    """
+    out: list[str] = []
+    stack: list[str] = []
+    pos: int = 0
+
+    for match in TAG_RE.finditer(text):
+        out.append(_escape_text(text[pos:match.start()]))
+        pos = match.end()
+        closing, name, attrs = match.group(1), match.group(2).lower(), match.group(3)
+
+        if name in BLOCK_TAGS:
+            out.append('\n')
+        elif name not in ALLOWED_TAGS:
+            out.append(_escape_text(match.group()))
+        elif closing:
+            if name in stack:
+                # close the tags left open inside this one.
+                while stack:
+                    top = stack.pop()
+                    out.append(f'</{top}>')
+                    if top == name:
+                        break
+        else:
+            tag: str = _opening_tag(name, attrs)
+            if tag is not None:
+                out.append(tag)
+                stack.append(name)
+
+    out.append(_escape_text(text[pos:]))
+    out.extend(f'</{name}>' for name in reversed(stack))
+    return re.sub(r'\n{3,}', '\n\n', ''.join(out)).strip()
+
+
+def strip_html(text: str) -> str:
+    """Converts sanitized HTML into plain text.
+
+    Args:
+        text (str): Sanitized HTML.
+
+    Returns:
+        str: The text without tags and entities.
+    """
+    return unescape(re.sub(r'<[^<>]*>', '', text))
+
+
+def _apply(stack: tuple, atom: str) -> tuple:
+    """Returns the open tags after the given atom."""
+    if not atom.startswith('<'):
+        return stack
+    if atom.startswith('</'):
+        name: str = atom[2:-1]
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index][0] == name:
+                return stack[:index] + stack[index + 1:]
+        return stack
+    return stack + ((atom[1:-1].split(' ')[0], atom),)
+
+
+def _closers(stack: tuple) -> str:
+    """Returns the closing tags for the open tags."""
+    return ''.join(f'</{name}>' for name, _ in reversed(stack))
+
+
+def split_html(text: str, limit: int = MAX_MESSAGE_LENGTH) -> list[str]:
+    """Splits sanitized HTML into messages within the length limit.
+
+    Messages are split on paragraph boundaries where possible, then on line
+    breaks, then on spaces. Tags open at a split are closed at the end of the
+    message and reopened at the start of the next one.
+
+    Args:
+        text (str): Sanitized HTML, see `sanitize_html`.
+        limit (int): The maximum length of a message.
+
+    Returns:
+        list[str]: The messages.
+    """
+    atoms: list[str] = []
+    step: int = max(limit // 2, 1)
+    for atom in ATOM_RE.findall(text):
+        if atom.startswith('<') or len(atom) <= step:
+            atoms.append(atom)
+        else:
+            # words longer than half a message are cut.
+            atoms.extend(atom[i:i + step] for i in range(0, len(atom), step))
+
+    chunks: list[str] = []
+    stack: tuple = ()
+    start: int = 0
+    while start < len(atoms):
+        prefix: str = ''.join(opening for _, opening in stack)
+        length: int = len(prefix)
+        current: tuple = stack
+        breaks: list[tuple] = []
+        end: int = start
+
+        while end < len(atoms):
+            after: tuple = _apply(current, atoms[end])
+            if length + len(atoms[end]) + len(_closers(after)) > limit and end > start:
+                break
+            length += len(atoms[end])
+            current = after
+            end += 1
+            if atoms[end - 1] in BREAK_PRIORITY:
+                breaks.append((BREAK_PRIORITY[atoms[end - 1]], end, length, current))
+
+        if end < len(atoms) and breaks:
+            # prefer the strongest break in the second half of the message.
+            late = [b for b in breaks if b[2] >= length // 2] or breaks
+            _, end, _, current = max(late, key=lambda b: (b[0], b[1]))
+
+        body: str = prefix + ''.join(atoms[start:end])
+        chunk: str = body.strip() + _closers(current)
+        if strip_html(chunk).strip():
+            chunks.append(chunk)
+        start, stack = end, current
+    return chunks
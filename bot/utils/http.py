@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""This module serves small HTTP endpoints on the event loop.
+
+It only implements what the bot needs to receive webhook updates and serve
+internal endpoints: HTTP/1.1 requests with a `Content-Length` body, answered
+and closed one at a time.
+
+Classes:
+    Request: A parsed HTTP request.
+
+Functions:
+    async def serve_http(handler, host, port) -> asyncio.Server:
+        Serves HTTP requests with the handler.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from logging import getLogger
+from typing import Awaitable, Callable
+
+logger = getLogger(__name__)
+
+MAX_BODY_SIZE = 4 * 1024 * 1024
+
+
+@dataclass
+class Request:
+    """A parsed HTTP request.
+    """
+    method: str
+    path: str
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b''
+
+
+# a handler returns the status, the content type and the body of the response
+Handler = Callable[[Request], Awaitable[tuple[int, str, bytes]]]
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Request:
+    """Reads a request, or returns None if the connection sent an invalid one."""
+    line: bytes = await reader.readline()
+    try:
+        method, path, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        return None
+    headers: dict[str, str] = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length: int = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_SIZE:
+        return None
+    body: bytes = await reader.readexactly(length) if length else b''
+    return Request(method.upper(), path.split('?', 1)[0], headers, body)
+
+
+async def serve_http(handler: Handler, host: str, port: int) -> asyncio.Server:
+    """Serves HTTP requests with the handler.
+
+    Args:
+        handler (Handler): Returns the status, content type and body for a request.
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 picks a free one.
+
+    Returns:
+        asyncio.Server: The running server.
+    """
+    async def connected(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request: Request = await _read_request(reader)
+            if request is None:
+                status, content_type, body = 400, 'text/plain', b'Bad Request'
+            else:
+                try:
+                    status, content_type, body = await handler(request)
+                except Exception as e:
+                    logger.error("Error handling %s %s: %s", request.method, request.path, e)
+                    status, content_type, body = 500, 'text/plain', b'Internal Server Error'
+            writer.write(
+                f'HTTP/1.1 {int(status)} {HTTPStatus(status).phrase}\r\n'
+                f'Content-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode('latin-1') + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(connected, host, port)
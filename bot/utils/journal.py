@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""This module keeps a durable journal of generation jobs.
+
+Every model generation is recorded in a local SQLite database (in WAL mode) with
+its inputs, its state and its output, before the result is delivered:
+
+    running -> generated -> delivering -> delivered
+            -> failed
+
+Jobs that were still running or undelivered when the process stopped are
+generated again (or only delivered) on the next start, and sent to the chat
+they came from. Deliveries are claimed in the journal first, so a result is
+never sent twice. On shutdown the journal stops accepting jobs and waits for the
+running ones until a deadline, the others are left to the next start.
+
+New jobs go through the overload controller (see `bot/utils/overload.py`): while
+the model is overloaded they are served from the response cache, generated by the
+reduced model, or refused with `Overloaded` before they are recorded. Resumed jobs
+are never degraded.
+
+The tokens of every generation, and the results served from the cache, are
+accounted in the usage ledger (see `bot/utils/usage.py`), and new jobs of users
+who used their daily quota are refused with `QuotaExceeded`.
+
+Members of a workspace (see `bot/utils/workspaces.py`) share their results: a job
+whose kind and inputs were already generated for the workspace is served from it,
+and every generated result is saved to the workspace of its user.
+
+Classes:
+    JobJournal: The journal of generation jobs.
+    Interrupted: Raised when a job cannot finish because the bot is stopping.
+
+Attributes:
+    journal (JobJournal): The journal used by the handlers.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from logging import getLogger
+from typing import Any, Callable, Iterator
+
+from telegram import Bot
+from telegram.constants import ParseMode
+from telegram.error import Forbidden
+
+from ..config import JOURNAL_PATH
+from .artifacts import ArtifactStore
+from .catalog import catalog
+from .overload import (
+    CACHED, REDUCED, SHED, OverloadController, Overloaded, ResponseCache, overload_requests
+)
+from .usage import UsageLedger, ledger, measure
+from .workers import run_blocking
+from .workspaces import WorkspaceStore, workspaces
+
+logger = getLogger(__name__)
+
+# the model method generating every kind of job
+KINDS: dict[str, str] = {
+    'tree_analysis': 'problem_tree_analysis',
+    'swot_analysis': 'swot_analysis',
+    'pestel_analysis': 'pestel_analysis',
+    'concept_note': 'generate_concept_note',
+    'full_proposal': 'generate_full_proposal',
+}
+PAPERS: tuple[str, ...] = ('concept_note', 'full_proposal')
+UNFINISHED: tuple[str, ...] = ('running', 'generated', 'delivering')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER,
+    lang TEXT,
+    kind TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    state TEXT NOT NULL,
+    output TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, updated);
+"""
+
+
+class Interrupted(Exception):
+    """Raised when a job cannot finish because the bot is stopping.
+
+    The job stays in the journal and is resumed on the next start.
+    """
+
+
+class JobJournal:
+    """The journal of generation jobs.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH, model: Callable[[], Any] = None,
+                 reduced_model: Callable[[], Any] = None,
+                 overload: OverloadController = None, cache: ResponseCache = None,
+                 ledger: UsageLedger = None, workspaces: WorkspaceStore = None) -> None:
+        """Initializes the journal, the database is opened on first use.
+
+        Args:
+            path (str): The path of the SQLite database.
+            model (Callable[[], Any], optional): Returns the model generating the jobs,
+                `get_model` by default.
+            reduced_model (Callable[[], Any], optional): Returns the model generating the
+                jobs while the model is overloaded, `get_reduced_model` by default, or
+                `model` if only that one is given.
+            overload (OverloadController, optional): The overload controller.
+            cache (ResponseCache, optional): The cache of the results served while overloaded.
+            ledger (UsageLedger, optional): The ledger the usage is accounted in and the
+                quotas are checked with, none by default.
+            workspaces (WorkspaceStore, optional): The workspaces the results are shared
+                in, none by default.
+        """
+        self.path: str = path
+        self.closing: bool = False
+        self.overload: OverloadController = overload or OverloadController()
+        self.cache: ResponseCache = cache or ResponseCache()
+        self.ledger: UsageLedger = ledger
+        self.workspaces: WorkspaceStore = workspaces
+        self._model: Callable[[], Any] = model
+        self._reduced_model: Callable[[], Any] = reduced_model or model
+        self._db: sqlite3.Connection = None
+        self._deadline: float = None
+        self._tasks: dict[str, asyncio.Future] = {}
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The connection to the database, opened on first use."""
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    @staticmethod
+    def job_id(chat_id: int, kind: str, *args: Any) -> str:
+        """Identifies a job by its chat, kind and inputs, so duplicates share a job."""
+        return ArtifactStore.fingerprint(str(chat_id), kind, *map(str, args))
+
+    def get(self, job_id: str) -> dict:
+        """Returns a job, or None if it is not in the journal."""
+        row = self.db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def unfinished(self) -> list[dict]:
+        """Returns the jobs that were not delivered or failed, oldest first."""
+        rows = self.db.execute(
+            f"SELECT * FROM jobs WHERE state IN ({', '.join('?' * len(UNFINISHED))}) "
+            "ORDER BY created", UNFINISHED).fetchall()
+        return [dict(row) for row in rows]
+
+    def _record(self, job_id: str, chat_id: int, user_id: int, lang: str,
+                kind: str, args: tuple) -> None:
+        """Records a running job, unless the same job is already unfinished."""
+        now: float = time.time()
+        self.db.execute(
+            "INSERT INTO jobs (id, chat_id, user_id, lang, kind, inputs, state, created, updated) "
+            "VALUES (?, ?, ?, ?, ?, ?, 'running', ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET state = 'running', output = NULL, error = NULL, "
+            "lang = excluded.lang, created = excluded.created, updated = excluded.updated "
+            "WHERE jobs.state IN ('delivered', 'failed')",
+            (job_id, chat_id, user_id, lang, kind, json.dumps(args), now, now))
+
+    def _served(self, job_id: str, chat_id: int, user_id: int, lang: str,
+                kind: str, args: tuple, output: str) -> str:
+        """Records a job served without the model as generated, so its delivery is
+        claimed like any other, even when the same job was delivered before."""
+        now: float = time.time()
+        self.db.execute(
+            "INSERT INTO jobs (id, chat_id, user_id, lang, kind, inputs, state, output, "
+            "created, updated) VALUES (?, ?, ?, ?, ?, ?, 'generated', ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET state = 'generated', output = excluded.output, "
+            "error = NULL, lang = excluded.lang, created = excluded.created, "
+            "updated = excluded.updated WHERE jobs.state IN ('running', 'delivered', 'failed')",
+            (job_id, chat_id, user_id, lang, kind, json.dumps(args), output, now, now))
+        return output
+
+    def _set(self, job_id: str, state: str, where: str = None, **fields: Any) -> bool:
+        """Moves a job to a state, optionally only from the `where` state."""
+        fields.update(state=state, updated=time.time())
+        query: str = (f"UPDATE jobs SET {', '.join(f'{key} = ?' for key in fields)} "
+                      "WHERE id = ?")
+        params: list = [*fields.values(), job_id]
+        if where:
+            query += ' AND state = ?'
+            params.append(where)
+        return self.db.execute(query, params).rowcount == 1
+
+    def adopt(self, path: str) -> int:
+        """Moves the unfinished jobs of another journal into this one, then removes it.
+
+        Args:
+            path (str): The path of the other journal, e.g. of a worker that no longer runs.
+
+        Returns:
+            int: The number of adopted jobs.
+        """
+        other = sqlite3.connect(path)
+        other.row_factory = sqlite3.Row
+        try:
+            rows: list[sqlite3.Row] = other.execute(
+                f"SELECT * FROM jobs WHERE state IN ({', '.join('?' * len(UNFINISHED))})",
+                UNFINISHED).fetchall()
+        finally:
+            other.close()
+        for row in rows:
+            self.db.execute(
+                f"INSERT OR IGNORE INTO jobs ({', '.join(row.keys())}) "
+                f"VALUES ({', '.join('?' * len(row))})", tuple(row))
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return len(rows)
+
+    def prune(self, age: float = 7 * 24 * 3600) -> int:
+        """Removes delivered and failed jobs older than `age` seconds.
+
+        Returns:
+            int: The number of removed jobs.
+        """
+        return self.db.execute(
+            "DELETE FROM jobs WHERE state IN ('delivered', 'failed') AND updated < ?",
+            (time.time() - age,)).rowcount
+
+    async def generate(self, chat_id: int, user_id: int, lang: str, kind: str,
+                       *args: Any, resumed: bool = False, **kwargs: Any) -> str:
+        """Generates a result in the generation worker pool, recording it in the journal.
+
+        A job already generated but not delivered is not generated again, and a job
+        that is already running is awaited instead of being started twice. A job
+        already generated in the user's workspace is served from it. While the
+        model is overloaded, a new job is served from the response cache,
+        generated by the reduced model or refused. A job served from the workspace
+        or the cache is journaled as generated, so the caller claims its delivery
+        as usual.
+
+        Args:
+            chat_id (int): The chat the result is delivered to.
+            user_id (int): The user requesting the result.
+            lang (str): The language of the user.
+            kind (str): The kind of job, a key of `KINDS`.
+            *args (Any): The inputs of the model method.
+            resumed (bool): Whether the job was left unfinished by a previous run, it
+                is then never degraded.
+            **kwargs (Any): Extra arguments of the model method that are not journaled,
+                e.g. the `store` of a paper.
+
+        Returns:
+            str: The generated result, None if the model returned no response.
+
+        Raises:
+            Interrupted: If the bot is stopping before the job finishes.
+            Overloaded: If the model is overloaded and the result is not cached.
+            QuotaExceeded: If the user or their organization used their daily tokens.
+        """
+        job_id: str = self.job_id(chat_id, kind, *args)
+        if job_id not in self._tasks:
+            job: dict = self.get(job_id)
+            if job and job['state'] in ('generated', 'delivering'):
+                return job['output']
+            shared: str = (self.workspaces.result(user_id, kind, *args)
+                           if self.workspaces and not resumed else None)
+            if shared:
+                if self.ledger:
+                    self.ledger.record(user_id, kind, cached=True)
+                return self._served(job_id, chat_id, user_id, lang, kind, args, shared)
+            level: int = 0 if resumed else self.overload.update(len(self._tasks))
+            if level >= CACHED:
+                # results of the reduced model are only served while overloaded
+                cached: str = (self.cache.get(self.cache.key(kind, *args))
+                               or self.cache.get(self.cache.key(f'{kind}:reduced', *args)))
+                if cached:
+                    overload_requests.inc(outcome='cached')
+                    if self.ledger:
+                        self.ledger.record(user_id, kind, cached=True)
+                    return self._served(job_id, chat_id, user_id, lang, kind, args, cached)
+            if level >= SHED:
+                overload_requests.inc(outcome='shed')
+                raise Overloaded(self.overload.estimated_wait(len(self._tasks)))
+            if self.ledger and not resumed:
+                self.ledger.check(user_id)
+            self._record(job_id, chat_id, user_id, lang, kind, args)
+            if self.closing:
+                raise Interrupted(f"Not starting {kind}, the bot is stopping")
+            if level >= REDUCED:
+                overload_requests.inc(outcome='reduced')
+            self._start(job_id, user_id, kind, args, kwargs, reduced=level >= REDUCED)
+        return await self._wait(self._tasks[job_id])
+
+    def _start(self, job_id: str, user_id: int, kind: str, args: tuple, kwargs: dict,
+               reduced: bool = False) -> None:
+        """Starts generating a job in the generation worker pool, with the reduced model if asked."""
+        async def generate() -> str:
+            started: float = time.monotonic()
+            try:
+                if self._model is None:
+                    from ..gemini.base import get_model, get_reduced_model
+                    self._model = get_model
+                    self._reduced_model = self._reduced_model or get_reduced_model
+                model: Callable[[], Any] = self._reduced_model if reduced else self._model
+                method: Callable = getattr(model(), KINDS[kind])
+                output, tokens = await run_blocking(
+                    'generation', measure, method, *args, **kwargs)
+            except Exception as e:
+                self.overload.observe(time.monotonic() - started, False)
+                self._set(job_id, 'failed', error=str(e))
+                raise
+            finally:
+                self._tasks.pop(job_id, None)
+            seconds: float = time.monotonic() - started
+            self.overload.observe(seconds, bool(output))
+            if self.ledger:
+                self.ledger.record(user_id, kind, seconds=seconds, **tokens)
+            if output:
+                self._set(job_id, 'generated', output=output)
+                if reduced:
+                    # kept apart, so the full model answers again once the load drops
+                    self.cache.put(self.cache.key(f'{kind}:reduced', *args), output)
+                else:
+                    self.cache.put(self.cache.key(kind, *args), output)
+                    if self.workspaces:
+                        self.workspaces.save_result(user_id, kind, args, output)
+            else:
+                self._set(job_id, 'failed', error='The model returned no response')
+            return output
+
+        self._tasks[job_id] = asyncio.ensure_future(generate())
+
+    async def _wait(self, task: asyncio.Future) -> str:
+        """Waits for a job, until the drain deadline once the journal is closing."""
+        loop = asyncio.get_running_loop()
+        while not task.done():
+            if self._deadline is not None and loop.time() >= self._deadline:
+                task.add_done_callback(self._abandoned)
+                raise Interrupted("The job did not finish before the drain deadline")
+            await asyncio.wait({task}, timeout=1)
+        return task.result()
+
+    @contextmanager
+    def delivering(self, job_id: str) -> Iterator[bool]:
+        """Claims the delivery of a job.
+
+        Yields True if the caller owns the delivery, False if the job is delivered
+        by someone else. The job is marked as delivered when the block succeeds, or
+        made available again when it fails. Jobs missing from the journal are owned.
+
+        Args:
+            job_id (str): The id of the job.
+        """
+        claimed: bool = self._set(job_id, 'delivering', where='generated')
+        owned: bool = claimed or self.get(job_id) is None
+        try:
+            yield owned
+        except BaseException:
+            if claimed:
+                self._set(job_id, 'generated', where='delivering')
+            raise
+        if claimed:
+            self._set(job_id, 'delivered', where='delivering')
+
+    def close(self, timeout: float) -> None:
+        """Stops accepting jobs and lets the running ones finish within `timeout` seconds.
+
+        Args:
+            timeout (float): Seconds the running jobs may take to finish.
+        """
+        self.closing = True
+        self._deadline = asyncio.get_running_loop().time() + timeout
+        logger.info("Journal closing, draining %s running jobs for up to %s seconds",
+                    len(self._tasks), timeout)
+
+    async def drain(self) -> None:
+        """Waits for the running jobs until the drain deadline."""
+        loop = asyncio.get_running_loop()
+        while self._tasks and (self._deadline is None or loop.time() < self._deadline):
+            await asyncio.wait(list(self._tasks.values()), timeout=1)
+        if self._tasks:
+            logger.warning("%s jobs are left to the next start", len(self._tasks))
+            for task in self._tasks.values():
+                task.add_done_callback(self._abandoned)
+
+    @staticmethod
+    def _abandoned(task: asyncio.Future) -> None:
+        """Retrieves the outcome of a job nobody waits for anymore, so it is not reported
+        as never retrieved. The job stays in the journal to be resumed."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.info("Abandoned job failed: %s", task.exception())
+
+    async def resume(self, bot: Bot) -> None:
+        """Generates and delivers the jobs left unfinished by a previous run.
+
+        Jobs whose delivery was interrupted are not sent again, as they may
+        already have reached the user.
+
+        Args:
+            bot (Bot): The bot delivering the results.
+        """
+        jobs: list[dict] = self.unfinished()
+        if jobs:
+            logger.info("Resuming %s unfinished jobs", len(jobs))
+        for job in jobs:
+            try:
+                if job['state'] == 'delivering':
+                    logger.warning(
+                        "Delivery of job %s was interrupted, not resending it", job['id'])
+                    self._set(job['id'], 'delivered', where='delivering')
+                    continue
+                output: str = await self.generate(
+                    job['chat_id'], job['user_id'], job['lang'], job['kind'],
+                    *json.loads(job['inputs']), resumed=True)
+                if not output:
+                    continue
+                with self.delivering(job['id']) as owned:
+                    if owned:
+                        await self._deliver(bot, job, output)
+            except Interrupted:
+                break
+            except Forbidden as e:
+                self._set(job['id'], 'failed', error=str(e))
+            except Exception as e:
+                logger.error("Error resuming job %s: %s", job['id'], e)
+
+    @staticmethod
+    async def _deliver(bot: Bot, job: dict, output: str) -> None:
+        """Sends the result of a resumed job to its chat."""
+        from .delivery import send_html_to
+        from .export import export_docx
+
+        lang: str = job['lang']
+        await bot.send_message(
+            job['chat_id'], catalog.text('journal.resumed', lang), parse_mode=ParseMode.HTML)
+        if job['kind'] in PAPERS:
+            try:
+                document: bytes = await export_docx(
+                    output, catalog.text(f"paper.{job['kind']}_title", lang))
+                await bot.send_document(
+                    job['chat_id'], document, filename=f"{job['kind']}.docx",
+                    caption=catalog.text('paper.document', lang))
+                return
+            except Exception as e:
+                logger.error("Error exporting resumed %s, sending it as text: %s", job['kind'], e)
+        await send_html_to(bot, job['chat_id'], output)
+
+
+journal: JobJournal = JobJournal(ledger=ledger, workspaces=workspaces)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""This module logs through a queue to a background thread, as JSON lines.
+
+Logging a record only adds the context of the running conversation callback to it
+and puts it in a bounded queue: the message is formatted and written to the file
+by a background thread, so logging never blocks the event loop. When the queue is
+full the record is dropped and counted instead. INFO and DEBUG records can be
+sampled with `LOG_SAMPLE_RATE`, warnings and errors are always kept.
+
+Every line of the log file is a JSON object with the fields `time`, `level`,
+`logger`, `message`, `update_id`, `user_id`, `chat_id`, `state` and `handler`, and
+`exception` for errors logged with a traceback.
+
+Classes:
+    ContextFilter: Adds the context of the running conversation callback to records.
+    SamplingFilter: Keeps a fraction of the INFO and DEBUG records.
+    DroppingQueueHandler: Queues records without blocking, dropping them when full.
+    JsonFormatter: Formats records as JSON lines.
+
+Functions:
+    setup_logging(filename) -> QueueListener:
+        Logs to a file rotated every midnight, from a background thread.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+from ..config import LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+from .metrics import Counter
+from .sessions import current_callback
+
+CONTEXT_FIELDS: tuple[str, ...] = ('update_id', 'user_id', 'chat_id', 'state', 'handler')
+
+dropped_records = Counter(
+    'raed_log_dropped_total', 'Log records dropped because the log queue was full.',
+    labels=('level',))
+sampled_records = Counter(
+    'raed_log_sampled_total', 'INFO and DEBUG log records left out by sampling.')
+
+
+class ContextFilter(logging.Filter):
+    """Adds the context of the running conversation callback to records.
+
+    It runs in the thread logging the record, where the callback is known: the
+    worker pools run their work in a copy of the context of the callback.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        callback: dict = current_callback.get() or {}
+        for name in CONTEXT_FIELDS:
+            if not hasattr(record, name):
+                setattr(record, name, callback.get(name))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the INFO and DEBUG records.
+    """
+
+    def __init__(self, rate: float = LOG_SAMPLE_RATE) -> None:
+        """Initializes the filter.
+
+        Args:
+            rate (float): The fraction of the INFO and DEBUG records kept.
+        """
+        super().__init__()
+        self.rate: float = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.rate >= 1 or random.random() < self.rate:
+            return True
+        sampled_records.inc()
+        return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without blocking, dropping them when the queue is full.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # the message is formatted by the listener, off the thread that logged it.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(level=record.levelname)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line: dict = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name in CONTEXT_FIELDS:
+            line[name] = getattr(record, name, None)
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+        return json.dumps(line, ensure_ascii=False, default=str)
+
+
+def setup_logging(filename: str = 'logs/bot.log') -> logging.handlers.QueueListener:
+    """Logs to a file rotated every midnight, from a background thread.
+
+    Args:
+        filename (str): The log file, every process needs its own.
+
+    Returns:
+        logging.handlers.QueueListener: The listener writing the records, stopped at exit.
+    """
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    # file handler for logs, only used by the listener thread.
+    file_handler = logging.handlers.TimedRotatingFileHandler(
+        filename=filename,
+        when='midnight',
+        interval=1,
+        backupCount=7,
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.setLevel(logging.INFO)
+
+    records: queue.Queue = queue.Queue(LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(records)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(ContextFilter())
+
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    # reduce httpx
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    listener = logging.handlers.QueueListener(
+        records, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""This module keeps the memory used by `context.user_data` bounded.
+
+`UserData` is used as the `user_data` type of the application. Large values (extracted
+documents, analyses, paper sections) are compressed transparently when they are stored.
+Every user has a byte budget, and when all users together exceed the total budget the
+values of the least recently used users are spilled to disk. Spilled values are loaded
+back on their next access.
+
+The manager only keeps weak references to the data of the users, so the data of a
+user dropped by the application is released with it, and users whose conversation
+ended or was swept are released from its list of users to spill.
+
+Classes:
+    UserData: A dict that compresses large values and reports its size to the manager.
+    MemoryManager: Accounts the memory of every user and spills values to disk.
+
+Attributes:
+    manager (MemoryManager): The manager shared by every `UserData`.
+"""
+import os
+import pickle
+from copy import deepcopy
+import shutil
+import sys
+import weakref
+import zlib
+from collections import OrderedDict
+from logging import getLogger
+from typing import Any
+from uuid import uuid4
+
+from ..config import (
+    COMPRESS_THRESHOLD, USER_MEMORY_BUDGET,
+    TOTAL_MEMORY_BUDGET, SPILL_DIR
+)
+
+logger = getLogger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compress(data: bytes) -> bytes:
+    """Compresses with zstd when it is installed, zlib otherwise."""
+    if zstandard is not None:
+        return b'Z' + zstandard.ZstdCompressor(level=3).compress(data)
+    return b'z' + zlib.compress(data, 6)
+
+
+def _decompress(data: bytes) -> bytes:
+    """Decompresses data produced by `_compress`."""
+    if data[:1] == b'Z':
+        return zstandard.ZstdDecompressor().decompress(data[1:])
+    return zlib.decompress(data[1:])
+
+
+class _Blob:
+    """A compressed value, kept in memory or spilled to disk."""
+
+    __slots__ = ('data', 'path', 'pickled', 'size')
+
+    def __init__(self, value: Any) -> None:
+        self.pickled: bool = not isinstance(value, str)
+        raw: bytes = (pickle.dumps(value, pickle.HIGHEST_PROTOCOL) if self.pickled
+                      else value.encode('utf-8'))
+        self.data: bytes = _compress(raw)
+        self.path: str = None
+        self.size: int = len(self.data)
+
+    def load(self) -> Any:
+        """Returns the original value."""
+        data: bytes = self.data
+        if data is None:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        raw: bytes = _decompress(data)
+        return pickle.loads(raw) if self.pickled else raw.decode('utf-8')
+
+    def spill(self, path: str) -> None:
+        """Moves the compressed value to disk."""
+        with open(path, 'wb') as f:
+            f.write(self.data)
+        self.path, self.data = path, None
+
+    def unspill(self) -> None:
+        """Moves the compressed value back to memory."""
+        with open(self.path, 'rb') as f:
+            self.data = f.read()
+        self.discard()
+
+    def discard(self) -> None:
+        """Removes the spilled copy from disk."""
+        if self.path:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
+    @property
+    def in_memory(self) -> int:
+        """The bytes this value keeps in memory."""
+        return self.size if self.data is not None else 0
+
+
+def _sizeof(value: Any) -> int:
+    """Estimates the bytes a value keeps in memory, without serializing it."""
+    if isinstance(value, _Blob):
+        return value.in_memory
+    if isinstance(value, str):
+        return len(value) if value.isascii() else len(value.encode('utf-8'))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_sizeof(key) + _sizeof(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sum(_sizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoryManager:
+    """Accounts the memory of every user and spills values to disk.
+    """
+
+    def __init__(self, user_budget: int = USER_MEMORY_BUDGET,
+                 total_budget: int = TOTAL_MEMORY_BUDGET,
+                 spill_dir: str = SPILL_DIR) -> None:
+        """Initializes the manager.
+
+        Args:
+            user_budget (int): The bytes a single user may keep in memory.
+            total_budget (int): The bytes all users together may keep in memory.
+            spill_dir (str): The directory spilled values are written to.
+        """
+        self.user_budget: int = user_budget
+        self.total_budget: int = total_budget
+        self.spill_dir: str = spill_dir
+        self.total: int = 0
+        # least recently used first, the data of a user is released with it
+        self._users: OrderedDict[str, weakref.ref] = OrderedDict()
+        self._held: dict[str, int] = {}
+        self._cleaned: bool = False
+
+    def touch(self, data: 'UserData') -> None:
+        """Marks the user as the most recently used one."""
+        if data.key not in self._held:
+            self._held[data.key] = 0
+            weakref.finalize(data, self._collected, data.key)
+        self._users[data.key] = weakref.ref(data)
+        self._users.move_to_end(data.key)
+
+    def resized(self, data: 'UserData', delta: int, key: str = None) -> None:
+        """Accounts a change in the size of a user's data and enforces the budgets.
+
+        Args:
+            data (UserData): The data of the user.
+            delta (int): The change of its size in bytes.
+            key (str, optional): The value that changed, it is not spilled.
+        """
+        self.total += delta
+        self._held[data.key] = data.size
+        if data.size > self.user_budget:
+            self._spill(data, data.size - self.user_budget, key)
+        for user in list(self._users):
+            if self.total <= self.total_budget:
+                break
+            other: 'UserData' = self._users[user]() if user != data.key else None
+            if other is not None:
+                self._spill(other, other.size)
+
+    def release(self, data: 'UserData') -> None:
+        """Stops considering a user for spilling, e.g. when their conversation ended.
+
+        The user is considered again on the next access to their data.
+        """
+        self._users.pop(data.key, None)
+
+    def forget(self, data: 'UserData') -> None:
+        """Stops tracking a user and removes their spilled values."""
+        self._users.pop(data.key, None)
+        shutil.rmtree(os.path.join(self.spill_dir, data.key), ignore_errors=True)
+
+    def _collected(self, key: str) -> None:
+        """Releases the accounting of the data of a user that was garbage collected."""
+        self.total -= self._held.pop(key, 0)
+        self._users.pop(key, None)
+        shutil.rmtree(os.path.join(self.spill_dir, key), ignore_errors=True)
+
+    def _spill(self, data: 'UserData', needed: int, keep: str = None) -> None:
+        """Spills the largest values of a user until enough bytes are released,
+        except the value `keep` that is being used."""
+        if not self._cleaned:
+            # values spilled by a previous run belong to users that are gone.
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self._cleaned = True
+        path: str = os.path.join(self.spill_dir, data.key)
+        os.makedirs(path, exist_ok=True)
+        blobs = sorted(
+            ((key, value) for key, value in data.raw_items()
+             if isinstance(value, _Blob) and value.data is not None and key != keep),
+            key=lambda item: item[1].size, reverse=True
+        )
+        for key, blob in blobs:
+            if needed <= 0:
+                break
+            size: int = blob.in_memory
+            blob.spill(os.path.join(path, f'{uuid4().hex}.bin'))
+            data.released(key, size)
+            needed -= size
+            logger.info("Spilled %s bytes of '%s' for user %s", size, key, data.user_id)
+
+    def report(self) -> dict:
+        """Reports the memory used per user and in total.
+
+        Returns:
+            dict: The `total` bytes in memory, and the `users` bytes in memory and on disk by user id.
+        """
+        return {
+            'total': self.total,
+            'users': {
+                data.user_id: {'memory': data.size, 'disk': data.spilled}
+                for data in (ref() for ref in list(self._users.values())) if data is not None
+            }
+        }
+
+
+manager: MemoryManager = MemoryManager()
+
+
+class UserData(dict):
+    """A dict that compresses large values and reports its size to the manager.
+
+    Values are compressed and decompressed transparently, so the handlers use
+    it like a regular dict. Mutating a value obtained from it does not update the
+    stored copy, values have to be assigned again.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initializes the data of a single user."""
+        super().__init__()
+        self.key: str = uuid4().hex
+        self.size: int = 0
+        self._sizes: dict[str, int] = {}
+        self.update(*args, **kwargs)
+
+    def _encode(self, value: Any) -> Any:
+        """Compresses large values."""
+        if isinstance(value, (str, dict, list)) and _sizeof(value) >= COMPRESS_THRESHOLD:
+            return _Blob(value)
+        return value
+
+    def _decode(self, key: str, value: Any) -> Any:
+        """Returns the original value, loading spilled values back into memory."""
+        if not isinstance(value, _Blob):
+            return value
+        if value.data is None:
+            value.unspill()
+            self._account(key, value)
+        return value.load()
+
+    def _account(self, key: str, value: Any) -> None:
+        """Updates the size of a value and reports the change to the manager."""
+        size: int = _sizeof(value) if value is not None else 0
+        delta: int = size - self._sizes.pop(key, 0)
+        if value is not None:
+            self._sizes[key] = size
+        self.size += delta
+        manager.touch(self)
+        manager.resized(self, delta, key)
+
+    def released(self, key: str, size: int) -> None:
+        """Accounts bytes the manager released by spilling a value."""
+        self._sizes[key] -= size
+        self.size -= size
+        manager.total -= size
+        manager._held[self.key] = self.size
+
+    @property
+    def user_id(self) -> Any:
+        """The Telegram id of the user, or the internal key before `/start`."""
+        return super().get('id', self.key)
+
+    @property
+    def spilled(self) -> int:
+        """The bytes of this user's values kept on disk."""
+        return sum(value.size for value in super().values()
+                   if isinstance(value, _Blob) and value.data is None)
+
+    def raw_items(self):
+        """Returns the stored items without decoding them."""
+        return list(super().items())
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._decode(key, super().__getitem__(key))
+        manager.touch(self)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        old = super().get(key)
+        if isinstance(old, _Blob):
+            old.discard()
+        value = self._encode(value)
+        super().__setitem__(key, value)
+        self._account(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        old = super().pop(key)
+        if isinstance(old, _Blob):
+            old.discard()
+        self._account(key, None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def pop(self, key: str, *default: Any) -> Any:
+        if key not in self:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def setdefault(self, key: str, default: Any = None) -> Any:
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self) -> None:
+        for key in list(self):
+            del self[key]
+        manager.forget(self)
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def copy(self) -> dict:
+        return dict(self.items())
+
+    def __reduce__(self):
+        return (UserData, (self.copy(),))
+
+    def __deepcopy__(self, memo: dict) -> dict:
+        # copies (e.g. handed to the persistence) are plain dicts, so they are
+        # not accounted by the manager.
+        return deepcopy(self.copy(), memo)
+
+    def __repr__(self) -> str:
+        return f'UserData({len(self)} keys, {self.size} bytes)'
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""This module provides in-process metrics in the style of Prometheus.
+
+The metrics are served in the Prometheus text format on `/metrics` by `serve_metrics`.
+They are also updated from the worker threads, so every metric updates and renders
+its series under a lock of its own.
+
+Classes:
+    Counter: A value that only goes up.
+    Gauge: A value that goes up and down.
+    Histogram: Observations counted in buckets.
+
+Functions:
+    render() -> str:
+        Renders every metric in the Prometheus text format.
+
+    async def serve_metrics(host, port) -> asyncio.Server:
+        Serves the metrics on `/metrics`.
+
+Attributes:
+    registry (dict[str, Metric]): Every metric by name.
+"""
+import asyncio
+import threading
+from bisect import bisect_left
+from typing import Callable, Iterable
+
+from .http import Request, serve_http
+
+registry: dict[str, 'Metric'] = {}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    """Escapes a label value of the text format."""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    """Formats a sample value of the text format."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric with optional labels.
+    """
+
+    kind: str = 'untyped'
+
+    def __new__(cls, name: str, *args, **kwargs):
+        # metrics are registered once, defining them again returns the existing one.
+        if name in registry:
+            return registry[name]
+        return super().__new__(cls)
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()) -> None:
+        """Registers the metric.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): What the metric measures.
+            labels (Iterable[str]): The names of the labels of the metric.
+        """
+        if name in registry:
+            return
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labels: tuple[str, ...] = tuple(labels)
+        self.values: dict[tuple, float] = {}
+        self._lock: threading.Lock = threading.Lock()
+        registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        """Returns the label values in the order of the label names."""
+        return tuple(str(labels.get(name, '')) for name in self.labels)
+
+    def _labels(self, key: tuple, **extra: str) -> str:
+        """Returns the labels of a series in the text format, e.g. `{pool="api"}`."""
+        pairs: list[tuple[str, str]] = list(zip(self.labels, key)) + list(extra.items())
+        if not pairs:
+            return ''
+        return '{' + ','.join(
+            f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> Iterable[tuple[str, float]]:
+        """Yields the name with labels and the value of every series."""
+        for key, value in list(self.values.items()):
+            yield self.name + self._labels(key), value
+
+    def render(self) -> str:
+        """Renders the metric in the Prometheus text format."""
+        lines: list[str] = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        with self._lock:
+            samples: list[tuple[str, float]] = list(self.samples())
+        lines.extend(f'{series} {_number(value)}' for series, value in samples)
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """A value that only goes up.
+    """
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increases the counter.
+
+        Args:
+            amount (float): The amount to add.
+            **labels (str): The label values.
+        """
+        key: tuple = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()) -> None:
+        if name in registry:
+            return
+        super().__init__(name, documentation, labels)
+        self.functions: dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Sets the gauge.
+
+        Args:
+            value (float): The new value.
+            **labels (str): The label values.
+        """
+        key: tuple = self._key(labels)
+        with self._lock:
+            self.values[key] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increases the gauge."""
+        key: tuple = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        """Decreases the gauge."""
+        self.inc(-amount, **labels)
+
+    def track(self, function: Callable[[], float], **labels: str) -> None:
+        """Sets the gauge to the value of a function whenever the metrics are rendered.
+
+        Args:
+            function (Callable[[], float]): Returns the current value, e.g. `queue.qsize`.
+            **labels (str): The label values.
+        """
+        self.functions[self._key(labels)] = function
+
+    def samples(self) -> Iterable[tuple[str, float]]:
+        for key, function in list(self.functions.items()):
+            self.values[key] = function()
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Observations counted in buckets.
+    """
+
+    kind = 'histogram'
+
+    DEFAULT_BUCKETS: tuple[float, ...] = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+    )
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        """Registers the histogram.
+
+        Args:
+            name (str): The name of the metric.
+            documentation (str): What the metric measures.
+            labels (Iterable[str]): The names of the labels of the metric.
+            buckets (Iterable[float]): The upper bounds of the buckets.
+        """
+        if name in registry:
+            return
+        super().__init__(name, documentation, labels)
+        self.buckets: tuple[float, ...] = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Records an observation.
+
+        Args:
+            value (float): The observed value.
+            **labels (str): The label values.
+        """
+        key: tuple = self._key(labels)
+        index: int = bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self.values:
+                self.values[key] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0
+                }
+            series: dict = self.values[key]
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self) -> Iterable[tuple[str, float]]:
+        # the buckets are stored apart and rendered cumulative.
+        for key, series in list(self.values.items()):
+            cumulative: int = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                yield self.name + '_bucket' + self._labels(key, le=_number(float(bound))), cumulative
+            yield self.name + '_bucket' + self._labels(key, le='+Inf'), series['count']
+            yield self.name + '_sum' + self._labels(key), series['sum']
+            yield self.name + '_count' + self._labels(key), series['count']
+
+
+def render() -> str:
+    """Renders every metric in the Prometheus text format.
+
+    Returns:
+        str: The metrics.
+    """
+    return ''.join(metric.render() + '\n' for metric in list(registry.values()))
+
+
+async def serve_metrics(host: str, port: int) -> asyncio.Server:
+    """Serves the metrics on `/metrics`.
+
+    Args:
+        host (str): The address to listen on, keep it local.
+        port (int): The port to listen on, 0 picks a free one.
+
+    Returns:
+        asyncio.Server: The running server.
+    """
+    async def handle(request: Request) -> tuple[int, str, bytes]:
+        if request.method != 'GET' or request.path != '/metrics':
+            return 404, 'text/plain', b'Not Found'
+        return 200, CONTENT_TYPE, render().encode()
+
+    return await serve_http(handle, host, port)
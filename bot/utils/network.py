@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""This module builds the connections of the bot to the Bot API.
+
+The bot uses three connection pools, each with its own size and timeouts, so one
+kind of traffic cannot starve another:
+
+    updates: the long polling `getUpdates` requests.
+    api: every other API call, e.g. sending messages.
+    files: file downloads and uploads, e.g. the documents of the users.
+
+HTTP/2 is used when the `h2` package is installed. Every pool reports the
+connections in use, its utilization and the duration of its requests. Large
+downloads, e.g. the voice messages, are streamed to disk by `stream` instead of
+being read in memory.
+
+Classes:
+    MeteredRequest: An HTTPX connection pool reporting its utilization.
+    RoutedRequest: Sends file transfers and API calls through separate pools.
+
+Functions:
+    build_requests() -> tuple[RoutedRequest, MeteredRequest]:
+        Builds the request of the bot and the request of getUpdates.
+"""
+import time
+from contextlib import asynccontextmanager
+from importlib.util import find_spec
+from logging import getLogger
+from typing import AsyncIterator, Optional
+
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+from ..config import NETWORK_POOLS
+from .metrics import Counter, Gauge, Histogram
+
+logger = getLogger(__name__)
+
+HTTP_VERSION: str = '2' if find_spec('h2') else '1.1'
+CHUNK_SIZE: int = 64 * 1024
+
+pool_size = Gauge(
+    'raed_http_pool_size', 'Connections of the HTTP pool.', labels=('pool',))
+pool_in_use = Gauge(
+    'raed_http_pool_in_use', 'Requests in flight in the HTTP pool.', labels=('pool',))
+pool_utilization = Gauge(
+    'raed_http_pool_utilization', 'Share of the HTTP pool in use.', labels=('pool',))
+request_seconds = Histogram(
+    'raed_http_request_seconds', 'Duration of the requests to the Bot API.', labels=('pool',))
+request_errors = Counter(
+    'raed_http_request_errors_total', 'Requests to the Bot API that failed.', labels=('pool',))
+
+
+class MeteredRequest(HTTPXRequest):
+    """An HTTPX connection pool reporting its utilization.
+    """
+
+    def __init__(self, pool: str, size: int, timeout: float, **kwargs) -> None:
+        """Initializes the pool.
+
+        Args:
+            pool (str): The name of the pool in the metrics.
+            size (int): The number of connections.
+            timeout (float): The read and write timeout in seconds.
+            **kwargs: Extra arguments of `HTTPXRequest`.
+        """
+        kwargs.setdefault('http_version', HTTP_VERSION)
+        super().__init__(
+            connection_pool_size=size, read_timeout=timeout, write_timeout=timeout,
+            media_write_timeout=timeout, **kwargs)
+        self.pool: str = pool
+        self.size: int = size
+        self.in_use: int = 0
+        pool_size.set(size, pool=pool)
+
+    def _report(self) -> None:
+        pool_in_use.set(self.in_use, pool=self.pool)
+        pool_utilization.set(self.in_use / self.size, pool=self.pool)
+
+    @asynccontextmanager
+    async def _metered(self) -> AsyncIterator[None]:
+        """Measures a request of the pool."""
+        self.in_use += 1
+        self._report()
+        started: float = time.monotonic()
+        try:
+            yield
+        except Exception:
+            request_errors.inc(pool=self.pool)
+            raise
+        finally:
+            self.in_use -= 1
+            self._report()
+            request_seconds.observe(time.monotonic() - started, pool=self.pool)
+
+    async def do_request(self, url: str, method: str,
+                         request_data: Optional[RequestData] = None,
+                         *args, **kwargs) -> tuple[int, bytes]:
+        async with self._metered():
+            return await super().do_request(url, method, request_data, *args, **kwargs)
+
+    async def stream(self, url: str, path: str, limit: int = 0) -> int:
+        """Downloads a file to disk chunk by chunk.
+
+        Args:
+            url (str): The url of the file.
+            path (str): The path the file is written to.
+            limit (int): Bytes from which the download is stopped, 0 for no limit.
+
+        Returns:
+            int: The bytes written.
+
+        Raises:
+            ValueError: If the file is larger than the limit.
+            httpx.HTTPError: If the download failed.
+        """
+        written: int = 0
+        async with self._metered(), self._client.stream('GET', url) as response:
+            response.raise_for_status()
+            with open(path, 'wb') as out:
+                async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                    written += len(chunk)
+                    if limit and written > limit:
+                        raise ValueError(f"The file is larger than {limit} bytes")
+                    out.write(chunk)
+        return written
+
+
+class RoutedRequest(BaseRequest):
+    """Sends file transfers and API calls through separate pools.
+
+    API calls are always POST requests, file downloads are GET requests.
+    Uploads are API calls with files.
+    """
+
+    def __init__(self, api: BaseRequest, files: BaseRequest) -> None:
+        """Initializes the request.
+
+        Args:
+            api (BaseRequest): The pool of the API calls.
+            files (BaseRequest): The pool of the file transfers.
+        """
+        self.api: BaseRequest = api
+        self.files: BaseRequest = files
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.api.read_timeout
+
+    async def initialize(self) -> None:
+        await self.api.initialize()
+        await self.files.initialize()
+
+    async def shutdown(self) -> None:
+        await self.api.shutdown()
+        await self.files.shutdown()
+
+    async def stream(self, url: str, path: str, limit: int = 0) -> int:
+        """Downloads a file to disk chunk by chunk through the pool of the file transfers."""
+        return await self.files.stream(url, path, limit)
+
+    async def do_request(self, url: str, method: str,
+                         request_data: Optional[RequestData] = None,
+                         *args, **kwargs) -> tuple[int, bytes]:
+        transfer: bool = method == 'GET' or bool(request_data and request_data.contains_files)
+        request: BaseRequest = self.files if transfer else self.api
+        return await request.do_request(url, method, request_data, *args, **kwargs)
+
+
+def build_requests() -> tuple[RoutedRequest, MeteredRequest]:
+    """Builds the request of the bot and the request of getUpdates.
+
+    The pools are sized by `NETWORK_POOLS`.
+
+    Returns:
+        tuple[RoutedRequest, MeteredRequest]: The request of the bot and of getUpdates.
+    """
+    pools: dict[str, MeteredRequest] = {
+        name: MeteredRequest(name, **settings) for name, settings in NETWORK_POOLS.items()
+    }
+    return RoutedRequest(pools['api'], pools['files']), pools['updates']
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""This module normalizes the text extracted from uploaded documents.
+
+Every character of a document ends up in the prompt of the concept notes and
+proposals, so the text is shrunk before it is stored:
+
+    - Arabic presentation forms and Latin ligatures are replaced by their letters,
+      tatweel, zero width and directional marks are removed.
+    - Headers and footers repeated at the top or bottom of most pages, and page
+      numbers, are removed.
+    - English words split by a hyphen at the end of a line are joined again, unless
+      the document shows they are a hyphenated compound, e.g. community-based.
+    - Runs of spaces and blank lines are collapsed.
+    - Paragraphs (or lines of PDFs) repeated in the document are kept once.
+    - The text is cut at `MAX_DOCUMENT_CHARS`, after the last whole paragraph.
+
+The characters before and after the normalization are counted in the metrics.
+
+Functions:
+    normalize_chars(text) -> str:
+        Replaces presentation forms and ligatures, removes invisible marks.
+
+    strip_page_furniture(pages) -> list[str]:
+        Removes the headers, footers and page numbers of the pages.
+
+    normalize_document(pages, limit) -> str:
+        Normalizes the text of the pages of a document.
+"""
+import re
+import unicodedata
+from collections import Counter as Tally
+from logging import getLogger
+
+from ..config import MAX_DOCUMENT_CHARS
+from .metrics import Counter
+
+logger = getLogger(__name__)
+
+# Latin ligatures, Arabic presentation forms A and B
+PRESENTATION_RE = re.compile(r'[\uFB00-\uFB06\uFB50-\uFDFF\uFE70-\uFEFC]+')
+# soft hyphen, tatweel, zero width spaces and joiners, directional marks, byte order mark
+INVISIBLE_RE = re.compile(r'[\u00AD\u0640\u200B-\u200F\u202A-\u202E\u2066-\u2069\uFEFF]')
+HYPHENATED_RE = re.compile(r'\b([A-Za-z]+)-\n([a-z]+)\b')
+WORD_RE = re.compile(r'[A-Za-z]+(?:-[A-Za-z]+)*')
+# second parts of common compounds, which keep their hyphen when split on a line break
+COMPOUND_PARTS: frozenset[str] = frozenset((
+    'based', 'led', 'owned', 'run', 'level', 'term', 'scale', 'wide', 'making', 'building',
+    'related', 'oriented', 'specific', 'sensitive', 'friendly', 'driven', 'focused',
+    'centred', 'centered', 'affected', 'income', 'profit', 'governmental',
+))
+# first parts shorter than this are syllables more often than words, e.g. in-formation
+MIN_COMPOUND_PART: int = 4
+SPACES_RE = re.compile(r'[^\S\n]+')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+DIGITS_RE = re.compile(r'\d+')
+PAGE_NUMBER_RE = re.compile(
+    r'^[\W_]*(page|p\.|صفحة|الصفحة)?\s*\d+(\s*(of|/|من)\s*\d+)?[\W_]*$', re.I)
+
+# lines at the top and bottom of a page checked for headers and footers
+EDGE_LINES: int = 2
+# share of the pages a line must be repeated on to be a header or footer
+FURNITURE_SHARE: float = 0.5
+# shorter paragraphs, e.g. table cells, may repeat
+MIN_DUPLICATE_CHARS: int = 30
+
+document_chars = Counter(
+    'raed_document_chars_total', 'Characters of the uploaded documents, by normalization stage.',
+    labels=('stage',))
+
+
+def normalize_chars(text: str) -> str:
+    """Replaces presentation forms and ligatures, removes invisible marks.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        str: The text with plain letters.
+    """
+    text = PRESENTATION_RE.sub(lambda match: unicodedata.normalize('NFKC', match.group()), text)
+    return INVISIBLE_RE.sub('', text)
+
+
+def _signature(line: str) -> str:
+    """Returns the line with its numbers masked, e.g. `Page # of #`."""
+    return DIGITS_RE.sub('#', line.strip().casefold())
+
+
+def strip_page_furniture(pages: list[str]) -> list[str]:
+    """Removes the headers, footers and page numbers of the pages.
+
+    A header or footer is a line among the first or last `EDGE_LINES` lines of a
+    page that is repeated, numbers aside, on at least half of the pages. Documents
+    of fewer than 3 pages only lose their page numbers.
+
+    Args:
+        pages (list[str]): The text of every page.
+
+    Returns:
+        list[str]: The text of every page without its furniture.
+    """
+    split: list[list[str]] = [[line for line in page.split('\n') if line.strip()]
+                              for page in pages]
+    repeated: set[str] = set()
+    if len(pages) >= 3:
+        tally: Tally = Tally()
+        for lines in split:
+            tally.update({_signature(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:]})
+        repeated = {signature for signature, count in tally.items()
+                    if count >= max(3, FURNITURE_SHARE * len(pages))}
+
+    def is_furniture(line: str) -> bool:
+        return _signature(line) in repeated or bool(PAGE_NUMBER_RE.match(line.strip()))
+
+    stripped: list[str] = []
+    for lines in split:
+        start, end = 0, len(lines)
+        while start < min(EDGE_LINES, end) and is_furniture(lines[start]):
+            start += 1
+        while end > max(start, len(lines) - EDGE_LINES) and is_furniture(lines[end - 1]):
+            end -= 1
+        stripped.append('\n'.join(lines[start:end]))
+    return stripped
+
+
+def _deduplicate(text: str) -> str:
+    """Keeps the first of the paragraphs repeated in the text."""
+    seen: set[str] = set()
+    kept: list[str] = []
+    for paragraph in text.split('\n'):
+        key: str = paragraph.strip().casefold()
+        if len(key) >= MIN_DUPLICATE_CHARS:
+            if key in seen:
+                continue
+            seen.add(key)
+        kept.append(paragraph)
+    return '\n'.join(kept)
+
+
+def _join_hyphenated(text: str) -> str:
+    """Joins the English words split by a hyphen at the end of a line.
+
+    The words of the document tell a split word from a hyphenated compound: the
+    pieces are joined when the joined word is used elsewhere, and the hyphen is kept
+    when the compound is used elsewhere, when its second part is one of
+    `COMPOUND_PARTS`, or when its first part is a word used on its own elsewhere.
+    """
+    if '-\n' not in text:
+        return text
+    words: Tally = Tally(word.lower() for word in WORD_RE.findall(text))
+
+    def join(match: re.Match) -> str:
+        first, second = match.group(1), match.group(2)
+        if words[(first + second).lower()]:
+            return first + second
+        # the first part of this split is counted once already
+        if (words[f'{first}-{second}'.lower()] or second in COMPOUND_PARTS
+                or (len(first) >= MIN_COMPOUND_PART and words[first.lower()] > 1)):
+            return f'{first}-{second}'
+        return first + second
+
+    return HYPHENATED_RE.sub(join, text)
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Cuts the text at the limit, after the last whole paragraph if there is one."""
+    if not limit or len(text) <= limit:
+        return text
+    cut: int = text.rfind('\n', 0, limit + 1)
+    return text[:cut if cut > limit // 2 else limit].rstrip()
+
+
+def normalize_document(pages: list[str], limit: int = MAX_DOCUMENT_CHARS) -> str:
+    """Normalizes the text of the pages of a document.
+
+    Args:
+        pages (list[str]): The text of every page, or a single text for documents
+            without pages.
+        limit (int): The maximum characters of the text, 0 for no limit.
+
+    Returns:
+        str: The normalized text, its pages separated by a blank line.
+    """
+    raw: int = sum(map(len, pages))
+    pages = strip_page_furniture([normalize_chars(page) for page in pages])
+    text: str = '\n\n'.join(page for page in pages if page)
+    text = _join_hyphenated(text)
+    text = SPACES_RE.sub(' ', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    text = BLANK_LINES_RE.sub('\n\n', _deduplicate(text)).strip()
+    text = _truncate(text, limit)
+
+    document_chars.inc(raw, stage='raw')
+    document_chars.inc(len(text), stage='normalized')
+    if raw:
+        logger.info("Normalized a document of %s pages from %s to %s characters (%.1f%% less)",
+                    len(pages), raw, len(text), 100 * (1 - len(text) / raw))
+    return text
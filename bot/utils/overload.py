@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""This module degrades the generations gracefully when the model is overloaded.
+
+The controller watches the load of the model: the generations waiting or running,
+and the error rate and median latency of the generations of the last
+`OVERLOAD_WINDOW` seconds. Each signal is divided by its threshold, and the
+highest ratio (the pressure) chooses the level of degradation:
+
+    NORMAL   (pressure < 1)    every result is generated by the model.
+    CACHED   (pressure < 1.5)  results already generated for the same inputs, by any
+                               user, are served from the response cache.
+    REDUCED  (pressure < 2)    the other results are generated by a cheaper model
+                               with a shorter output budget. They are cached apart,
+                               only served while overloaded, and not shared with
+                               the workspaces.
+    SHED     (pressure >= 2)   the other requests get a busy reply with the estimated
+                               wait, nothing new reaches the model.
+
+The level rises as soon as the pressure does, and falls one level at a time once
+the pressure stayed lower for `OVERLOAD_COOLDOWN` seconds, so a spike does not make
+it flap. Shed requests do not reach the model, so the queue drains, the old
+errors and latencies leave the window and the level falls back on its own.
+
+Every worker process has its own controller and cache. The load is measured on
+the generation pool of the process, which is what it has to protect. The cache is
+only read while the process is overloaded, when a round trip to the shared store on
+every request would add to the load it sheds. Results are shared between the
+processes by the workspaces of the teams, kept in SQLite.
+
+Classes:
+    ResponseCache: An LRU cache of the generated results, shared by all users.
+    OverloadController: Chooses the level of degradation from the load of the model.
+    Overloaded: Raised when a request is shed.
+
+Attributes:
+    NORMAL, CACHED, REDUCED, SHED (int): The levels of degradation.
+"""
+import math
+import statistics
+import time
+from collections import OrderedDict, deque
+from logging import getLogger
+from typing import Any
+
+from ..config import (
+    OVERLOAD_COOLDOWN, OVERLOAD_ERROR_RATE, OVERLOAD_LATENCY, OVERLOAD_QUEUE,
+    OVERLOAD_WINDOW, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, WORKER_POOLS
+)
+from .artifacts import ArtifactStore
+from .metrics import Counter, Gauge
+
+logger = getLogger(__name__)
+
+NORMAL, CACHED, REDUCED, SHED = range(4)
+LEVEL_NAMES: dict[int, str] = {NORMAL: 'normal', CACHED: 'cached', REDUCED: 'reduced', SHED: 'shed'}
+# the pressure from which every level starts
+LEVEL_PRESSURE: tuple[float, ...] = (0, 1, 1.5, 2)
+# generations in the window below which the error rate is not trusted
+MIN_SAMPLES: int = 5
+
+overload_level = Gauge('raed_overload_level', 'Level of degradation of the generations, 0 is normal.')
+overload_requests = Counter(
+    'raed_overload_requests_total', 'Requests served degraded, by outcome.', labels=('outcome',))
+cache_lookups = Counter(
+    'raed_response_cache_lookups_total', 'Lookups of the response cache, by result.',
+    labels=('result',))
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed because the model is overloaded.
+    """
+
+    def __init__(self, wait: float) -> None:
+        """Initializes the exception.
+
+        Args:
+            wait (float): The estimated seconds until the model accepts requests again.
+        """
+        super().__init__(f"The model is overloaded, estimated wait {wait:.0f} seconds")
+        self.wait: float = wait
+
+    @property
+    def minutes(self) -> int:
+        """The estimated wait in whole minutes, at least 1."""
+        return max(1, math.ceil(self.wait / 60))
+
+
+class ResponseCache:
+    """An LRU cache of the generated results, shared by all users.
+    """
+
+    def __init__(self, size: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL) -> None:
+        """Initializes an empty cache.
+
+        Args:
+            size (int): The results kept, the least recently used are evicted first.
+            ttl (float): Seconds a result is kept.
+        """
+        self.size: int = size
+        self.ttl: float = ttl
+        self._results: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    @staticmethod
+    def key(kind: str, *args: Any) -> str:
+        """Identifies a result by its kind and inputs, whoever requested it."""
+        return ArtifactStore.fingerprint(kind, *map(str, args))
+
+    def get(self, key: str) -> str:
+        """Returns a cached result, or None if it is missing or expired."""
+        cached: tuple[float, str] = self._results.get(key)
+        if cached is None or time.monotonic() - cached[0] > self.ttl:
+            self._results.pop(key, None)
+            cache_lookups.inc(result='miss')
+            return None
+        self._results.move_to_end(key)
+        cache_lookups.inc(result='hit')
+        return cached[1]
+
+    def put(self, key: str, result: str) -> None:
+        """Caches a result, evicting the least recently used beyond the size."""
+        if not self.size:
+            return
+        self._results[key] = (time.monotonic(), result)
+        self._results.move_to_end(key)
+        while len(self._results) > self.size:
+            self._results.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+class OverloadController:
+    """Chooses the level of degradation from the load of the model.
+    """
+
+    def __init__(self, queue: float = OVERLOAD_QUEUE * WORKER_POOLS['generation'],
+                 error_rate: float = OVERLOAD_ERROR_RATE, latency: float = OVERLOAD_LATENCY,
+                 window: float = OVERLOAD_WINDOW, cooldown: float = OVERLOAD_COOLDOWN,
+                 workers: int = WORKER_POOLS['generation']) -> None:
+        """Initializes the controller at the normal level.
+
+        Args:
+            queue (float): Generations waiting or running from which the model is overloaded.
+            error_rate (float): Share of failed generations from which the model is overloaded.
+            latency (float): Median seconds of a generation from which the model is overloaded.
+            window (float): Seconds of recent generations the error rate and latency are
+                measured on.
+            cooldown (float): Seconds the pressure must stay lower before the level falls.
+            workers (int): The generation workers, to estimate the wait.
+        """
+        self.queue: float = queue
+        self.error_rate: float = error_rate
+        self.latency: float = latency
+        self.window: float = window
+        self.cooldown: float = cooldown
+        self.workers: int = workers
+        self.level: int = NORMAL
+        self._changed: float = time.monotonic()
+        # (finished, seconds, succeeded) of the recent generations
+        self._outcomes: deque[tuple[float, float, bool]] = deque()
+
+    def observe(self, seconds: float, succeeded: bool) -> None:
+        """Records the outcome of a generation.
+
+        Args:
+            seconds (float): The duration of the generation, waiting for a worker included.
+            succeeded (bool): Whether the model returned a result.
+        """
+        self._outcomes.append((time.monotonic(), seconds, succeeded))
+
+    def _recent(self) -> list[tuple[float, float, bool]]:
+        """Drops the outcomes older than the window and returns the others."""
+        limit: float = time.monotonic() - self.window
+        while self._outcomes and self._outcomes[0][0] < limit:
+            self._outcomes.popleft()
+        return list(self._outcomes)
+
+    def median_latency(self) -> float:
+        """The median seconds of the recent generations, 0 without any."""
+        recent = self._recent()
+        return statistics.median(seconds for _, seconds, _ in recent) if recent else 0
+
+    def pressure(self, depth: int) -> float:
+        """Returns the load of the model relative to its thresholds, 1 is overloaded.
+
+        Args:
+            depth (int): The generations waiting or running.
+        """
+        recent = self._recent()
+        signals: list[float] = [depth / self.queue if self.queue else 0]
+        if recent:
+            signals.append(self.median_latency() / self.latency if self.latency else 0)
+        if len(recent) >= MIN_SAMPLES and self.error_rate:
+            failed: int = sum(not succeeded for _, _, succeeded in recent)
+            signals.append(failed / len(recent) / self.error_rate)
+        return max(signals)
+
+    def update(self, depth: int) -> int:
+        """Updates the level of degradation from the current load.
+
+        Args:
+            depth (int): The generations waiting or running.
+
+        Returns:
+            int: The level, `NORMAL`, `CACHED`, `REDUCED` or `SHED`.
+        """
+        pressure: float = self.pressure(depth)
+        target: int = max(level for level, start in enumerate(LEVEL_PRESSURE) if pressure >= start)
+        now: float = time.monotonic()
+        if target > self.level:
+            self._set(target, pressure, now)
+        elif target < self.level and now - self._changed >= self.cooldown:
+            self._set(self.level - 1, pressure, now)
+        elif target == self.level:
+            # the cooldown counts from the last time the pressure held the level
+            self._changed = now
+        return self.level
+
+    def _set(self, level: int, pressure: float, now: float) -> None:
+        """Moves to a level of degradation."""
+        log = logger.warning if level > self.level else logger.info
+        log("Overload level %s -> %s (pressure %.2f)",
+            LEVEL_NAMES[self.level], LEVEL_NAMES[level], pressure)
+        self.level = level
+        self._changed = now
+        overload_level.set(level)
+
+    def estimated_wait(self, depth: int) -> float:
+        """Returns the estimated seconds until the generations waiting or running are done.
+
+        Args:
+            depth (int): The generations waiting or running.
+        """
+        latency: float = self.median_latency() or self.latency
+        return math.ceil((depth + 1) / max(self.workers, 1)) * latency
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""This module profiles the dispatch of individual updates.
+
+Profiling is off by default. It is switched on with `PROFILE_RATE` (the fraction of
+updates profiled) or `PROFILE_MATCH` (handlers or states whose updates are always
+profiled), or at runtime by an admin with the /profile command.
+
+Updates are profiled with cProfile, one at a time, on the thread of the event loop:
+work run in the worker pools is not included, and other tasks running while the
+update awaits are. Every profile is written to `PROFILE_DIR` as a `.prof` file named
+after the update, its handler and its duration, e.g.
+`20250101T120000-4242-concept_note-1830ms.prof`, to be read with `pstats` or
+snakeviz. Only the newest `PROFILE_KEEP` profiles are kept.
+
+Classes:
+    UpdateProfiler: Profiles a fraction of the updates, or the updates of some handlers.
+
+Attributes:
+    profiler (UpdateProfiler): The profiler of the application.
+"""
+import asyncio
+import cProfile
+import os
+import random
+import time
+from logging import getLogger
+from typing import Any, Awaitable, Iterable, Optional
+
+from ..config import PROFILE_DIR, PROFILE_KEEP, PROFILE_MATCH, PROFILE_RATE
+from .sessions import current_update
+from .workers import run_blocking
+
+logger = getLogger(__name__)
+
+
+class UpdateProfiler:
+    """Profiles a fraction of the updates, or the updates of some handlers.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, rate: float = PROFILE_RATE,
+                 match: Iterable[str] = PROFILE_MATCH, keep: int = PROFILE_KEEP) -> None:
+        """Initializes the profiler.
+
+        Args:
+            directory (str): The directory the profiles are written to.
+            rate (float): The fraction of the updates profiled, between 0 and 1.
+            match (Iterable[str]): Handlers or states whose updates are always profiled.
+            keep (int): The number of profiles kept in the directory.
+        """
+        self.directory: str = directory
+        self.rate: float = rate
+        self.match: set[str] = set(match)
+        self.keep: int = keep
+        self._active: bool = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether some updates are profiled."""
+        return self.rate > 0 or bool(self.match)
+
+    def configure(self, rate: float = 0, match: Iterable[str] = ()) -> None:
+        """Changes what is profiled, e.g. from the /profile command.
+
+        Args:
+            rate (float): The fraction of the updates profiled, 0 disables sampling.
+            match (Iterable[str]): Handlers or states whose updates are always profiled.
+        """
+        self.rate = min(max(rate, 0.0), 1.0)
+        self.match = set(match)
+        logger.info("Profiling %.1f%% of the updates and the updates of %s",
+                    self.rate * 100, ', '.join(sorted(self.match)) or 'no handler')
+
+    async def dispatch(self, dispatching: Awaitable, update_id: int,
+                       state: Optional[str] = None) -> Any:
+        """Awaits the dispatch of an update, profiling it if it is sampled or matched.
+
+        The handler of an update is only known once it ran, so with `match` every
+        update is profiled and only the profiles of matching updates are kept.
+
+        Args:
+            dispatching (Awaitable): The dispatch of the update.
+            update_id (int): The id of the update.
+            state (str, optional): The name of the user's state before the update.
+
+        Returns:
+            Any: The result of the dispatch.
+        """
+        sampled: bool = self.rate > 0 and random.random() < self.rate
+        if self._active or not (sampled or self.match):
+            return await dispatching
+
+        dispatched: dict = {}
+        token = current_update.set(dispatched)
+        profile = cProfile.Profile()
+        self._active = True
+        started: float = time.perf_counter()
+        profile.enable()
+        try:
+            return await dispatching
+        finally:
+            profile.disable()
+            duration: float = time.perf_counter() - started
+            self._active = False
+            current_update.reset(token)
+            handler: str = dispatched.get('handler', 'none')
+            if sampled or self.match & {handler, dispatched.get('state', state)}:
+                name: str = (f"{time.strftime('%Y%m%dT%H%M%S')}-{update_id}-"
+                             f"{handler}-{duration * 1000:.0f}ms.prof")
+                # written off the loop, a profile can take a few hundred KB.
+                asyncio.get_running_loop().create_task(
+                    run_blocking('default', self._write, profile, name))
+
+    def _write(self, profile: cProfile.Profile, name: str) -> None:
+        """Writes a profile and removes the oldest ones over `keep`."""
+        os.makedirs(self.directory, exist_ok=True)
+        profile.dump_stats(os.path.join(self.directory, name))
+        profiles: list[str] = sorted(
+            entry for entry in os.listdir(self.directory) if entry.endswith('.prof'))
+        for entry in profiles[:max(len(profiles) - self.keep, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, entry))
+            except FileNotFoundError:
+                pass
+        logger.info("Wrote profile %s", name)
+
+
+profiler = UpdateProfiler()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""This module paces the requests the bot sends to Telegram.
+
+Every request of the bot goes through `OutboundLimiter`, the rate limiter of the
+application. Requests that send or edit messages wait for a token of their chat
+(one message per second in private chats, twenty per minute in groups) and then
+for a token of the bot (thirty messages per second). Interactive replies get the
+bot's tokens before bulk sends like exported documents. A `RetryAfter` from Telegram
+pauses every send for the requested time and the request is retried, and an edit
+of a message that is still waiting is replaced by the newer edit.
+
+Classes:
+    TokenBucket: Tokens refilled at a constant rate.
+    OutboundLimiter: The rate limiter of the application.
+
+Attributes:
+    INTERACTIVE (int): Priority of replies to the user, the default.
+    BULK (int): Priority of large or background sends, e.g. documents.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import timedelta
+from logging import getLogger
+from typing import Any, Callable, Coroutine, Optional
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from .metrics import Counter, Gauge, Histogram
+
+logger = getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# endpoints sending bulk content unless told otherwise
+BULK_ENDPOINTS = frozenset((
+    'sendDocument', 'sendMediaGroup', 'sendVideo', 'sendAudio', 'sendPhoto'
+))
+# endpoints whose waiting requests are replaced by a newer one for the same message
+COALESCED_ENDPOINTS = frozenset(('editMessageText', 'editMessageReplyMarkup'))
+
+queue_depth = Gauge(
+    'raed_send_queue_depth', 'Requests waiting to be sent to Telegram.', labels=('priority',))
+wait_seconds = Histogram(
+    'raed_send_wait_seconds', 'Seconds requests waited before being sent to Telegram.',
+    labels=('priority',))
+retries = Counter(
+    'raed_send_retries_total', 'Requests retried after a RetryAfter from Telegram.')
+coalesced = Counter(
+    'raed_send_coalesced_total', 'Edits replaced by a newer edit of the same message.')
+
+
+class TokenBucket:
+    """Tokens refilled at a constant rate.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Initializes a full bucket.
+
+        Args:
+            rate (float): The tokens added per second.
+            capacity (float): The maximum number of tokens.
+        """
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated: float = time.monotonic()
+
+    def _refill(self) -> None:
+        now: float = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Returns the seconds until a token is available."""
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def take(self) -> None:
+        """Takes a token."""
+        self._refill()
+        self.tokens -= 1
+
+    def refund(self) -> None:
+        """Gives back a token that was not used."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def reserve(self) -> float:
+        """Takes a token, even in advance, and returns the seconds until it is available."""
+        self.take()
+        return max(0.0, -self.tokens / self.rate)
+
+    @property
+    def idle(self) -> bool:
+        """Whether the bucket is full, i.e. it can be dropped."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class OutboundLimiter(BaseRateLimiter[int]):
+    """The rate limiter of the application.
+
+    The priority of a request can be set with `rate_limit_args`, e.g.
+    `bot.send_message(chat_id, text, rate_limit_args=BULK)`.
+    """
+
+    def __init__(self, overall_rate: float = 30, private_rate: float = 1,
+                 group_rate: float = 20 / 60, max_retries: int = 3) -> None:
+        """Initializes the limiter.
+
+        Args:
+            overall_rate (float): Messages per second the bot may send.
+            private_rate (float): Messages per second the bot may send to a private chat.
+            group_rate (float): Messages per second the bot may send to a group.
+            max_retries (int): Times a request is retried after a `RetryAfter`.
+        """
+        self.overall: TokenBucket = TokenBucket(overall_rate, overall_rate)
+        self.private_rate: float = private_rate
+        self.group_rate: float = group_rate
+        self.max_retries: int = max_retries
+        self._chats: dict[int, TokenBucket] = {}
+        self._waiting: list = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._paused_until: float = 0
+        self._edits: dict[tuple, asyncio.Future] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Returns the bucket of a chat, dropping the buckets of idle chats."""
+        if chat_id not in self._chats:
+            if len(self._chats) > 10000:
+                self._chats = {key: bucket for key, bucket in self._chats.items()
+                               if not bucket.idle}
+            # groups and channels have negative ids.
+            rate: float = self.private_rate if chat_id > 0 else self.group_rate
+            # a short burst lets a reply split in a few messages go out at once.
+            self._chats[chat_id] = TokenBucket(rate, 3)
+        return self._chats[chat_id]
+
+    async def _acquire(self, chat_id: Any, priority: int) -> None:
+        """Waits for a token of the chat and then for a token of the bot."""
+        if isinstance(chat_id, int):
+            await asyncio.sleep(self._chat_bucket(chat_id).reserve())
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+        queue_depth.inc(priority=PRIORITY_NAMES[priority])
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        try:
+            await future
+        finally:
+            queue_depth.dec(priority=PRIORITY_NAMES[priority])
+
+    async def _dispatch(self) -> None:
+        """Hands out the tokens of the bot to the waiting requests by priority."""
+        while self._waiting:
+            delay: float = max(self.overall.delay(), self._paused_until - time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                self.overall.take()
+                future.set_result(None)
+
+    def _pause(self, seconds: float) -> None:
+        """Pauses every send after a `RetryAfter`."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        limited: bool = endpoint.startswith(('send', 'edit', 'copy', 'forward'))
+        priority: int = (rate_limit_args if rate_limit_args is not None
+                         else BULK if endpoint in BULK_ENDPOINTS else INTERACTIVE)
+        chat_id: Any = data.get('chat_id')
+
+        edit: Optional[asyncio.Future] = None
+        key: tuple = (endpoint, chat_id, data.get('message_id'))
+        if endpoint in COALESCED_ENDPOINTS and chat_id is not None:
+            edit = asyncio.get_running_loop().create_future()
+            self._edits[key] = edit
+
+        for attempt in range(self.max_retries + 1):
+            if limited:
+                started: float = time.monotonic()
+                await self._acquire(chat_id, priority)
+                wait_seconds.observe(time.monotonic() - started,
+                                     priority=PRIORITY_NAMES[priority])
+            latest: Optional[asyncio.Future] = self._edits.get(key) if edit else None
+            if latest is not None and latest is not edit:
+                # a newer edit of the message is waiting, it sends the latest content.
+                self.overall.refund()
+                if isinstance(chat_id, int) and chat_id in self._chats:
+                    self._chats[chat_id].refund()
+                coalesced.inc()
+                edit.set_result(await asyncio.shield(latest))
+                return edit.result()
+            try:
+                result: Any = await callback(*args, **kwargs)
+            except RetryAfter as e:
+                seconds = e.retry_after
+                if isinstance(seconds, timedelta):
+                    seconds = seconds.total_seconds()
+                if attempt == self.max_retries:
+                    self._fail(edit, key, e)
+                    raise
+                logger.warning("Flood control on %s, retrying in %s seconds", endpoint, seconds)
+                retries.inc()
+                self._pause(seconds)
+                if not limited:
+                    await asyncio.sleep(seconds)
+                continue
+            except Exception as e:
+                self._fail(edit, key, e)
+                raise
+            if edit is not None:
+                if self._edits.get(key) is edit:
+                    del self._edits[key]
+                edit.set_result(result)
+            return result
+
+    def _fail(self, edit: Optional[asyncio.Future], key: tuple, error: Exception) -> None:
+        """Fails the edits waiting for this one."""
+        if edit is None:
+            return
+        if self._edits.get(key) is edit:
+            del self._edits[key]
+        edit.set_exception(error)
+        # retrieved by the replaced edits, if any.
+        edit.exception()
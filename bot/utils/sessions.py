@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""This module expires idle conversations and releases what they keep in memory.
+
+Every conversation callback is wrapped by `track_state`, which records the state the
+user is in and when they were last seen, and measures the callback: its duration,
+the state transition it made and whether it failed, i.e. raised or logged an error.
+The running callback is available to other modules as `current_callback`. A JobQueue job (`sweep`) periodically looks
+for users idle longer than the timeout of their state, releases their artifacts
+(documents, analyses, paper sections) and sends them a localized notice.
+
+Functions:
+    state_name(state) -> str:
+        Returns the name of a state for the metrics and logs.
+
+    track_state(callback) -> Callable:
+        Wraps a conversation callback to record the user's state and activity.
+
+    track_conversation(conversation) -> ConversationHandler:
+        Wraps every callback of a conversation with `track_state`.
+
+    release_artifacts(user_data) -> int:
+        Removes the artifacts of a user and returns the bytes released.
+
+    async def sweep(context) -> None:
+        Expires the conversations idle longer than the timeout of their state.
+
+    async def expire_conversation(update, context) -> None:
+        Releases the artifacts of a conversation ended by the conversation timeout.
+
+    async def guard_expired(update, context) -> None:
+        Stops updates of expired users until they send /start again.
+
+Attributes:
+    current_callback (ContextVar[dict]): The handler, state and update of the running callback.
+    current_update (ContextVar[dict]): Set while an update is dispatched, the callback
+        records its handler and state in it.
+"""
+import logging
+import time
+from contextvars import ContextVar
+from functools import wraps
+from logging import getLogger
+from typing import Callable
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.error import TelegramError
+from telegram.ext import (
+    ApplicationHandlerStop, ContextTypes, ConversationHandler
+)
+
+from .. import STATE_NAMES
+from ..config import CONVERSATION_TIMEOUT, STATE_TIMEOUTS
+from . import memory
+from .catalog import catalog
+from .metrics import Counter, Gauge, Histogram
+
+logger = getLogger(__name__)
+
+# keys of user_data holding generated or uploaded content
+ARTIFACT_KEYS: tuple[str, ...] = (
+    'document', 'tree_analysis', 'swot_analysis', 'pestel_analysis',
+    'concept_note', 'full_proposal', 'paper_input', 'paper', 'sections', 'pending'
+)
+
+live_conversations = Gauge(
+    'raed_live_conversations', 'Conversations that are not ended or expired.')
+expired_conversations = Counter(
+    'raed_expired_conversations_total', 'Conversations expired for being idle.',
+    labels=('state',))
+reclaimed_bytes = Counter(
+    'raed_reclaimed_bytes_total', 'Bytes of user_data released from idle users.')
+handler_seconds = Histogram(
+    'raed_handler_seconds', 'Duration of the conversation callbacks.',
+    labels=('handler', 'state'))
+transitions = Counter(
+    'raed_transitions_total', 'State transitions made by the conversation callbacks.',
+    labels=('handler', 'from_state', 'to_state'))
+handler_errors = Counter(
+    'raed_handler_errors_total', 'Conversation callbacks that raised or logged an error.',
+    labels=('handler', 'from_state', 'to_state'))
+
+current_callback: ContextVar[dict] = ContextVar('current_callback', default=None)
+current_update: ContextVar[dict] = ContextVar('current_update', default=None)
+
+
+class _ErrorTracker(logging.Handler):
+    """Counts the errors logged by the running callback.
+
+    The handlers of `bot.states` catch their errors, log them and return a state,
+    so a failed callback is recognized by its logged error.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(logging.ERROR)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        callback: dict = current_callback.get()
+        if callback is not None:
+            callback['errors'] += 1
+
+
+logging.getLogger(__name__.rsplit('.', 2)[0] + '.states').addHandler(_ErrorTracker())
+
+
+def state_name(state) -> str:
+    """Returns the name of a state for the metrics and logs."""
+    if state == ConversationHandler.END:
+        return 'END'
+    return STATE_NAMES.get(state, 'none' if state is None else str(state))
+
+
+def track_state(callback: Callable) -> Callable:
+    """Wraps a conversation callback to record the user's state and activity.
+
+    Args:
+        callback (Callable): The callback of a conversation handler.
+
+    Returns:
+        Callable: The wrapped callback.
+    """
+    @wraps(callback)
+    async def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        handler: str = callback.__name__
+        previous: str = state_name((context.user_data or {}).get('_state'))
+        running: dict = {
+            'handler': handler, 'state': previous, 'update_id': update.update_id,
+            'user_id': update.effective_user.id if update.effective_user else None,
+            'chat_id': update.effective_chat.id if update.effective_chat else None,
+            'errors': 0,
+        }
+        token = current_callback.set(running)
+        dispatched: dict = current_update.get()
+        if dispatched is not None:
+            dispatched.update(handler=handler, state=previous)
+        started: float = time.perf_counter()
+        try:
+            state = await callback(update, context)
+        except Exception:
+            handler_errors.inc(handler=handler, from_state=previous, to_state='exception')
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, handler=handler, state=previous)
+            current_callback.reset(token)
+        transition: dict = {'handler': handler, 'from_state': previous,
+                            # None keeps the conversation in its state.
+                            'to_state': previous if state is None else state_name(state)}
+        transitions.inc(**transition)
+        if running['errors']:
+            handler_errors.inc(**transition)
+
+        user_data: dict = context.user_data
+        if user_data is None:
+            return state
+        user_data.pop('_expired', None)
+        user_data['_seen'] = time.time()
+        if update.effective_chat:
+            user_data['_chat_id'] = update.effective_chat.id
+        if state == ConversationHandler.END:
+            user_data.pop('_state', None)
+        elif state is not None:
+            user_data['_state'] = state
+        return state
+    return wrapper
+
+
+def track_conversation(conversation: ConversationHandler) -> ConversationHandler:
+    """Wraps every callback of a conversation with `track_state`.
+
+    The handlers of the `ConversationHandler.TIMEOUT` state are left as they are.
+
+    Args:
+        conversation (ConversationHandler): The conversation.
+
+    Returns:
+        ConversationHandler: The same conversation.
+    """
+    handlers: list = list(conversation.entry_points) + list(conversation.fallbacks)
+    for state, state_handlers in conversation.states.items():
+        if state != ConversationHandler.TIMEOUT:
+            handlers.extend(state_handlers)
+    for handler in handlers:
+        handler.callback = track_state(handler.callback)
+    return conversation
+
+
+def release_artifacts(user_data: dict) -> int:
+    """Removes the artifacts of a user and returns the bytes released.
+
+    Args:
+        user_data (dict): The `context.user_data` of the user.
+
+    Returns:
+        int: The bytes released from memory and disk.
+    """
+    def footprint() -> int:
+        return getattr(user_data, 'size', 0) + getattr(user_data, 'spilled', 0)
+
+    before: int = footprint()
+    for key in ARTIFACT_KEYS:
+        if key in user_data:
+            del user_data[key]
+    return max(before - footprint(), 0)
+
+
+def _forget_idle(user_data: dict) -> None:
+    """Stops the memory manager from tracking an idle user until their next access."""
+    if isinstance(user_data, memory.UserData):
+        memory.manager.release(user_data)
+
+
+async def _notify(context: ContextTypes.DEFAULT_TYPE, chat_id: int, lang: str) -> None:
+    """Sends the timeout notice, ignoring users that blocked the bot."""
+    try:
+        await context.bot.send_message(
+            chat_id, catalog.text('session.timeout', lang), parse_mode=ParseMode.HTML)
+    except TelegramError as e:
+        logger.warning("Could not send the timeout notice to chat %s: %s", chat_id, e)
+
+
+async def sweep(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Expires the conversations idle longer than the timeout of their state.
+
+    Users that ended their conversation keep their artifacts for `CONVERSATION_TIMEOUT`,
+    after which they are released without a notice.
+
+    Args:
+        context (ContextTypes.DEFAULT_TYPE): The context of the job.
+    """
+    now: float = time.time()
+    live: int = 0
+    for user_id, user_data in list(context.application.user_data.items()):
+        seen: float = user_data.get('_seen')
+        if seen is None or user_data.get('_expired'):
+            continue
+        state = user_data.get('_state')
+        if now - seen <= STATE_TIMEOUTS.get(state, CONVERSATION_TIMEOUT):
+            live += state is not None
+            continue
+
+        released: int = release_artifacts(user_data)
+        reclaimed_bytes.inc(released)
+        user_data.pop('_seen', None)
+        if state is not None:
+            user_data.pop('_state', None)
+            user_data['_expired'] = True
+        _forget_idle(user_data)
+        if state is None:
+            continue
+        expired_conversations.inc(state=STATE_NAMES.get(state, state))
+        logger.info(
+            "User %s was idle in %s, expired the conversation and released %s bytes",
+            user_id, STATE_NAMES.get(state, state), released)
+        if user_data.get('_chat_id'):
+            await _notify(context, user_data['_chat_id'], user_data.get('language_code'))
+    live_conversations.set(live)
+
+
+async def expire_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Releases the artifacts of a conversation ended by the conversation timeout.
+
+    Args:
+        update (Update): The last update of the conversation.
+        context (ContextTypes.DEFAULT_TYPE): The context of the conversation.
+    """
+    if context.user_data is None:
+        return
+    reclaimed_bytes.inc(release_artifacts(context.user_data))
+    context.user_data.pop('_state', None)
+    _forget_idle(context.user_data)
+
+
+async def guard_expired(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Stops updates of expired users until they send /start again.
+
+    Args:
+        update (Update): The incoming update.
+        context (ContextTypes.DEFAULT_TYPE): The context of the update.
+
+    Raises:
+        ApplicationHandlerStop: If the user's conversation expired.
+    """
+    user_data: dict = context.user_data
+    if not user_data or not user_data.get('_expired'):
+        return
+    message = update.effective_message
+    if message and message.text and message.text.startswith('/start'):
+        return
+    if update.callback_query:
+        await update.callback_query.answer()
+    if update.effective_chat:
+        await _notify(context, update.effective_chat.id, user_data.get('language_code'))
+    raise ApplicationHandlerStop
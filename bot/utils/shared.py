@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""This module shares state between the bot processes.
+
+When the bot runs as several processes, the conversations and the `user_data`
+of the users are kept in Redis, so a restarted worker continues every
+conversation where it stopped. Without `REDIS_URL` an in-process stand-in is
+used, which is enough for a single process and for tests.
+
+Classes:
+    LocalStore: An in-process stand-in for Redis.
+    RedisStore: A store kept in Redis.
+    SharedPersistence: Persists conversations and user_data in a store.
+
+Functions:
+    get_store(url) -> LocalStore | RedisStore:
+        Returns the store for the url, or a local store if there is none.
+"""
+import pickle
+import time
+from logging import getLogger
+from typing import Callable, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from ..config import REDIS_URL, PERSISTENCE_INTERVAL
+from .memory import UserData
+
+logger = getLogger(__name__)
+
+
+class LocalStore:
+    """An in-process stand-in for Redis.
+
+    It implements the few commands the bot uses, with the same semantics.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty store."""
+        self._data: dict[str, tuple[bytes, float]] = {}
+
+    def _alive(self, key: str) -> bool:
+        """Checks whether a key exists and did not expire, removing it if it did."""
+        if key not in self._data:
+            return False
+        expires: float = self._data[key][1]
+        if expires and expires <= time.monotonic():
+            del self._data[key]
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns the value of a key, or None."""
+        return self._data[key][0] if self._alive(key) else None
+
+    async def set(self, key: str, value: bytes, ttl: float = None, nx: bool = False) -> bool:
+        """Sets a key, expiring after `ttl` seconds, only if it does not exist when `nx`.
+
+        Returns:
+            bool: True if the key was set.
+        """
+        if nx and self._alive(key):
+            return False
+        self._data[key] = (value, time.monotonic() + ttl if ttl else 0)
+        return True
+
+    async def delete(self, key: str) -> None:
+        """Removes a key."""
+        self._data.pop(key, None)
+
+    async def scan(self, prefix: str) -> dict[str, bytes]:
+        """Returns every key starting with the prefix and its value."""
+        return {key: value for key, (value, _) in list(self._data.items())
+                if key.startswith(prefix) and self._alive(key)}
+
+    async def close(self) -> None:
+        """Closes the store."""
+
+
+class RedisStore:
+    """A store kept in Redis.
+    """
+
+    def __init__(self, url: str) -> None:
+        """Connects to Redis.
+
+        Args:
+            url (str): The url of the Redis server, e.g. `redis://localhost:6379/0`.
+        """
+        import redis.asyncio as redis
+
+        self._redis = redis.Redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Returns the value of a key, or None."""
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float = None, nx: bool = False) -> bool:
+        """Sets a key, expiring after `ttl` seconds, only if it does not exist when `nx`.
+
+        Returns:
+            bool: True if the key was set.
+        """
+        return bool(await self._redis.set(
+            key, value, px=int(ttl * 1000) if ttl else None, nx=nx))
+
+    async def delete(self, key: str) -> None:
+        """Removes a key."""
+        await self._redis.delete(key)
+
+    async def scan(self, prefix: str) -> dict[str, bytes]:
+        """Returns every key starting with the prefix and its value."""
+        keys: list = [key async for key in self._redis.scan_iter(match=f'{prefix}*')]
+        values: list = await self._redis.mget(keys) if keys else []
+        return {key.decode(): value for key, value in zip(keys, values) if value is not None}
+
+    async def close(self) -> None:
+        """Closes the connection."""
+        await self._redis.aclose()
+
+
+def get_store(url: str = REDIS_URL):
+    """Returns the store for the url, or a local store if there is none.
+
+    Args:
+        url (str, optional): The url of the Redis server.
+
+    Returns:
+        LocalStore | RedisStore: The store.
+    """
+    if url:
+        return RedisStore(url)
+    logger.warning("REDIS_URL is not set, state is only kept in this process")
+    return LocalStore()
+
+
+class SharedPersistence(BasePersistence):
+    """Persists conversations and user_data in a store.
+
+    Only the conversations and the user_data are persisted, chat_data, bot_data
+    and callback data are not used by the bot.
+    """
+
+    def __init__(self, store=None, prefix: str = 'raed',
+                 update_interval: float = PERSISTENCE_INTERVAL,
+                 owns: Callable[[int], bool] = None) -> None:
+        """Initializes the persistence.
+
+        Args:
+            store (LocalStore | RedisStore, optional): The store, `get_store()` by default.
+            prefix (str): The prefix of the keys in the store.
+            update_interval (float): Seconds between two writes of the changed data.
+            owns (Callable[[int], bool], optional): Checks whether a user is routed to this
+                process, only the data of those users is loaded. Every user by default.
+        """
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval)
+        self.store = store if store is not None else get_store()
+        self.prefix: str = prefix
+        self.owns: Callable[[int], bool] = owns or (lambda user_id: True)
+
+    def _key(self, *parts) -> str:
+        return ':'.join((self.prefix, *map(str, parts)))
+
+    async def get_user_data(self) -> dict[int, dict]:
+        stored: dict[str, bytes] = await self.store.scan(self._key('user', ''))
+        users: dict[int, int] = {int(key.rsplit(':', 1)[1]): key for key in stored}
+        return {user_id: UserData(pickle.loads(stored[key]))
+                for user_id, key in users.items() if self.owns(user_id)}
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        await self.store.set(self._key('user', user_id),
+                             pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self.store.delete(self._key('user', user_id))
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        # every update of a user, in any chat, is routed to the worker owning the user,
+        # so its copy is always the latest.
+        pass
+
+    async def get_conversations(self, name: str) -> dict[tuple, object]:
+        # every conversation has its own key, so workers never overwrite each other,
+        # and is owned by the worker of its user, the last part of the key.
+        prefix: str = self._key('conversation', name, '')
+        stored: dict[str, bytes] = await self.store.scan(prefix)
+        conversations: dict[tuple, bytes] = {
+            tuple(int(part) for part in key[len(prefix):].split(',')): value
+            for key, value in stored.items()}
+        return {key: pickle.loads(value) for key, value in conversations.items()
+                if self.owns(key[-1])}
+
+    async def update_conversation(self, name: str, key: tuple,
+                                  new_state: Optional[object]) -> None:
+        store_key: str = self._key('conversation', name, ','.join(map(str, key)))
+        if new_state is None:
+            await self.store.delete(store_key)
+        else:
+            await self.store.set(store_key, pickle.dumps(new_state, pickle.HIGHEST_PROTOCOL))
+
+    async def flush(self) -> None:
+        await self.store.close()
+
+    # chat_data, bot_data and callback data are not persisted.
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        pass
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
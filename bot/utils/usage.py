@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""This module keeps a ledger of the tokens used per user, organization and day.
+
+Every generation of the journal is accounted: the prompt and output tokens the
+model reported in its `usage_metadata`, the seconds it took, and whether it was
+served from the response cache instead. The ledger is a local SQLite database (in
+WAL mode) holding one row per day (UTC), user, organization and kind of job, so it
+stays small however many calls are made.
+
+Users belong to the organization an admin assigned them with `/usage org`, the
+others to no organization. Before a job is generated, the tokens already used
+today by the user and by their organization are checked against
+`USER_DAILY_TOKENS` and `ORG_DAILY_TOKENS`.
+
+The tokens of the calls are collected in the worker thread running the model
+method: `measure` runs the method and returns its result with the tokens that
+`count_tokens` added during the run.
+
+Classes:
+    UsageLedger: The ledger of the tokens used.
+    QuotaExceeded: Raised when a user or their organization used their daily tokens.
+
+Functions:
+    measure(func, *args, **kwargs) -> tuple[Any, dict]:
+        Runs a model method and returns its result with the tokens of its calls.
+
+    count_tokens(prompt, output) -> None:
+        Adds the tokens of a model call to the measure of the current thread.
+
+Attributes:
+    ledger (UsageLedger): The ledger used by the journal.
+"""
+import os
+import sqlite3
+import threading
+import time
+from logging import getLogger
+from typing import Any, Callable
+
+from ..config import ORG_DAILY_TOKENS, USAGE_PATH, USER_DAILY_TOKENS
+from .metrics import Counter
+
+logger = getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    day TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    org TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    calls INTEGER NOT NULL DEFAULT 0,
+    cached INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, org, kind)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS usage_org ON usage (day, org);
+CREATE TABLE IF NOT EXISTS members (
+    user_id INTEGER PRIMARY KEY,
+    org TEXT NOT NULL
+);
+"""
+
+quota_refusals = Counter(
+    'raed_quota_refusals_total', 'Jobs refused because a daily quota was used.',
+    labels=('scope',))
+
+_local = threading.local()
+
+
+class QuotaExceeded(Exception):
+    """Raised when a user or their organization used their daily tokens.
+    """
+
+    def __init__(self, scope: str, used: int, quota: int) -> None:
+        """Initializes the exception.
+
+        Args:
+            scope (str): 'user' or 'org', the quota that was used.
+            used (int): The tokens used today.
+            quota (int): The daily quota.
+        """
+        super().__init__(f"The {scope} used {used} of its {quota} daily tokens")
+        self.scope: str = scope
+
+
+def measure(func: Callable, *args: Any, **kwargs: Any) -> tuple[Any, dict]:
+    """Runs a model method and returns its result with the tokens of its calls.
+
+    Args:
+        func (Callable): The model method.
+        *args (Any): Positional arguments for the method.
+        **kwargs (Any): Keyword arguments for the method.
+
+    Returns:
+        tuple[Any, dict]: The result, and the `prompt_tokens` and `output_tokens` counted
+            by `count_tokens` while the method ran.
+    """
+    _local.tokens = tokens = {'prompt_tokens': 0, 'output_tokens': 0}
+    try:
+        return func(*args, **kwargs), tokens
+    finally:
+        _local.tokens = None
+
+
+def count_tokens(prompt: int, output: int) -> None:
+    """Adds the tokens of a model call to the measure of the current thread.
+
+    Args:
+        prompt (int): The tokens of the prompt.
+        output (int): The tokens of the output.
+    """
+    tokens: dict = getattr(_local, 'tokens', None)
+    if tokens is not None:
+        tokens['prompt_tokens'] += prompt or 0
+        tokens['output_tokens'] += output or 0
+
+
+def today() -> str:
+    """Returns the current day (UTC) as accounted in the ledger."""
+    return time.strftime('%Y-%m-%d', time.gmtime())
+
+
+class UsageLedger:
+    """The ledger of the tokens used.
+    """
+
+    def __init__(self, path: str = USAGE_PATH, user_quota: int = USER_DAILY_TOKENS,
+                 org_quota: int = ORG_DAILY_TOKENS) -> None:
+        """Initializes the ledger, the database is opened on first use.
+
+        Args:
+            path (str): The path of the SQLite database.
+            user_quota (int): Tokens a user may use per day, 0 for no quota.
+            org_quota (int): Tokens an organization may use per day, 0 for no quota.
+        """
+        self.path: str = path
+        self.user_quota: int = user_quota
+        self.org_quota: int = org_quota
+        self._db: sqlite3.Connection = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The connection to the database, opened on first use."""
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def org_of(self, user_id: int) -> str:
+        """Returns the organization of a user, '' if they have none."""
+        row = self.db.execute('SELECT org FROM members WHERE user_id = ?', (user_id,)).fetchone()
+        return row['org'] if row else ''
+
+    def set_org(self, user_id: int, org: str) -> None:
+        """Assigns a user to an organization, or to none if `org` is empty."""
+        if org:
+            self.db.execute(
+                'INSERT INTO members (user_id, org) VALUES (?, ?) '
+                'ON CONFLICT (user_id) DO UPDATE SET org = excluded.org', (user_id, org))
+        else:
+            self.db.execute('DELETE FROM members WHERE user_id = ?', (user_id,))
+
+    def record(self, user_id: int, kind: str, prompt_tokens: int = 0, output_tokens: int = 0,
+               seconds: float = 0, cached: bool = False) -> None:
+        """Accounts a generation, or a result served from the response cache.
+
+        Args:
+            user_id (int): The user the result was generated for.
+            kind (str): The kind of job, e.g. `swot_analysis`.
+            prompt_tokens (int): The tokens of the prompts of the generation.
+            output_tokens (int): The tokens of the outputs of the generation.
+            seconds (float): The duration of the generation.
+            cached (bool): Whether the result was served from the response cache.
+        """
+        self.db.execute(
+            "INSERT INTO usage (day, user_id, org, kind, calls, cached, prompt_tokens, "
+            "output_tokens, seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (day, user_id, org, kind) DO UPDATE SET "
+            "calls = calls + excluded.calls, cached = cached + excluded.cached, "
+            "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+            "output_tokens = output_tokens + excluded.output_tokens, "
+            "seconds = seconds + excluded.seconds",
+            (today(), user_id or 0, self.org_of(user_id), kind, int(not cached), int(cached),
+             prompt_tokens, output_tokens, seconds))
+
+    def used(self, user_id: int = None, org: str = None, day: str = None) -> int:
+        """Returns the tokens used on a day by a user, an organization or everyone.
+
+        Args:
+            user_id (int, optional): The user.
+            org (str, optional): The organization.
+            day (str, optional): The day, today by default.
+
+        Returns:
+            int: The prompt and output tokens used.
+        """
+        query: str = 'SELECT SUM(prompt_tokens + output_tokens) FROM usage WHERE day = ?'
+        params: list = [day or today()]
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        if org is not None:
+            query += ' AND org = ?'
+            params.append(org)
+        return self.db.execute(query, params).fetchone()[0] or 0
+
+    def check(self, user_id: int) -> None:
+        """Checks that a user and their organization did not use their daily tokens.
+
+        Args:
+            user_id (int): The user.
+
+        Raises:
+            QuotaExceeded: If the user or their organization used their daily tokens.
+        """
+        if self.user_quota:
+            used: int = self.used(user_id=user_id)
+            if used >= self.user_quota:
+                quota_refusals.inc(scope='user')
+                raise QuotaExceeded('user', used, self.user_quota)
+        org: str = self.org_of(user_id) if self.org_quota else ''
+        if org:
+            used = self.used(org=org)
+            if used >= self.org_quota:
+                quota_refusals.inc(scope='org')
+                raise QuotaExceeded('org', used, self.org_quota)
+
+    def report(self, days: int = 1, user_id: int = None, limit: int = 10) -> dict:
+        """Returns the usage of the last days.
+
+        Args:
+            days (int): The days reported, today included.
+            user_id (int, optional): Only report this user, by day and kind of job.
+            limit (int): The heaviest users and organizations reported.
+
+        Returns:
+            dict: The `totals`, and the `users` and `orgs` by tokens used, or the `days`
+                and `kinds` of the user.
+        """
+        since: str = time.strftime('%Y-%m-%d', time.gmtime(time.time() - (days - 1) * 86400))
+        where: str = 'WHERE day >= ?' + (' AND user_id = ?' if user_id is not None else '')
+        params: tuple = (since,) if user_id is None else (since, user_id)
+        columns: str = ('SUM(calls) AS calls, SUM(cached) AS cached, '
+                        'SUM(prompt_tokens) AS prompt_tokens, SUM(output_tokens) AS output_tokens, '
+                        'SUM(prompt_tokens + output_tokens) AS tokens, SUM(seconds) AS seconds')
+
+        def rows(group: str, order: str, count: int = -1) -> list[dict]:
+            return [dict(row) for row in self.db.execute(
+                f'SELECT {group}, {columns} FROM usage {where} GROUP BY {group} '
+                f'ORDER BY {order} LIMIT ?', (*params, count))]
+
+        totals: dict = dict(self.db.execute(f'SELECT {columns} FROM usage {where}', params)
+                            .fetchone())
+        if user_id is not None:
+            return {'totals': totals, 'days': rows('day', 'day DESC'),
+                    'kinds': rows('kind', 'tokens DESC')}
+        return {'totals': totals, 'users': rows('user_id', 'tokens DESC', limit),
+                'orgs': rows('org', 'tokens DESC', limit)}
+
+
+ledger: UsageLedger = UsageLedger()
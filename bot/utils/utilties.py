@@ -5,22 +5,46 @@ Functions:
     define_lang(texts, user_language) -> str:
         Defines the language based on the user's language preference.
 
+    extract_pages(buf, file_name) -> list[str]:
+        Extracts the raw text of every page of a PDF, DOCX or DOC file.
+
     extract_text_from_file(buf, file_name) -> str:
-        Extracts and returns text content from a PDF, DOCX and DOC file.
+        Extracts and returns the normalized text content of a PDF, DOCX and DOC file.
     
     verify_file_format(file_name) -> bool:
         Verifies the format of the uploaded file.
 
+    check_size(file_size) -> bool:
+        Checks whether the uploaded file exceeds the allowed size.
+
     async def process_documents(file: File, file_name: str) -> str:
         Process the uploaded file and extract the text content from it.
 """
-from telegram import File, Document
+import time
 from io import BytesIO
+from typing import TYPE_CHECKING
+
+from ..config import MAX_DOCUMENT_CHARS
+from .docxtext import iter_docx_text
+from .metrics import Counter, Histogram
+from .normalize import normalize_document
+from .workers import run_blocking
+
+if TYPE_CHECKING:
+    from telegram import File
 
-from pypdf import PdfReader
-from docx import Document
+# Telegram bots can only download files up to 20 MB.
+MAX_FILE_SIZE: int = 20 * 1024 * 1024
 
-import textract
+extraction_seconds = Histogram(
+    'raed_extraction_seconds', 'Duration of the text extraction of a document.',
+    labels=('format',))
+page_seconds = Histogram(
+    'raed_extraction_page_seconds', 'Duration of the text extraction per page of a document.',
+    labels=('format',))
+extracted_pages = Counter(
+    'raed_extracted_pages_total', 'Pages of the documents the text was extracted from.',
+    labels=('format',))
 
 
 def define_lang(texts: dict, lang: str) -> str:
@@ -34,31 +58,61 @@ def define_lang(texts: dict, lang: str) -> str:
         return None
 
 
-def extract_text_from_file(buf: bytearray, file_name: str) -> str:
-    """Extracts and returns text content from a PDF, DOCX and DOC file.
+def extract_pages(buf: bytearray, file_name: str) -> list[str]:
+    """Extracts the raw text of every page of a PDF, DOCX or DOC file.
 
     Args:
         buf (bytearray): buffer represent the file content as bytes
         file_name (str): the name of the file
 
     Returns:
-        str: the content of the file
+        list[str]: the text of every page, DOCX files have a single page with a
+            paragraph or table row per line, None for other formats
     """
 
-    ext = file_name.split('.')[1]
-    match ext.lower():
+    # the parsers are imported on first use to keep startup fast.
+    ext = file_name.split('.')[1].lower()
+    started: float = time.perf_counter()
+    match ext:
         case 'pdf':
+            from pypdf import PdfReader
+
             reader = PdfReader(buf)
-            return ''.join(
-                [page.extract_text() or "" for page in reader.pages]
-            )
+            pages = [page.extract_text() or "" for page in reader.pages]
         case 'docx':
-            document = Document(buf)
-            return ''.join(
-                [paragraph.text for paragraph in document.paragraphs]
-            )
+            # streamed, tables included, up to the characters kept of a document
+            pages = ['\n'.join(iter_docx_text(buf, MAX_DOCUMENT_CHARS))]
         case 'doc':
-            return textract.process(buf, extension='doc').decode('utf-8')
+            import textract
+
+            # antiword separates the pages with form feeds
+            pages = textract.process(buf, extension='doc').decode('utf-8').split('\f')
+        case _:
+            return None
+
+    elapsed: float = time.perf_counter() - started
+    extraction_seconds.observe(elapsed, format=ext)
+    # only PDFs have pages, other documents count as one.
+    count: int = len(pages) if ext == 'pdf' else 1
+    page_seconds.observe(elapsed / max(count, 1), format=ext)
+    extracted_pages.inc(count, format=ext)
+    return pages
+
+
+def extract_text_from_file(buf: bytearray, file_name: str) -> str:
+    """Extracts and returns the normalized text content of a PDF, DOCX and DOC file.
+
+    Args:
+        buf (bytearray): buffer represent the file content as bytes
+        file_name (str): the name of the file
+
+    Returns:
+        str: the content of the file, see `normalize_document`
+    """
+    pages = extract_pages(buf, file_name)
+    if pages is None:
+        return None
+    return normalize_document(pages)
 
 
 def verify_file_format(file_name: str) -> bool:
@@ -74,7 +128,19 @@ def verify_file_format(file_name: str) -> bool:
     return any(file_name.endswith(ext) for ext in allowed_ext)
 
 
-async def process_documents(file: File, file_name: str) -> str:
+def check_size(file_size: int) -> bool:
+    """Checks whether the uploaded file exceeds the allowed size.
+
+        Args:
+            file_size (int): The size of the uploaded file in bytes.
+
+        Returns:
+            bool: True if the file is too large, False otherwise.
+    """
+    return (file_size or 0) > MAX_FILE_SIZE
+
+
+async def process_documents(file: 'File', file_name: str) -> str:
     """Process the uploaded file and extract the text content from it.
 
     Args:
@@ -86,5 +152,6 @@ async def process_documents(file: File, file_name: str) -> str:
     """
     file_byte = await file.download_as_bytearray()
     buffer = BytesIO(file_byte)
-    content = extract_text_from_file(buffer, file_name)
+    # parsing and normalizing a large document takes seconds, off the event loop.
+    content = await run_blocking('default', extract_text_from_file, buffer, file_name)
     return content
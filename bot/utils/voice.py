@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""This module transcribes the voice messages of the users, off the event loop.
+
+A voice message is streamed to a temporary file through the `files` connection
+pool, then converted and transcribed in the `transcription` worker pool, sized by
+`TRANSCRIPTION_WORKERS`, so a transcription never blocks the event loop and only a
+bounded number run at once. Every job is limited twice: messages longer than
+`VOICE_MAX_SECONDS` are refused before they are downloaded (and the conversion cuts
+the audio at that length), and a job taking longer than `VOICE_TIMEOUT` fails.
+
+The time limit is enforced inside the worker, not only by the caller giving up on
+it: the engine gets the deadline of the job, runs its slow steps in child processes
+killed when it passes, and a job still queued at its deadline fails at once. So a
+timed-out job frees its slot of the pool, and the temporary directory of the voice
+message is removed by the worker once the engine is done with it.
+
+The engine is pluggable and selected by `VOICE_ENGINE`:
+
+    sphinx: transcribes offline with CMU Sphinx (through SpeechRecognition, which
+        needs `pocketsphinx`), after converting the OGG/Opus audio of Telegram to
+        WAV with `ffmpeg`.
+    stub: answers a fixed transcript without reading the audio, e.g. in tests.
+
+Classes:
+    TranscriptionError: Raised when a voice message could not be transcribed.
+    VoiceTooLong: Raised when a voice message is longer than the limit.
+    SphinxEngine: Transcribes offline with CMU Sphinx.
+    StubEngine: Answers a fixed transcript.
+    Transcriber: Downloads and transcribes the voice messages.
+
+Functions:
+    to_wav(path, limit, deadline) -> str:
+        Converts an audio file to a mono 16 kHz WAV file with ffmpeg.
+
+    run_until(command, deadline) -> bytes:
+        Runs a command, killed if it is still running at the deadline.
+
+    make_engine(name) -> Engine:
+        Builds the transcription engine of a name.
+
+Attributes:
+    ENGINES (dict): The engines by name.
+    transcriber (Transcriber): The transcriber used by the handlers.
+"""
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from logging import getLogger
+from typing import TYPE_CHECKING, Protocol, Union
+
+from ..config import VOICE_ENGINE, VOICE_MAX_SECONDS, VOICE_TIMEOUT
+from .metrics import Counter, Histogram
+from .utilties import MAX_FILE_SIZE
+from .workers import run_blocking
+
+if TYPE_CHECKING:
+    from telegram import Audio, Bot, Voice
+
+logger = getLogger(__name__)
+
+# Sphinx names its models after the locale, Arabic needs its model installed
+SPHINX_LANGUAGES: dict[str, str] = {'en': 'en-US'}
+SAMPLE_RATE: int = 16000
+
+# recognizes a WAV file in a child process, so it can be killed at the deadline
+RECOGNIZE: str = '''
+import sys
+import speech_recognition as sr
+
+recognizer = sr.Recognizer()
+with sr.AudioFile(sys.argv[1]) as source:
+    audio = recognizer.record(source)
+try:
+    text = recognizer.recognize_sphinx(audio, language=sys.argv[2])
+except sr.UnknownValueError:
+    text = ''
+sys.stdout.buffer.write(text.encode())
+'''
+
+transcription_seconds = Histogram(
+    'raed_transcription_seconds', 'Duration of the conversion and transcription of a voice message.',
+    labels=('engine',))
+transcriptions = Counter(
+    'raed_transcriptions_total', 'Voice messages transcribed, by outcome.', labels=('outcome',))
+
+
+class TranscriptionError(Exception):
+    """Raised when a voice message could not be transcribed.
+    """
+
+
+class VoiceTooLong(TranscriptionError):
+    """Raised when a voice message is longer than the limit.
+    """
+
+    def __init__(self, duration: int, limit: int) -> None:
+        """Initializes the exception.
+
+        Args:
+            duration (int): The seconds of the voice message.
+            limit (int): The longest voice message transcribed, in seconds.
+        """
+        super().__init__(f"The voice message lasts {duration}s, more than {limit}s")
+        self.limit: int = limit
+
+
+class Engine(Protocol):
+    """A transcription engine, called in a worker thread.
+
+    It must return or raise `TimeoutError` by the deadline, a `time.monotonic` value.
+    """
+    name: str
+
+    def transcribe(self, path: str, lang: str, limit: int, deadline: float) -> str:
+        ...
+
+
+def run_until(command: list[str], deadline: float) -> bytes:
+    """Runs a command, killed if it is still running at the deadline.
+
+    Args:
+        command (list[str]): The command and its arguments.
+        deadline (float): The `time.monotonic` value the command must end by.
+
+    Returns:
+        bytes: The standard output of the command.
+
+    Raises:
+        TimeoutError: If the deadline passed, the command is killed and waited for.
+        TranscriptionError: If the command failed.
+    """
+    remaining: float = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError(f"No time left to run {command[0]}")
+    try:
+        return subprocess.run(command, check=True, capture_output=True,
+                              timeout=remaining).stdout
+    except subprocess.TimeoutExpired as e:
+        raise TimeoutError(f"{command[0]} was killed after {remaining:.1f}s") from e
+    except subprocess.CalledProcessError as e:
+        raise TranscriptionError(
+            f"{command[0]} failed: {e.stderr.decode(errors='replace').strip()}") from e
+
+
+def to_wav(path: str, limit: int, deadline: float) -> str:
+    """Converts an audio file to a mono 16 kHz WAV file with ffmpeg.
+
+    Args:
+        path (str): The audio file, e.g. the OGG/Opus of a voice message.
+        limit (int): The seconds of audio kept.
+        deadline (float): The `time.monotonic` value the conversion must end by.
+
+    Returns:
+        str: The path of the WAV file, next to the audio file.
+
+    Raises:
+        TimeoutError: If the conversion did not end by the deadline.
+        TranscriptionError: If ffmpeg is missing or the conversion failed.
+    """
+    ffmpeg: str = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise TranscriptionError("ffmpeg is not installed")
+    wav: str = os.path.splitext(path)[0] + '.wav'
+    run_until([ffmpeg, '-nostdin', '-loglevel', 'error', '-y', '-i', path, '-t', str(limit),
+               '-ac', '1', '-ar', str(SAMPLE_RATE), wav], deadline)
+    return wav
+
+
+class SphinxEngine:
+    """Transcribes offline with CMU Sphinx.
+
+    The conversion and the recognition run in child processes, which are killed at
+    the deadline, as Sphinx itself has no time limit.
+    """
+    name: str = 'sphinx'
+
+    def transcribe(self, path: str, lang: str, limit: int, deadline: float) -> str:
+        """Converts and transcribes an audio file.
+
+        Args:
+            path (str): The audio file.
+            lang (str): The language of the user, e.g. 'en'.
+            limit (int): The seconds of audio transcribed.
+            deadline (float): The `time.monotonic` value the transcription must end by.
+
+        Returns:
+            str: The transcript, empty if nothing was understood.
+
+        Raises:
+            TimeoutError: If the transcription did not end by the deadline.
+            TranscriptionError: If the audio could not be converted or transcribed.
+        """
+        wav: str = to_wav(path, limit, deadline)
+        return run_until([sys.executable, '-c', RECOGNIZE, wav,
+                          SPHINX_LANGUAGES.get(lang, lang)], deadline).decode()
+
+
+class StubEngine:
+    """Answers a fixed transcript without reading the audio.
+    """
+    name: str = 'stub'
+
+    def __init__(self, text: str = 'Voice message transcript', delay: float = 0) -> None:
+        """Initializes the engine.
+
+        Args:
+            text (str): The transcript of every voice message.
+            delay (float): Seconds a transcription takes.
+        """
+        self.text: str = text
+        self.delay: float = delay
+        self.calls: list[tuple[str, str]] = []
+
+    def transcribe(self, path: str, lang: str, limit: int, deadline: float) -> str:
+        """Returns the fixed transcript after the delay, or fails at the deadline."""
+        self.calls.append((path, lang))
+        remaining: float = deadline - time.monotonic()
+        if self.delay > remaining:
+            time.sleep(max(remaining, 0))
+            raise TimeoutError(f"The transcription takes {self.delay}s")
+        time.sleep(self.delay)
+        return self.text
+
+
+ENGINES: dict[str, type] = {'sphinx': SphinxEngine, 'stub': StubEngine}
+
+
+def make_engine(name: str = VOICE_ENGINE) -> Engine:
+    """Builds the transcription engine of a name.
+
+    Args:
+        name (str): A name of `ENGINES`.
+
+    Returns:
+        Engine: The engine.
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown voice engine {name!r}, expected one of {sorted(ENGINES)}")
+    return ENGINES[name]()
+
+
+class Transcriber:
+    """Downloads and transcribes the voice messages.
+    """
+
+    def __init__(self, engine: Engine = None, max_seconds: int = VOICE_MAX_SECONDS,
+                 timeout: float = VOICE_TIMEOUT) -> None:
+        """Initializes the transcriber.
+
+        Args:
+            engine (Engine, optional): The engine, built from `VOICE_ENGINE` on first use.
+            max_seconds (int): The longest voice message transcribed, in seconds.
+            timeout (float): Seconds the conversion and transcription may take.
+        """
+        self._engine: Engine = engine
+        self.max_seconds: int = max_seconds
+        self.timeout: float = timeout
+
+    @property
+    def engine(self) -> Engine:
+        """The engine, built on first use."""
+        if self._engine is None:
+            self._engine = make_engine()
+        return self._engine
+
+    async def transcribe(self, bot: 'Bot', audio: Union['Voice', 'Audio'], lang: str) -> str:
+        """Downloads and transcribes a voice message, off the event loop.
+
+        Args:
+            bot (Bot): The bot downloading the file.
+            audio (Voice | Audio): The voice message, or an audio file.
+            lang (str): The language of the user.
+
+        Returns:
+            str: The transcript, empty if nothing was understood.
+
+        Raises:
+            VoiceTooLong: If the message is longer than `max_seconds`.
+            TranscriptionError: If the message could not be downloaded or transcribed.
+        """
+        if audio.duration and audio.duration > self.max_seconds:
+            transcriptions.inc(outcome='too_long')
+            raise VoiceTooLong(audio.duration, self.max_seconds)
+        if audio.file_size and audio.file_size > MAX_FILE_SIZE:
+            transcriptions.inc(outcome='too_large')
+            raise TranscriptionError(f"The voice message has {audio.file_size} bytes")
+
+        directory: str = tempfile.mkdtemp(prefix='raed-voice-')
+        path: str = os.path.join(directory, 'voice.ogg')
+        try:
+            await self.download(bot, audio.file_id, path)
+        except Exception as e:
+            shutil.rmtree(directory, ignore_errors=True)
+            transcriptions.inc(outcome='failed')
+            raise TranscriptionError(f"The voice message could not be downloaded: {e}") from e
+
+        started: float = time.perf_counter()
+        deadline: float = time.monotonic() + self.timeout
+        try:
+            # shielded, a cancelled handler must not cancel the job that removes the directory
+            text: str = await asyncio.shield(run_blocking(
+                'transcription', self._transcribe, directory, path, lang, deadline))
+        except TimeoutError as e:
+            transcriptions.inc(outcome='timeout')
+            raise TranscriptionError(
+                f"The transcription took more than {self.timeout}s") from e
+        except Exception:
+            transcriptions.inc(outcome='failed')
+            raise
+        finally:
+            transcription_seconds.observe(time.perf_counter() - started,
+                                          engine=self.engine.name)
+
+        text = (text or '').strip()
+        transcriptions.inc(outcome='transcribed' if text else 'empty')
+        logger.info("Transcribed %ss of voice into %d characters",
+                    audio.duration, len(text))
+        return text
+
+    def _transcribe(self, directory: str, path: str, lang: str, deadline: float) -> str:
+        """Transcribes a voice message in a worker, then removes its directory.
+
+        Args:
+            directory (str): The temporary directory of the voice message.
+            path (str): The voice message, in the directory.
+            lang (str): The language of the user.
+            deadline (float): The `time.monotonic` value the job must end by.
+
+        Returns:
+            str: The transcript.
+
+        Raises:
+            TimeoutError: If the job was queued past its deadline or the engine hit it.
+        """
+        try:
+            if time.monotonic() >= deadline:
+                raise TimeoutError("The job waited in the queue past its deadline")
+            return self.engine.transcribe(path, lang, self.max_seconds, deadline)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    @staticmethod
+    async def download(bot: 'Bot', file_id: str, path: str) -> None:
+        """Downloads a file to disk, streamed when the request of the bot supports it.
+
+        Args:
+            bot (Bot): The bot downloading the file.
+            file_id (str): The id of the file.
+            path (str): The path the file is written to.
+        """
+        file = await bot.get_file(file_id)
+        stream = getattr(bot.request, 'stream', None)
+        if stream is not None and file.file_path.startswith(('http://', 'https://')):
+            await stream(file.file_path, path, MAX_FILE_SIZE)
+        else:
+            # files of a local Bot API server are copied, other requests read them in memory
+            await file.download_to_drive(path)
+
+
+transcriber: Transcriber = Transcriber()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""This module watches the event loop for blocking calls.
+
+A task on the loop wakes up every `LAG_INTERVAL` seconds and records how late it
+woke up, the lag of the loop. A thread checks that the task keeps waking up: when
+the loop is stalled for longer than `LAG_THRESHOLD`, the thread captures the stack
+of the loop, i.e. the blocking frame, together with the conversation callback that
+is running, and logs it. Reports of the same blocking location are logged at most
+once per `LAG_REPORT_INTERVAL`, every stall is counted in the metrics.
+
+Classes:
+    LoopWatchdog: Measures the lag of an event loop and reports its stalls.
+
+Attributes:
+    watchdog (LoopWatchdog): The watchdog of the application.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from logging import getLogger
+from types import FrameType
+from typing import Optional
+
+from ..config import LAG_INTERVAL, LAG_THRESHOLD, LAG_REPORT_INTERVAL
+from . import sessions
+from .metrics import Counter, Histogram
+
+logger = getLogger(__name__)
+
+# the blocking location is the innermost frame of the project, not of a library
+PROJECT_DIR: str = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+loop_lag = Histogram(
+    'raed_loop_lag_seconds', 'Seconds the event loop was late to wake up a task.',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+loop_stalls = Counter(
+    'raed_loop_stalls_total', 'Stalls of the event loop longer than the threshold.',
+    labels=('location',))
+
+
+def _location(frame: FrameType) -> str:
+    """Returns the innermost frame of the project in the stack, as `file:line`."""
+    innermost: Optional[FrameType] = None
+    while frame is not None:
+        filename: str = frame.f_code.co_filename
+        if filename.startswith(PROJECT_DIR) and 'site-packages' not in filename:
+            innermost = frame
+            break
+        frame = frame.f_back
+    if innermost is None:
+        return 'unknown'
+    return f'{os.path.relpath(innermost.f_code.co_filename, PROJECT_DIR)}:{innermost.f_lineno}'
+
+
+def _callback(frame: FrameType) -> Optional[dict]:
+    """Returns the conversation callback running in the stack, see `sessions.track_state`."""
+    while frame is not None:
+        if frame.f_code.co_filename == sessions.__file__ and frame.f_code.co_name == 'wrapper':
+            return frame.f_locals.get('running')
+        frame = frame.f_back
+    return None
+
+
+class LoopWatchdog:
+    """Measures the lag of an event loop and reports its stalls.
+    """
+
+    def __init__(self, threshold: float = LAG_THRESHOLD, interval: float = LAG_INTERVAL,
+                 report_interval: float = LAG_REPORT_INTERVAL) -> None:
+        """Initializes the watchdog.
+
+        Args:
+            threshold (float): Seconds of lag from which the loop is stalled.
+            interval (float): Seconds between two measures of the lag.
+            report_interval (float): Seconds between two reports of the same location.
+        """
+        self.threshold: float = threshold
+        self.interval: float = interval
+        self.report_interval: float = report_interval
+        self.beat: float = time.monotonic()
+        self._reported: dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread: int = None
+
+    def start(self) -> None:
+        """Starts watching the running loop, must be called from the loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self.beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='raed-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops watching the loop."""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        """Wakes up every interval and records how late it woke up."""
+        while True:
+            expected: float = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.beat = time.monotonic()
+            loop_lag.observe(max(0.0, self.beat - expected))
+
+    def _watch(self) -> None:
+        """Captures the stack of the loop once per stall."""
+        captured: float = None
+        while not self._stopping.wait(self.threshold / 2):
+            beat: float = self.beat
+            if beat == captured or time.monotonic() - beat - self.interval <= self.threshold:
+                continue
+            captured = beat
+            frame: Optional[FrameType] = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self.report(frame, time.monotonic() - beat - self.interval)
+
+    def report(self, frame: FrameType, lag: float) -> None:
+        """Counts a stall and logs the blocking stack, unless its location was just reported.
+
+        Args:
+            frame (FrameType): The frame the loop is blocked in.
+            lag (float): The seconds the loop has been stalled so far.
+        """
+        location: str = _location(frame)
+        loop_stalls.inc(location=location)
+        now: float = time.monotonic()
+        if now - self._reported.get(location, -self.report_interval) < self.report_interval:
+            return
+        self._reported[location] = now
+
+        callback: Optional[dict] = _callback(frame)
+        context: str = (
+            f"in {callback['handler']} (state {callback['state']}, update "
+            f"{callback['update_id']}, chat {callback['chat_id']})"
+            if callback else "outside of a conversation callback")
+        stack: str = ''.join(traceback.format_stack(frame))
+        logger.warning(
+            "Event loop blocked for %.3fs at %s %s:\n%s", lag, location, context, stack)
+
+
+watchdog = LoopWatchdog()
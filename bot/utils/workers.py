@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""This module runs blocking work off the event loop in bounded worker pools.
+
+Every kind of work gets its own named pool, so slow work of one kind (e.g. document
+exports) cannot starve another (e.g. model calls). The work waiting or running in
+every pool is reported as a gauge.
+
+Functions:
+    async def run_blocking(pool, func, *args, timeout=None, **kwargs):
+        Runs a blocking function in the named worker pool and awaits its result.
+
+    shutdown_pools(wait) -> None:
+        Shuts down every worker pool.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from ..config import WORKER_POOLS
+from .metrics import Gauge
+
+pending_work = Gauge(
+    'raed_worker_pool_pending', 'Work waiting or running in the worker pool.', labels=('pool',))
+
+_pools: dict[str, ThreadPoolExecutor] = {}
+
+
+def get_pool(name: str) -> ThreadPoolExecutor:
+    """Returns the named worker pool, creating it on first use.
+
+    Args:
+        name (str): The name of the pool, sized by `WORKER_POOLS`.
+
+    Returns:
+        ThreadPoolExecutor: The worker pool.
+    """
+    if name not in _pools:
+        _pools[name] = ThreadPoolExecutor(
+            max_workers=WORKER_POOLS.get(name, WORKER_POOLS['default']),
+            thread_name_prefix=f'raed-{name}'
+        )
+    return _pools[name]
+
+
+async def run_blocking(pool: str, func: Callable, *args: Any,
+                       timeout: float = None, **kwargs: Any) -> Any:
+    """Runs a blocking function in the named worker pool and awaits its result.
+
+    The function runs in a copy of the current context, so the context variables,
+    e.g. the running conversation callback the logs are correlated with, are set in
+    the worker thread.
+
+    Args:
+        pool (str): The name of the worker pool.
+        func (Callable): The blocking function.
+        *args (Any): Positional arguments for the function.
+        timeout (float, optional): Seconds to wait before raising `asyncio.TimeoutError`.
+        **kwargs (Any): Keyword arguments for the function.
+
+    Returns:
+        Any: The result of the function.
+    """
+    loop = asyncio.get_running_loop()
+    context: contextvars.Context = contextvars.copy_context()
+    future = loop.run_in_executor(get_pool(pool), partial(context.run, func, *args, **kwargs))
+    pending_work.inc(pool=pool)
+    future.add_done_callback(lambda _: pending_work.dec(pool=pool))
+    return await asyncio.wait_for(future, timeout)
+
+
+def shutdown_pools(wait: bool = True) -> None:
+    """Shuts down every worker pool, cancelling the work that did not start.
+
+    Args:
+        wait (bool): Whether to wait for the running work to finish.
+    """
+    while _pools:
+        _, pool = _pools.popitem()
+        pool.shutdown(wait=wait, cancel_futures=True)
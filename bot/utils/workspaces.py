@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""This module keeps the workspaces a team shares its documents and results in.
+
+A workspace is tied to a Telegram group chat, whose members join it with
+`/workspace` in the group, or to an invite code, which users join with
+`/workspace join <code>` in their private chat. A user belongs to one workspace.
+
+The members of a workspace share its artifacts instead of keeping them in their
+own `user_data`:
+
+    - `document`: the extracted and normalized text of the uploaded profile. A
+      file already uploaded by a member is not downloaded again, and members are
+      not asked to upload one when the workspace has it.
+    - every kind of job, e.g. `swot_analysis`: the generated results, found by the
+      fingerprint of their inputs, so a result is generated once for the team.
+
+Every artifact is versioned: saving a different content adds a version, saving the
+same content again does not, and only the last `WORKSPACE_VERSIONS` versions are
+kept. The store is a local SQLite database (in WAL mode).
+
+Classes:
+    WorkspaceStore: The store of the workspaces, their members and artifacts.
+
+Attributes:
+    workspaces (WorkspaceStore): The store used by the handlers and the journal.
+"""
+import os
+import secrets
+import sqlite3
+import time
+from hashlib import sha256
+from logging import getLogger
+from typing import Any
+
+from ..config import WORKSPACE_PATH, WORKSPACE_VERSIONS
+from .artifacts import ArtifactStore
+from .metrics import Counter
+
+logger = getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workspaces (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    code TEXT NOT NULL UNIQUE,
+    chat_id INTEGER UNIQUE,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    user_id INTEGER PRIMARY KEY,
+    workspace_id INTEGER NOT NULL REFERENCES workspaces (id),
+    joined REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    workspace_id INTEGER NOT NULL REFERENCES workspaces (id),
+    name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    content TEXT NOT NULL,
+    author INTEGER,
+    created REAL NOT NULL,
+    PRIMARY KEY (workspace_id, name, version)
+);
+CREATE INDEX IF NOT EXISTS artifacts_fingerprint ON artifacts (workspace_id, fingerprint);
+"""
+DOCUMENT: str = 'document'
+# invite codes avoid letters and digits that look alike
+CODE_ALPHABET: str = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+CODE_LENGTH: int = 8
+
+shared_artifacts = Counter(
+    'raed_workspace_reuses_total', 'Documents and results reused from a workspace.',
+    labels=('artifact',))
+
+
+class WorkspaceStore:
+    """The store of the workspaces, their members and artifacts.
+    """
+
+    def __init__(self, path: str = WORKSPACE_PATH, versions: int = WORKSPACE_VERSIONS) -> None:
+        """Initializes the store, the database is opened on first use.
+
+        Args:
+            path (str): The path of the SQLite database.
+            versions (int): Versions of every artifact kept.
+        """
+        self.path: str = path
+        self.versions: int = versions
+        self._db: sqlite3.Connection = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """The connection to the database, opened on first use."""
+        if self._db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def _get(self, column: str, value: Any) -> dict:
+        """Returns the workspace whose column has the value, with its member count."""
+        row = self.db.execute(
+            'SELECT workspaces.*, (SELECT COUNT(*) FROM members '
+            'WHERE workspace_id = workspaces.id) AS members '
+            f'FROM workspaces WHERE {column} = ?', (value,)).fetchone()
+        return dict(row) if row else None
+
+    def create(self, name: str, user_id: int, chat_id: int = None) -> dict:
+        """Creates a workspace with a new invite code and makes the user its member.
+
+        Args:
+            name (str): The name of the workspace.
+            user_id (int): The user creating it.
+            chat_id (int, optional): The group chat the workspace is tied to.
+
+        Returns:
+            dict: The workspace.
+        """
+        while True:
+            code: str = ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+            try:
+                cursor = self.db.execute(
+                    'INSERT INTO workspaces (name, code, chat_id, created) VALUES (?, ?, ?, ?)',
+                    (name, code, chat_id, time.time()))
+                break
+            except sqlite3.IntegrityError:
+                if chat_id is not None and self._get('chat_id', chat_id):
+                    raise
+        logger.info("User %s created workspace %s", user_id, cursor.lastrowid)
+        return self._join(cursor.lastrowid, user_id)
+
+    def for_chat(self, chat_id: int, name: str, user_id: int) -> dict:
+        """Makes the user a member of the workspace of a group chat, created if needed.
+
+        Args:
+            chat_id (int): The group chat.
+            name (str): The name of the workspace if it is created, e.g. the group's title.
+            user_id (int): The user joining.
+
+        Returns:
+            dict: The workspace.
+        """
+        workspace: dict = self._get('chat_id', chat_id)
+        if workspace is None:
+            return self.create(name, user_id, chat_id)
+        return self._join(workspace['id'], user_id)
+
+    def join(self, code: str, user_id: int) -> dict:
+        """Makes the user a member of the workspace of an invite code.
+
+        Args:
+            code (str): The invite code, in any case.
+            user_id (int): The user joining.
+
+        Returns:
+            dict: The workspace, None if the code is unknown.
+        """
+        workspace: dict = self._get('code', code.strip().upper())
+        return self._join(workspace['id'], user_id) if workspace else None
+
+    def _join(self, workspace_id: int, user_id: int) -> dict:
+        """Makes the user a member of a workspace, leaving their previous one."""
+        self.db.execute(
+            'INSERT INTO members (user_id, workspace_id, joined) VALUES (?, ?, ?) '
+            'ON CONFLICT (user_id) DO UPDATE SET workspace_id = excluded.workspace_id, '
+            'joined = excluded.joined', (user_id, workspace_id, time.time()))
+        return self._get('id', workspace_id)
+
+    def leave(self, user_id: int) -> dict:
+        """Removes the user from their workspace and returns it, None if they had none."""
+        workspace: dict = self.of(user_id)
+        self.db.execute('DELETE FROM members WHERE user_id = ?', (user_id,))
+        return workspace
+
+    def of(self, user_id: int) -> dict:
+        """Returns the workspace of a user, None if they have none."""
+        row = self.db.execute(
+            'SELECT workspace_id FROM members WHERE user_id = ?', (user_id,)).fetchone()
+        return self._get('id', row['workspace_id']) if row else None
+
+    def save(self, workspace_id: int, name: str, content: str, author: int = None,
+             fingerprint: str = '') -> int:
+        """Saves a version of an artifact, unless its last version has the same content.
+
+        Args:
+            workspace_id (int): The workspace.
+            name (str): The name of the artifact, `document` or a kind of job.
+            content (str): The content.
+            author (int, optional): The member saving it.
+            fingerprint (str): Identifies what the content was made from, e.g. the
+                inputs of a result or the uploaded file.
+
+        Returns:
+            int: The version holding the content.
+        """
+        digest: str = sha256(content.encode()).hexdigest()
+        latest: dict = self.latest(workspace_id, name)
+        if latest and latest['digest'] == digest and latest['fingerprint'] == fingerprint:
+            return latest['version']
+        version: int = latest['version'] + 1 if latest else 1
+        self.db.execute(
+            'INSERT INTO artifacts (workspace_id, name, version, fingerprint, digest, content, '
+            'author, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (workspace_id, name, version, fingerprint, digest, content, author, time.time()))
+        self.db.execute(
+            'DELETE FROM artifacts WHERE workspace_id = ? AND name = ? AND version <= ?',
+            (workspace_id, name, version - self.versions))
+        return version
+
+    def latest(self, workspace_id: int, name: str) -> dict:
+        """Returns the last version of an artifact, None if it has none."""
+        row = self.db.execute(
+            'SELECT * FROM artifacts WHERE workspace_id = ? AND name = ? '
+            'ORDER BY version DESC LIMIT 1', (workspace_id, name)).fetchone()
+        return dict(row) if row else None
+
+    def find(self, workspace_id: int, fingerprint: str) -> dict:
+        """Returns the last version of an artifact made from the fingerprint, None if none was."""
+        row = self.db.execute(
+            'SELECT * FROM artifacts WHERE workspace_id = ? AND fingerprint = ? '
+            'ORDER BY created DESC LIMIT 1', (workspace_id, fingerprint)).fetchone()
+        return dict(row) if row else None
+
+    def artifacts(self, workspace_id: int) -> list[dict]:
+        """Returns the name, last version and date of every artifact of a workspace."""
+        return [dict(row) for row in self.db.execute(
+            'SELECT name, MAX(version) AS version, MAX(created) AS updated FROM artifacts '
+            'WHERE workspace_id = ? GROUP BY name ORDER BY name', (workspace_id,))]
+
+    def document(self, user_id: int) -> dict:
+        """Returns the last version of the shared document of a user's workspace, or None."""
+        workspace: dict = self.of(user_id)
+        return self.latest(workspace['id'], DOCUMENT) if workspace else None
+
+    def save_document(self, user_id: int, content: str, file_id: str = '') -> int:
+        """Shares an uploaded document with the user's workspace.
+
+        Args:
+            user_id (int): The member uploading it.
+            content (str): The extracted text of the document.
+            file_id (str): The unique id of the uploaded file.
+
+        Returns:
+            int: The version of the document, None if the user has no workspace.
+        """
+        workspace: dict = self.of(user_id)
+        if workspace is None:
+            return None
+        return self.save(workspace['id'], DOCUMENT, content, user_id, file_id)
+
+    def result(self, user_id: int, kind: str, *args: Any) -> str:
+        """Returns a result of the same kind and inputs generated in the user's workspace.
+
+        Args:
+            user_id (int): The member asking for it.
+            kind (str): The kind of job.
+            *args (Any): The inputs of the job.
+
+        Returns:
+            str: The shared result, None if the user has no workspace or it was not generated.
+        """
+        workspace: dict = self.of(user_id)
+        if workspace is None:
+            return None
+        artifact: dict = self.find(workspace['id'], ArtifactStore.fingerprint(kind, *map(str, args)))
+        if artifact is None:
+            return None
+        shared_artifacts.inc(artifact='result')
+        logger.info("Reusing %s version %s of workspace %s", kind, artifact['version'],
+                    workspace['id'])
+        return artifact['content']
+
+    def save_result(self, user_id: int, kind: str, args: tuple, output: str) -> int:
+        """Shares a generated result with the user's workspace.
+
+        Args:
+            user_id (int): The member it was generated for.
+            kind (str): The kind of job.
+            args (tuple): The inputs of the job.
+            output (str): The generated result.
+
+        Returns:
+            int: The version of the result, None if the user has no workspace.
+        """
+        workspace: dict = self.of(user_id)
+        if workspace is None:
+            return None
+        return self.save(workspace['id'], kind, output, user_id,
+                         ArtifactStore.fingerprint(kind, *map(str, args)))
+
+
+workspaces: WorkspaceStore = WorkspaceStore()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""A local fake of the Telegram Bot API for tests.
+
+It answers the API calls the bot makes with plausible results, serves the files
+added with `add_file`, and records every call. Updates added with `add_update`
+are returned by `getUpdates`.
+"""
+import asyncio
+import json
+import time
+from itertools import count
+from urllib.parse import parse_qsl
+
+from bot.utils.http import Request, serve_http
+
+BOT = {'id': 1, 'is_bot': True, 'first_name': 'Raed', 'username': 'raed_bot',
+       'can_join_groups': True, 'can_read_all_group_messages': False,
+       'supports_inline_queries': False}
+
+
+class FakeBotAPI:
+    """ """
+
+    def __init__(self, delay: float = 0):
+        """ """
+        self.delay = delay
+        self.calls: list[tuple[str, dict]] = []
+        self.files: dict[str, bytes] = {}
+        self.updates: asyncio.Queue = None
+        self.server = None
+        self._message_ids = count(1)
+
+    @property
+    def port(self) -> int:
+        """ """
+        return self.server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        """ """
+        return f'http://127.0.0.1:{self.port}/bot'
+
+    @property
+    def base_file_url(self) -> str:
+        """ """
+        return f'http://127.0.0.1:{self.port}/file/bot'
+
+    async def start(self) -> 'FakeBotAPI':
+        """ """
+        self.updates = asyncio.Queue()
+        self.server = await serve_http(self.handle, '127.0.0.1', 0)
+        return self
+
+    async def stop(self) -> None:
+        """ """
+        self.server.close()
+        await self.server.wait_closed()
+
+    def add_file(self, file_id: str, content: bytes) -> None:
+        """ """
+        self.files[file_id] = content
+
+    def add_update(self, update: dict) -> None:
+        """ """
+        self.updates.put_nowait(update)
+
+    def called(self, method: str) -> list[dict]:
+        """ """
+        return [params for name, params in self.calls if name == method]
+
+    @staticmethod
+    def _params(request: Request) -> dict:
+        """ """
+        content_type = request.headers.get('content-type', '')
+        if content_type.startswith('application/json'):
+            return json.loads(request.body or b'{}')
+        if content_type.startswith('multipart/form-data'):
+            # only the field names matter to the tests.
+            return {'multipart': True, 'size': len(request.body)}
+        return dict(parse_qsl(request.body.decode()))
+
+    def _message(self, params: dict) -> dict:
+        """ """
+        return {'message_id': next(self._message_ids), 'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'},
+                'from': BOT, 'text': params.get('text', '')}
+
+    async def handle(self, request: Request) -> tuple[int, str, bytes]:
+        """ """
+        parts = request.path.strip('/').split('/')
+        if request.method == 'GET' and parts[0] == 'file':
+            content = self.files.get(parts[-1])
+            self.calls.append(('download', {'file_id': parts[-1]}))
+            return (200, 'application/octet-stream', content) if content else (404, 'text/plain', b'')
+
+        method, params = parts[-1], self._params(request)
+        self.calls.append((method, params))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+        if method == 'getMe':
+            result = BOT
+        elif method == 'getUpdates':
+            try:
+                timeout = float(params.get('timeout') or 0)
+                update = await asyncio.wait_for(self.updates.get(), min(timeout, 1) or 0.01)
+                result = [update]
+            except asyncio.TimeoutError:
+                result = []
+        elif method == 'getFile':
+            file_id = params['file_id']
+            result = {'file_id': file_id, 'file_unique_id': file_id,
+                      'file_size': len(self.files.get(file_id, b'')), 'file_path': file_id}
+        elif method.startswith(('send', 'edit')):
+            result = self._message(params)
+        else:
+            result = True
+        return 200, 'application/json', json.dumps({'ok': True, 'result': result}).encode()
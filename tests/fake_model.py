@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""A fake of the Gemini model for the tests of the journal.
+
+It answers the SWOT analysis with its name and the input, counts its calls, and
+reports the tokens it was given to the usage ledger as the model would.
+"""
+from bot.utils.usage import count_tokens
+
+
+class FakeModel:
+    """ """
+
+    def __init__(self, name: str = 'SWOT', tokens: tuple = ()):
+        """ """
+        self.name = name
+        self.tokens = tokens
+        self.calls = 0
+
+    def swot_analysis(self, user_input):
+        """ """
+        self.calls += 1
+        for prompt, output in self.tokens:
+            count_tokens(prompt, output)
+        return f'<b>{self.name}</b> {user_input}'
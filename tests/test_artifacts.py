@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+import re
+import unittest
+from bot.utils.artifacts import ArtifactStore, split_sections, stitch_sections
+from bot.gemini.base import Gemini, CONCEPT_NOTE_SECTIONS, FULL_PROPOSAL_SECTIONS, split_failures
+
+
+class FakeResponse:
+    """ """
+
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+    def __iter__(self):
+        yield self
+
+
+class FakeModel:
+    """Answers every prompt with the sections it was asked for."""
+
+    def __init__(self, section=lambda marker, heading: f"<b>{heading}:</b> text of {heading}"):
+        self.prompts = []
+        self.section = section
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        asked = re.findall(r'(\[\[\d+\]\]) <b>(.+?):</b> ', prompt)
+        return FakeResponse('\n'.join(self.section(marker, h) for marker, h in asked))
+
+
+class TestArtifacts(unittest.TestCase):
+    """ """
+
+    def test_split_and_stitch(self):
+        """ """
+        text = "<b>The Problem:</b> no water\n<b>General Goal:</b> water"
+        sections = split_sections(text, ['General Goal', 'The Problem'])
+        self.assertEqual(sections['The Problem'], '<b>The Problem:</b> no water')
+        self.assertEqual(sections['General Goal'], '<b>General Goal:</b> water')
+        self.assertEqual(
+            stitch_sections(sections, ['The Problem', 'General Goal']), text.replace('\n', '\n\n'))
+
+    def test_store_lookup(self):
+        """ """
+        user_data = {}
+        store = ArtifactStore(user_data)
+        fingerprints = {'A': store.fingerprint('A', 'x'), 'B': store.fingerprint('B', 'x')}
+        store.save({'A': 'a'}, fingerprints)
+        self.assertEqual(store.lookup(fingerprints), {'A': 'a'})
+        self.assertEqual(store.lookup({'A': store.fingerprint('A', 'y')}), {})
+
+    def test_proposal_reuses_concept_note(self):
+        """ """
+        model = Gemini.__new__(Gemini)
+        model._model = FakeModel()
+        store = ArtifactStore({})
+
+        note = model.generate_concept_note('no water', 'profile', store)
+        self.assertEqual(list(split_sections(note, list(CONCEPT_NOTE_SECTIONS))),
+                         list(CONCEPT_NOTE_SECTIONS))
+
+        proposal = model.generate_full_proposal('no water', 'profile', store)
+        self.assertEqual(list(split_sections(proposal, list(FULL_PROPOSAL_SECTIONS))),
+                         list(FULL_PROPOSAL_SECTIONS))
+        prompt = model._model.prompts[-1]
+        self.assertIn('<b>Activities:</b> Outline', prompt)
+        self.assertNotIn('<b>The Problem:</b> Describe', prompt)
+
+        model.generate_full_proposal('no water', 'profile', store)
+        self.assertEqual(len(model._model.prompts), 2)
+
+    def test_split_plain_headings(self):
+        """ """
+        text = "1. The Problem:\nno water\n\n**General Goal**\nwater\nThe problem is the Activities: none"
+        sections = split_sections(text, ['General Goal', 'The Problem'])
+        self.assertEqual(sections['The Problem'], '1. The Problem:\nno water')
+        self.assertEqual(sections['General Goal'], '**General Goal**\nwater\n'
+                                                   'The problem is the Activities: none')
+        self.assertEqual(split_sections(text, ['Activities']), {})
+
+    def test_split_markers(self):
+        """ """
+        text = "[[2]] الهدف العام: مياه\n[[1]] المشكلة: لا مياه"
+        self.assertEqual(split_sections(text, ['The Problem', 'General Goal']),
+                         {'The Problem': 'المشكلة: لا مياه', 'General Goal': 'الهدف العام: مياه'})
+
+    def test_plain_text_papers_are_reused(self):
+        """ """
+        for section in (lambda marker, heading: f"{heading}:\ntext of {heading}",
+                        lambda marker, heading: f"{marker} عنوان\nنص"):
+            model = Gemini.__new__(Gemini)
+            model._model = FakeModel(section)
+            store = ArtifactStore({})
+            model.generate_concept_note('no water', 'profile', store)
+            model.generate_full_proposal('no water', 'profile', store)
+            self.assertNotIn('The Problem:</b> Describe', model._model.prompts[-1])
+            self.assertIn('[[1]] <b>Project Importance:</b>', model._model.prompts[-1])
+
+    def test_split_failures_are_counted(self):
+        """ """
+        before = split_failures.values.get(('concept_note',), 0)
+        model = Gemini.__new__(Gemini)
+        model._model = FakeModel(lambda marker, heading: 'text')
+        user_data = {}
+        self.assertTrue(model.generate_concept_note('no water', 'profile', ArtifactStore(user_data)))
+        self.assertEqual(user_data, {})
+        self.assertEqual(split_failures.values[('concept_note',)], before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
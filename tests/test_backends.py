@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from bot.gemini import base
+from bot.gemini.backends import CassetteMiss, RecordingBackend, ReplayBackend
+from bot.gemini.base import Gemini
+
+
+class FakeStream:
+    """ """
+
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+        self.text = ''.join(chunks)
+        self.usage_metadata = SimpleNamespace(prompt_token_count=10,
+                                              candidates_token_count=len(chunks))
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeModel:
+    """ """
+
+    def generate_content(self, prompt, stream=False):
+        return FakeStream([prompt.upper(), ' done'], 0.05)
+
+
+class TestBackends(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.cassette = os.path.join(tempfile.mkdtemp(), 'cassette.jsonl')
+        recorder = Gemini(backend=RecordingBackend(FakeModel(), self.cassette, 'be brief'))
+        self.assertEqual(recorder._generate('analyze the water crisis'),
+                         'ANALYZE THE WATER CRISIS done')
+        self.assertEqual(recorder._generate('write a concept note'),
+                         'WRITE A CONCEPT NOTE done')
+
+    def test_replay_with_scaled_timing(self):
+        """ """
+        backend = ReplayBackend(self.cassette, 0, 'be brief', strict=True)
+        model = Gemini(backend=backend)
+        started = time.perf_counter()
+        self.assertEqual(model._generate('write a concept note', 'test_replay'),
+                         'WRITE A CONCEPT NOTE done')
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertEqual(base.model_tokens.values[('test_replay', 'prompt')], 10)
+
+        backend.time_scale = 1
+        started = time.perf_counter()
+        self.assertEqual(model._generate('write a concept note'), 'WRITE A CONCEPT NOTE done')
+        self.assertGreaterEqual(time.perf_counter() - started, 0.1)
+
+    def test_strict_replay_misses(self):
+        """ """
+        backend = ReplayBackend(self.cassette, 0, 'another instruction', strict=True)
+        with self.assertRaises(CassetteMiss):
+            backend.generate_content('write a concept note', stream=True)
+
+    def test_changed_prompt_replays_closest(self):
+        """ """
+        backend = ReplayBackend(self.cassette, 0, 'be brief')
+        response = backend.generate_content('write a concept note about water', stream=True)
+        self.assertEqual(response.text, 'WRITE A CONCEPT NOTE done')
+        # 10 tokens for 20 characters, the new prompt has 32
+        self.assertEqual(response.usage_metadata.prompt_token_count, 16)
+        self.assertEqual(backend.misses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import unittest
+from bot.utils.catalog import catalog
+
+
+class TestCatalog(unittest.TestCase):
+    """ """
+
+    def test_catalog_is_complete(self):
+        """ """
+        self.assertEqual(catalog.validate(), {})
+
+    def test_text(self):
+        """ """
+        self.assertEqual(catalog.text('common.try_again', 'en'), 'Please try again. ❌')
+        self.assertEqual(catalog.text('common.try_again', 'ar-SD'),
+                         catalog.text('common.try_again', 'ar'))
+        self.assertEqual(catalog.text('common.try_again', 'fr'),
+                         catalog.text('common.try_again', 'en'))
+        self.assertEqual(catalog.text('language.set', 'en', language='<en>'),
+                         'Your language has been set to &lt;en&gt;. 🌐')
+
+    def test_keyboards_are_cached(self):
+        """ """
+        self.assertIs(catalog.keyboard('tasks', 'ar'), catalog.keyboard('tasks', 'ar'))
+        self.assertIs(catalog.keyboard('tasks', 'fr'), catalog.keyboard('tasks', 'en'))
+        callbacks = [row[0].callback_data for row in catalog.language_keyboard().inline_keyboard]
+        self.assertEqual(sorted(callbacks), sorted(catalog.languages))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
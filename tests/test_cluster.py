@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import asyncio
+import copy
+import json
+import os
+import tempfile
+import unittest
+from bot.cluster import Front, orphaned_journals, route, sender_of
+from bot.utils.journal import JobJournal
+from bot.utils.memory import UserData
+from bot.utils.shared import LocalStore, SharedPersistence
+
+
+def message(update_id, chat_id):
+    """ """
+    return {'update_id': update_id, 'message': {
+        'message_id': 1, 'date': 0, 'text': 'hi',
+        'chat': {'id': chat_id, 'type': 'private'}, 'from': {'id': chat_id}}}
+
+
+class TestCluster(unittest.TestCase):
+    """ """
+
+    def test_sender_of(self):
+        """ """
+        self.assertEqual(sender_of(message(1, 42)), 42)
+        # the updates of a user in a group go to the worker owning the user
+        group = message(2, -100)
+        group['message']['from'] = {'id': 42}
+        self.assertEqual(sender_of(group), 42)
+        callback = {'update_id': 3, 'callback_query': {
+            'id': '1', 'from': {'id': 7}, 'message': {'chat': {'id': 42}}}}
+        self.assertEqual(sender_of(callback), 7)
+        post = {'update_id': 4, 'channel_post': {'chat': {'id': -200}}}
+        self.assertEqual(sender_of(post), -200)
+
+    def test_route_is_sticky(self):
+        """ """
+        self.assertEqual(route(42, 4), route(42, 4))
+        self.assertEqual({route(chat, 4) for chat in range(100)}, {0, 1, 2, 3})
+
+    def test_orphaned_journals_are_adopted(self):
+        """ """
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'journal.sqlite3')
+        for index in range(4):
+            journal = JobJournal(os.path.join(directory, f'journal-{index}.sqlite3'))
+            journal._record(f'job-{index}', index, index, 'en', 'swot_analysis', ('water',))
+            journal._record(f'done-{index}', index, index, 'en', 'swot_analysis', ('food',))
+            journal._set(f'done-{index}', 'delivered')
+        # the workers were reduced from 4 to 2
+        orphaned = orphaned_journals(path, 2)
+        self.assertEqual([os.path.basename(p) for p in orphaned],
+                         ['journal-2.sqlite3', 'journal-3.sqlite3'])
+
+        first = JobJournal(os.path.join(directory, 'journal-0.sqlite3'))
+        self.assertEqual([first.adopt(p) for p in orphaned], [1, 1])
+        self.assertEqual([job['id'] for job in first.unfinished()], ['job-0', 'job-2', 'job-3'])
+        self.assertEqual(orphaned_journals(path, 2), [])
+
+    def test_front_dedupes_and_routes(self):
+        """ """
+        from bot.utils.http import serve_http
+
+        front = Front(workers=2, store=LocalStore())
+
+        async def post(port, body):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'POST /webhook HTTP/1.1\r\nContent-Length: %d\r\n\r\n' % len(body)
+                         + body)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        async def scenario():
+            server = await serve_http(front.receive, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            body = json.dumps(message(10, 42)).encode()
+            responses = [await post(port, body), await post(port, body),
+                         await post(port, b'not json')]
+            server.close()
+            await server.wait_closed()
+            return responses
+
+        first, retried, invalid = asyncio.run(scenario())
+        self.assertTrue(first.startswith(b'HTTP/1.1 200'))
+        self.assertTrue(retried.startswith(b'HTTP/1.1 200'))
+        self.assertTrue(invalid.startswith(b'HTTP/1.1 400'))
+        queue = front.queues[route(42, 2)]
+        self.assertEqual(json.loads(queue.get(timeout=5))['update_id'], 10)
+        self.assertTrue(queue.empty())
+
+    def test_shared_persistence(self):
+        """ """
+        store = LocalStore()
+        persistence = SharedPersistence(store, owns=lambda user_id: user_id != 2)
+
+        async def scenario():
+            data = UserData(id=1, language_code='ar')
+            await persistence.update_user_data(1, copy.deepcopy(data))
+            await persistence.update_user_data(2, {'id': 2})
+            await persistence.update_conversation('raed', (1, 1), 3)
+            await persistence.update_conversation('raed', (2, 2), 4)
+            await persistence.update_conversation('raed', (1, 1), None)
+            await persistence.update_conversation('raed', (3, 3), 5)
+            # a conversation in a group belongs to the worker of its user
+            await persistence.update_conversation('raed', (-100, 3), 6)
+            await persistence.update_conversation('raed', (-100, 2), 7)
+            return (await persistence.get_user_data(),
+                    await persistence.get_conversations('raed'))
+
+        users, conversations = asyncio.run(scenario())
+        self.assertEqual(list(users), [1])
+        self.assertIsInstance(users[1], UserData)
+        self.assertEqual(users[1]['language_code'], 'ar')
+        self.assertEqual(conversations, {(3, 3): 5, (-100, 3): 6})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+import unittest
+from io import BytesIO
+from docx import Document
+from bot.utils.docxtext import iter_docx_text
+from bot.utils.utilties import extract_text_from_file
+
+
+def budget_docx() -> bytes:
+    """A document with a paragraph, a table and a closing paragraph."""
+    document = Document()
+    document.add_paragraph('Project budget')
+    table = document.add_table(rows=2, cols=3)
+    for row, cells in zip(table.rows, [('Item', 'Unit', 'Cost'), ('Wells', '4', '12000')]):
+        for cell, text in zip(row.cells, cells):
+            cell.text = text
+    nested = table.rows[1].cells[0].add_table(rows=1, cols=2)
+    nested.rows[0].cells[0].text = 'drilling'
+    nested.rows[0].cells[1].text = 'pumps'
+    paragraph = document.add_paragraph('Total\t')
+    paragraph.add_run('12000')
+    buffer = BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+class TestDocxText(unittest.TestCase):
+    """ """
+
+    def test_document_order(self):
+        """ """
+        self.assertEqual(list(iter_docx_text(BytesIO(budget_docx()))), [
+            'Project budget',
+            'Item | Unit | Cost',
+            'Wells drilling | pumps | 4 | 12000',
+            'Total\t12000',
+        ])
+
+    def test_limit_stops_reading(self):
+        """ """
+        self.assertEqual(list(iter_docx_text(BytesIO(budget_docx()), limit=20)),
+                         ['Project budget', 'Item | Unit | Cost'])
+
+    def test_tables_reach_the_extracted_text(self):
+        """ """
+        text = extract_text_from_file(BytesIO(budget_docx()), 'budget.docx')
+        self.assertIn('Item | Unit | Cost\nWells drilling | pumps | 4 | 12000', text)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from io import BytesIO
+
+from docx import Document
+from bot.utils.export import export_docx, is_rtl
+
+
+class TestExport(unittest.TestCase):
+    """ """
+
+    def test_is_rtl(self):
+        """ """
+        self.assertTrue(is_rtl('مذكرة مفاهيمية about water'))
+        self.assertFalse(is_rtl('Concept note عن'))
+
+    def test_export_docx(self):
+        """ """
+        text = '<b>The Problem:</b> no <b>clean</b> water\n\n<b>المقدمة (السياق):</b>\nنص'
+        document = Document(BytesIO(asyncio.run(export_docx(text, 'Concept Note'))))
+        paragraphs = [(p.style.name, p.text) for p in document.paragraphs]
+        self.assertEqual(paragraphs, [
+            ('Title', 'Concept Note'),
+            ('Heading 1', 'The Problem'),
+            ('Normal', 'no clean water'),
+            ('Heading 1', 'المقدمة (السياق)'),
+            ('Normal', 'نص'),
+        ])
+        self.assertTrue(document.paragraphs[2].runs[1].bold)
+        self.assertIsNotNone(document.paragraphs[4]._p.pPr.find(
+            '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}bidi'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import unittest
+from io import BytesIO
+from benchmarks.corpus import ARABIC, HEADER, build_corpus
+from benchmarks.extraction import parse_args, run_benchmark
+from bot.utils.utilties import extract_text_from_file
+
+
+class TestExtractionBenchmark(unittest.TestCase):
+    """ """
+
+    def test_corpus_is_extractable(self):
+        """ """
+        corpus = {document.file_name: document
+                  for document in build_corpus(0.1, formats=('pdf', 'docx'))}
+        self.assertEqual(len(corpus), 12)
+        self.assertEqual(corpus['many-pages.pdf'].pages, 30)
+
+        document = corpus['ar-small.pdf']
+        text = extract_text_from_file(BytesIO(document.data), document.file_name)
+        # Arabic words come out in logical order, the single page keeps its header
+        self.assertTrue(text.startswith(HEADER))
+        self.assertTrue(set(text[len(HEADER):].replace('.', ' ').split()) <= set(ARABIC))
+        self.assertEqual(build_corpus(0.1, formats=('pdf',))[0].data, corpus['en-small.pdf'].data)
+
+    def test_benchmark_results(self):
+        """ """
+        options = parse_args(['--scale', '0.05', '--repeat', '1', '--formats', 'pdf', 'docx',
+                              '--backends', 'bot'])
+        results = run_benchmark(options)
+        self.assertEqual(set(results['totals']), {'pdf', 'docx'})
+        self.assertEqual(results['totals']['pdf']['bot']['pages'], 22)
+        measures = results['documents']['tables.docx']['backends']['bot']
+        self.assertGreater(measures['pages_per_second'], 0)
+        self.assertGreater(measures['memory_peak'], 0)
+        self.assertGreater(measures['output_chars'], 0)
+        self.assertEqual(results['versions']['pypdf'], __import__('pypdf').__version__)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
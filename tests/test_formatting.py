@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import unittest
+from bot.utils.formatting import sanitize_html, split_html, strip_html
+
+
+class TestFormatting(unittest.TestCase):
+    """ """
+
+    def test_sanitize_html(self):
+        """ """
+        self.assertEqual(sanitize_html('1 < 2 & 3 > 2'), '1 &lt; 2 &amp; 3 &gt; 2')
+        self.assertEqual(sanitize_html('<b>open <i>nested'), '<b>open <i>nested</i></b>')
+        self.assertEqual(sanitize_html('stray </b> closer'), 'stray  closer')
+        self.assertEqual(sanitize_html('<p>one</p><p>two</p>'), 'one\n\ntwo')
+        self.assertEqual(sanitize_html('<script>x</script>'),
+                         '&lt;script&gt;x&lt;/script&gt;')
+        self.assertEqual(sanitize_html('<a href="https://x.y/?a=1&b=2">link</a>'),
+                         '<a href="https://x.y/?a=1&amp;b=2">link</a>')
+
+    def test_split_html_keeps_tags_balanced(self):
+        """ """
+        text = sanitize_html(
+            '<b>Title</b>\n\n' + '\n\n'.join('<i>' + 'word ' * 100 + '</i>' for _ in range(20)))
+        chunks = split_html(text, 1000)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 1000)
+            self.assertEqual(chunk.count('<i>'), chunk.count('</i>'))
+        self.assertEqual(strip_html(''.join(chunks)).split(), strip_html(text).split())
+
+    def test_split_html_long_paragraph(self):
+        """ """
+        chunks = split_html(sanitize_html('<b>' + 'x' * 3000 + '</b>'), 1000)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 1000)
+            self.assertTrue(chunk.startswith('<b>') and chunk.endswith('</b>'))
+        self.assertEqual(''.join(strip_html(chunk) for chunk in chunks), 'x' * 3000)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import asyncio
+import gc
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from bot.utils.journal import JobJournal, Interrupted
+from bot.utils.workers import get_pool, shutdown_pools
+from tests.fake_model import FakeModel
+
+
+class TestJournal(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.path = os.path.join(tempfile.mkdtemp(), 'journal.sqlite3')
+        self.model = FakeModel()
+        self.journal = JobJournal(self.path, model=lambda: self.model)
+        self.bot = SimpleNamespace(send_message=AsyncMock())
+
+    def test_wal_mode(self):
+        """ """
+        mode = self.journal.db.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
+
+    def test_generate_and_deliver_once(self):
+        """ """
+        output = asyncio.run(self.journal.generate(1, 2, 'en', 'swot_analysis', 'water'))
+        self.assertEqual(output, '<b>SWOT</b> water')
+        job_id = JobJournal.job_id(1, 'swot_analysis', 'water')
+        self.assertEqual(self.journal.get(job_id)['state'], 'generated')
+
+        # a failed send leaves the result available without generating it again.
+        with self.assertRaises(RuntimeError):
+            with self.journal.delivering(job_id) as owned:
+                self.assertTrue(owned)
+                raise RuntimeError('network')
+        asyncio.run(self.journal.generate(1, 2, 'en', 'swot_analysis', 'water'))
+        self.assertEqual(self.model.calls, 1)
+
+        with self.journal.delivering(job_id) as owned:
+            self.assertTrue(owned)
+        with self.journal.delivering(job_id) as owned:
+            self.assertFalse(owned)
+        self.assertEqual(self.journal.get(job_id)['state'], 'delivered')
+
+    def test_resume_after_restart(self):
+        """ """
+        async def stop():
+            self.journal.close(0)
+            with self.assertRaises(Interrupted):
+                await self.journal.generate(1, 2, 'ar', 'swot_analysis', 'water')
+
+        asyncio.run(stop())
+        self.assertEqual(self.model.calls, 0)
+        self.assertEqual(len(self.journal.unfinished()), 1)
+
+        restarted = JobJournal(self.path, model=lambda: self.model)
+        asyncio.run(restarted.resume(self.bot))
+        self.assertEqual(self.model.calls, 1)
+        self.assertEqual(self.bot.send_message.await_count, 2)
+        self.assertEqual(self.bot.send_message.await_args.args[0], 1)
+        self.assertEqual(restarted.unfinished(), [])
+
+        asyncio.run(restarted.resume(self.bot))
+        self.assertEqual(self.bot.send_message.await_count, 2)
+
+    def test_abandoned_jobs_are_retrieved(self):
+        """ """
+        def failing(user_input):
+            time.sleep(1.5)
+            raise RuntimeError('model')
+
+        self.model.swot_analysis = failing
+        errors = []
+
+        async def stop():
+            asyncio.get_running_loop().set_exception_handler(
+                lambda loop, context: errors.append(context))
+            waiting = asyncio.create_task(
+                self.journal.generate(1, 2, 'en', 'swot_analysis', 'water'))
+            await asyncio.sleep(0.1)
+            self.journal.close(0)
+            with self.assertRaises(Interrupted):
+                await waiting
+            await self.journal.drain()
+            started = time.monotonic()
+            shutdown_pools(wait=False)
+            self.assertLess(time.monotonic() - started, 0.5)
+            await asyncio.sleep(1.5)
+            gc.collect()
+
+        asyncio.run(stop())
+        self.assertEqual(errors, [])
+        # the pools are created again on demand
+        self.assertEqual(get_pool('generation').submit(lambda: 1).result(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from benchmarks.common import compare, percentiles
+from benchmarks.loadtest import FakeGenerativeModel, parse_args, run_load_test
+
+
+class TestLoadTest(unittest.TestCase):
+    """ """
+
+    def test_percentiles_and_compare(self):
+        """ """
+        summary = percentiles([i / 100 for i in range(1, 101)])
+        self.assertEqual((summary['p50'], summary['p95'], summary['p99']), (0.51, 0.96, 1.0))
+
+        baseline = {'config': {'users': 10}, 'throughput': {'flows_per_second': 10},
+                    'states': {'start': {'p95': 1.0, 'count': 10}}}
+        results = {'config': {'users': 20}, 'throughput': {'flows_per_second': 7},
+                   'states': {'start': {'p95': 1.1, 'count': 30}}}
+        self.assertEqual(compare(results, baseline, tolerance=0.2),
+                         ['throughput.flows_per_second: 10 -> 7 (-30%)'])
+
+    def test_fake_model_sections(self):
+        """ """
+        model = FakeGenerativeModel(latency=0, output_chars=600, seed=1)
+        response = model.generate_content('<b>The Problem:</b> x<b>General Goal:</b> y', stream=True)
+        self.assertEqual(len(list(response)), 5)
+        self.assertTrue(response.text.startswith('<b>The Problem:</b> '))
+        self.assertIn('\n<b>General Goal:</b> ', response.text)
+
+    def test_flow(self):
+        """ """
+        options = parse_args(['--users', '2', '--ramp', '0', '--model-latency', '0'])
+        results = asyncio.run(run_load_test(options))
+        self.assertEqual((results['completed'], results['failed']), (2, 0))
+        self.assertEqual(results['model']['calls'], 4)
+        self.assertEqual(results['states']['SET_TASKS']['count'], 4)
+        self.assertEqual(results['states']['CONCEPT_NOTE']['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import asyncio
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import unittest
+from types import SimpleNamespace
+from bot import SET_TASKS
+from bot.utils import logs
+from bot.utils.logs import ContextFilter, DroppingQueueHandler, JsonFormatter, SamplingFilter
+from bot.utils.sessions import track_state
+from bot.utils.workers import run_blocking
+
+
+class Formatted:
+    """Counts how many times it was formatted."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __str__(self):
+        self.count += 1
+        return 'formatted'
+
+
+class TestLogs(unittest.TestCase):
+    """ """
+
+    def logger(self, records, rate=1):
+        """ """
+        handler = DroppingQueueHandler(records)
+        handler.addFilter(SamplingFilter(rate))
+        handler.addFilter(ContextFilter())
+        logger = logging.getLogger(f'test.logs.{self.id()}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+        return logger
+
+    def test_json_lines_with_context(self):
+        """ """
+        records = queue.Queue()
+        logger = self.logger(records)
+        stream = io.StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(JsonFormatter())
+        listener = logging.handlers.QueueListener(records, output)
+        value = Formatted()
+
+        async def set_tasks(update, context):
+            logger.info('Selected %s', value)
+            return SET_TASKS
+
+        update = SimpleNamespace(update_id=5, effective_user=SimpleNamespace(id=20),
+                                 effective_chat=SimpleNamespace(id=10))
+        asyncio.run(track_state(set_tasks)(update, SimpleNamespace(user_data={})))
+        # formatted by the listener, not by the callback.
+        self.assertEqual(value.count, 0)
+        listener.start()
+        listener.stop()
+
+        line = json.loads(stream.getvalue())
+        self.assertEqual(line['message'], 'Selected formatted')
+        self.assertEqual(line['level'], 'INFO')
+        self.assertEqual((line['update_id'], line['user_id'], line['chat_id']), (5, 20, 10))
+        self.assertEqual((line['handler'], line['state']), ('set_tasks', 'none'))
+
+    def test_context_in_worker_pools(self):
+        """ """
+        records = queue.Queue()
+        logger = self.logger(records)
+
+        async def swot_analysis_method(update, context):
+            await run_blocking('generation', logger.info, 'Generating')
+
+        update = SimpleNamespace(update_id=6, effective_user=SimpleNamespace(id=21),
+                                 effective_chat=SimpleNamespace(id=11))
+        asyncio.run(track_state(swot_analysis_method)(update, SimpleNamespace(user_data={})))
+        record = records.get_nowait()
+        self.assertEqual((record.update_id, record.user_id, record.chat_id), (6, 21, 11))
+        self.assertEqual(record.handler, 'swot_analysis_method')
+
+    def test_drop_when_full(self):
+        """ """
+        logger = self.logger(queue.Queue(1))
+        before = logs.dropped_records.values.get(('WARNING',), 0)
+        for _ in range(3):
+            logger.warning('overloaded')
+        self.assertEqual(logs.dropped_records.values[('WARNING',)], before + 2)
+
+    def test_sampling(self):
+        """ """
+        records = queue.Queue()
+        logger = self.logger(records, rate=0)
+        before = logs.sampled_records.values.get((), 0)
+        logger.info('frequent')
+        logger.error('rare')
+        self.assertEqual(records.get_nowait().getMessage(), 'rare')
+        self.assertTrue(records.empty())
+        self.assertEqual(logs.sampled_records.values[()], before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import gc
+import os
+import random
+import string
+import tempfile
+import unittest
+from bot.utils import memory
+from bot.utils.memory import UserData, MemoryManager
+
+
+def random_text(size):
+    """ """
+    return ''.join(random.choices(string.ascii_letters + ' ', k=size))
+
+
+class TestMemory(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.spill_dir = tempfile.mkdtemp()
+        self.previous = memory.manager
+        memory.manager = MemoryManager(
+            user_budget=25000, total_budget=50000, spill_dir=self.spill_dir)
+
+    def tearDown(self):
+        """ """
+        memory.manager = self.previous
+
+    def test_large_values_are_compressed(self):
+        """ """
+        data = UserData(id=1)
+        data['document'] = 'water ' * 10000
+        data['language_code'] = 'ar'
+        self.assertEqual(data['document'], 'water ' * 10000)
+        self.assertEqual(data.get('language_code'), 'ar')
+        self.assertLess(data.size, 1000)
+        self.assertEqual(memory.manager.total, data.size)
+
+    def test_budgets_spill_to_disk(self):
+        """ """
+        users = [UserData(id=i) for i in range(4)]
+        documents = [random_text(30000) for _ in users]
+        for data, document in zip(users, documents):
+            data['document'] = document
+
+        report = memory.manager.report()
+        self.assertLessEqual(report['total'], 50000)
+        self.assertGreater(report['users'][0]['disk'], 0)
+        self.assertEqual(report['users'][3]['disk'], 0)
+        self.assertTrue(os.listdir(self.spill_dir))
+
+        self.assertEqual(users[0]['document'], documents[0])
+        self.assertEqual(memory.manager.report()['users'][0]['disk'], 0)
+
+    def test_clear_releases_memory(self):
+        """ """
+        data = UserData(id=1, document=random_text(10000))
+        data.clear()
+        self.assertEqual(memory.manager.total, 0)
+        self.assertEqual(memory.manager.report()['users'], {})
+
+    def test_loaded_value_is_not_spilled_again(self):
+        """ """
+        data = UserData(id=1)
+        data['document'] = random_text(30000)
+        data['analysis'] = random_text(20000)
+        blobs = dict(data.raw_items())
+        self.assertIsNone(blobs['document'].data)
+
+        data['document']
+        self.assertIsNotNone(blobs['document'].data)
+        self.assertIsNone(blobs['analysis'].data)
+        self.assertLessEqual(data.size, 25000)
+
+    def test_dropped_users_are_released(self):
+        """ """
+        data = UserData(id=1, document=random_text(10000))
+        other = UserData(id=2, document=random_text(10000))
+        memory.manager.release(other)
+        self.assertEqual(list(memory.manager.report()['users']), [1])
+        del data, other
+        gc.collect()
+        self.assertEqual(memory.manager.total, 0)
+        self.assertEqual(memory.manager.report()['users'], {})
+
+    def test_sizes_are_estimated(self):
+        """ """
+        self.assertEqual(memory._sizeof({'a': 'water', 'b': ['ab', 'c']}), 10)
+        self.assertEqual(memory._sizeof('مياه'), 8)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
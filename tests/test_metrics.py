@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import asyncio
+import logging
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from bot import SET_TASKS
+from bot.gemini.base import Gemini
+from bot.gemini import base
+from bot.utils import sessions
+from bot.utils.metrics import Counter, Gauge, Histogram, render, serve_metrics
+
+
+class FakeStream:
+    """A streamed response of the model."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.text = ''.join(chunks)
+        self.usage_metadata = SimpleNamespace(prompt_token_count=12, candidates_token_count=30)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+
+class TestMetrics(unittest.TestCase):
+    """ """
+
+    def test_render(self):
+        """ """
+        Counter('test_requests_total', 'Requests.', labels=('path',)).inc(path='/a"b')
+        Gauge('test_depth', 'Depth.').track(lambda: 7)
+        histogram = Histogram('test_seconds', 'Seconds.', buckets=(0.1, 1))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5)
+
+        text = render()
+        self.assertIn('# TYPE test_requests_total counter\n', text)
+        self.assertIn('test_requests_total{path="/a\\"b"} 1\n', text)
+        self.assertIn('test_depth 7\n', text)
+        self.assertIn('test_seconds_bucket{le="0.1"} 1\n', text)
+        self.assertIn('test_seconds_bucket{le="1.0"} 2\n', text)
+        self.assertIn('test_seconds_bucket{le="+Inf"} 3\n', text)
+        self.assertIn('test_seconds_count 3\n', text)
+
+    def test_updates_from_threads(self):
+        """ """
+        counter = Counter('test_threads_total', 'Increments.', labels=('pool',))
+        gauge = Gauge('test_threads_pending', 'Pending.')
+        histogram = Histogram('test_threads_seconds', 'Seconds.', buckets=(0.5,))
+
+        def work():
+            for i in range(5000):
+                counter.inc(pool='generation')
+                gauge.inc()
+                histogram.observe(i % 2)
+                gauge.dec()
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for _ in range(20):
+                render()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+
+        self.assertEqual(counter.values[('generation',)], 40000)
+        self.assertEqual(gauge.values[()], 0)
+        series = histogram.values[()]
+        self.assertEqual(series['count'], 40000)
+        self.assertEqual(series['buckets'], [20000])
+        self.assertEqual(series['sum'], 20000)
+
+    def test_endpoint(self):
+        """ """
+        async def scenario():
+            server = await serve_metrics('127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            responses = []
+            for path in ('/metrics', '/'):
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+                responses.append(await reader.read())
+                writer.close()
+            server.close()
+            await server.wait_closed()
+            return responses
+
+        metrics, missing = asyncio.run(scenario())
+        self.assertTrue(metrics.startswith(b'HTTP/1.1 200 OK'))
+        self.assertIn(b'text/plain; version=0.0.4', metrics)
+        self.assertIn(b'# TYPE raed_handler_seconds histogram', metrics)
+        self.assertTrue(missing.startswith(b'HTTP/1.1 404'))
+
+    def test_handler_errors_by_transition(self):
+        """ """
+        # not a handler of the bot, whose metrics other tests may have recorded.
+        async def failing_tasks(update, context):
+            logging.getLogger('bot.states.tasks_handler').error('Error: boom')
+            return SET_TASKS
+
+        update = SimpleNamespace(update_id=1, effective_user=None,
+                                 effective_chat=SimpleNamespace(id=10))
+        context = SimpleNamespace(user_data={'_state': SET_TASKS})
+        asyncio.run(sessions.track_state(failing_tasks)(update, context))
+
+        key = ('failing_tasks', 'SET_TASKS', 'SET_TASKS')
+        self.assertEqual(sessions.handler_errors.values[key], 1)
+        self.assertEqual(sessions.transitions.values[key], 1)
+        self.assertEqual(
+            sessions.handler_seconds.values[('failing_tasks', 'SET_TASKS')]['count'], 1)
+        self.assertIsNone(sessions.current_callback.get())
+
+    def test_model_usage(self):
+        """ """
+        model = Gemini.__new__(Gemini)
+        model._model = SimpleNamespace(
+            generate_content=lambda prompt, stream: FakeStream(['The ', 'tree']))
+        self.assertEqual(model._generate('prompt', 'test_operation'), 'The tree')
+        self.assertEqual(base.model_tokens.values[('test_operation', 'prompt')], 12)
+        self.assertEqual(base.model_tokens.values[('test_operation', 'output')], 30)
+        self.assertEqual(base.first_token_seconds.values[('test_operation',)]['count'], 1)
+        self.assertEqual(base.model_seconds.values[('test_operation',)]['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
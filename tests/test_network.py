@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from telegram import Bot, InputFile
+from bot.utils import network
+from bot.utils.network import MeteredRequest, RoutedRequest
+from tests.fake_bot_api import FakeBotAPI
+
+
+class TestNetwork(unittest.TestCase):
+    """ """
+
+    def test_pools_are_separate(self):
+        """ """
+        async def scenario():
+            api = await FakeBotAPI().start()
+            api.add_file('profile', b'%PDF' * 1000)
+            request = RoutedRequest(MeteredRequest('test-api', 2, 5),
+                                    MeteredRequest('test-files', 1, 5))
+            updates = MeteredRequest('test-updates', 1, 5)
+            bot = Bot('123:abc', base_url=api.base_url, base_file_url=api.base_file_url,
+                      request=request, get_updates_request=updates)
+            async with bot:
+                await bot.send_message(42, 'hello')
+                file = await bot.get_file('profile')
+                content = await file.download_as_bytearray()
+                await bot.send_document(42, InputFile(b'document', filename='paper.docx'))
+                await bot.get_updates(timeout=0)
+            await api.stop()
+            return api, content
+
+        api, content = asyncio.run(scenario())
+        self.assertEqual(bytes(content), b'%PDF' * 1000)
+        self.assertEqual(api.called('sendMessage')[0]['text'], 'hello')
+        self.assertTrue(api.called('sendDocument')[0]['multipart'])
+
+        counts = {pool: series['count'] for (pool,), series
+                  in network.request_seconds.values.items() if pool.startswith('test-')}
+        # getMe, sendMessage and getFile / the download and the upload / getUpdates
+        self.assertEqual(counts, {'test-api': 3, 'test-files': 2, 'test-updates': 1})
+        self.assertEqual(network.pool_in_use.values[('test-files',)], 0)
+        self.assertEqual(network.pool_size.values[('test-api',)], 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import unittest
+from bot.utils import normalize
+from bot.utils.normalize import normalize_chars, normalize_document, strip_page_furniture
+
+
+class TestNormalize(unittest.TestCase):
+    """ """
+
+    def test_normalize_chars(self):
+        """ """
+        # presentation forms of السلام, a lam-alef ligature, tatweel and a zero width joiner
+        self.assertEqual(normalize_chars('ﺍﻟﺴﻼﻡ'), 'السلام')
+        self.assertEqual(normalize_chars('ﻻ تنـــمية‍'), 'لا تنمية')
+        self.assertEqual(normalize_chars('oﬃce'), 'office')
+
+    def test_strip_page_furniture(self):
+        """ """
+        bodies = ['Water access.\nIn Nyala.', 'Peace building.\nIn Darfur.',
+                  'Training youth.\nIn Kassala.', 'Budget.\nFor two years.']
+        pages = [f'Annual Report 2024\n{body}\nPage {n} of 4'
+                 for n, body in enumerate(bodies, 1)]
+        self.assertEqual(strip_page_furniture(pages), bodies)
+        # two pages are not enough to tell headers, page numbers still go
+        self.assertEqual(strip_page_furniture(pages[:2])[1],
+                         'Annual Report 2024\nPeace building.\nIn Darfur.')
+
+    def test_normalize_document(self):
+        """ """
+        before = normalize.document_chars.values.get(('normalized',), 0)
+        repeated = 'Contact us at info@example.org for more information.'
+        pages = [f'{repeated}\nThe water   project reaches displa-\nced families.   \n\n\n\n- 1 -',
+                 f'{repeated}\nIt trains youth.\n- 2 -']
+        text = normalize_document(pages, limit=0)
+        self.assertEqual(text, f'{repeated}\nThe water project reaches displaced families.'
+                               '\n\nIt trains youth.')
+        self.assertEqual(normalize.document_chars.values[('normalized',)] - before, len(text))
+
+    def test_hyphenated_compounds(self):
+        """ """
+        text = normalize_document([
+            'A community-\nbased project for displa-\nced families, with women-\nled '
+            'committees.\nThe water commit-\ntees meet in every water-\npoint and '
+            'the community centre. Twenty water-points are planned for the dis-\ntrict.'],
+            limit=0)
+        self.assertIn('community-based', text)
+        self.assertIn('displaced families', text)
+        self.assertIn('women-led', text)
+        self.assertIn('committees meet', text)
+        self.assertIn('every water-point', text)
+        self.assertIn('the district', text)
+
+    def test_limit_keeps_whole_paragraphs(self):
+        """ """
+        text = normalize_document(['first paragraph\nsecond paragraph'], limit=20)
+        self.assertEqual(text, 'first paragraph')
+        self.assertEqual(normalize_document(['x' * 50], limit=20), 'x' * 20)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from bot.utils.journal import JobJournal
+from bot.utils.workspaces import WorkspaceStore
+from bot.utils.overload import (
+    CACHED, NORMAL, REDUCED, SHED, OverloadController, Overloaded, ResponseCache
+)
+from tests.fake_model import FakeModel
+
+
+class Clock:
+    """ """
+
+    def __init__(self):
+        """ """
+        self.now = 1000.0
+
+    def __call__(self):
+        """ """
+        return self.now
+
+
+class TestOverload(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.clock = Clock()
+        patcher = patch('bot.utils.overload.time.monotonic', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.controller = OverloadController(
+            queue=4, error_rate=0.5, latency=10, window=60, cooldown=30, workers=2)
+
+    def test_levels_follow_the_queue(self):
+        """ """
+        self.assertEqual(self.controller.update(2), NORMAL)
+        self.assertEqual(self.controller.update(4), CACHED)
+        self.assertEqual(self.controller.update(6), REDUCED)
+        self.assertEqual(self.controller.update(9), SHED)
+
+    def test_recovery_steps_down_after_the_cooldown(self):
+        """ """
+        self.controller.update(9)
+        self.clock.now += 10
+        self.assertEqual(self.controller.update(0), SHED)
+        self.clock.now += 30
+        self.assertEqual(self.controller.update(0), REDUCED)
+        self.assertEqual(self.controller.update(0), REDUCED)
+        self.clock.now += 30
+        self.assertEqual(self.controller.update(0), CACHED)
+        self.clock.now += 30
+        self.assertEqual(self.controller.update(0), NORMAL)
+
+    def test_errors_and_latency(self):
+        """ """
+        for _ in range(4):
+            self.controller.observe(1, False)
+        # too few generations to trust the error rate
+        self.assertEqual(self.controller.update(0), NORMAL)
+        self.controller.observe(1, False)
+        self.assertEqual(self.controller.update(0), SHED)
+
+        controller = OverloadController(queue=4, latency=10, window=60, cooldown=0, workers=2)
+        controller.observe(12, True)
+        self.assertEqual(controller.update(0), CACHED)
+        self.assertEqual(controller.estimated_wait(3), 24)
+        # old generations leave the window
+        self.clock.now += 61
+        self.assertEqual(controller.update(0), NORMAL)
+        self.assertEqual(Overloaded(controller.estimated_wait(3)).minutes, 1)
+
+    def test_response_cache(self):
+        """ """
+        cache = ResponseCache(size=2, ttl=60)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        self.assertEqual(cache.get('a'), 'A')
+        cache.put('c', 'C')
+        # b was the least recently used
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+        self.clock.now += 61
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(ResponseCache.key('swot_analysis', 'water'),
+                         ResponseCache.key('swot_analysis', 'water'))
+
+    def test_journal_degrades(self):
+        """ """
+        model, reduced = FakeModel('full'), FakeModel('reduced')
+        directory = tempfile.mkdtemp()
+        workspaces = WorkspaceStore(os.path.join(directory, 'workspaces.sqlite3'))
+        team = workspaces.create('Team', 2)
+        journal = JobJournal(os.path.join(directory, 'journal.sqlite3'),
+                             model=lambda: model, reduced_model=lambda: reduced,
+                             overload=self.controller, cache=ResponseCache(),
+                             workspaces=workspaces)
+
+        async def generate(chat_id, text):
+            return await journal.generate(chat_id, chat_id, 'en', 'swot_analysis', text)
+
+        self.assertEqual(asyncio.run(generate(1, 'water')), '<b>full</b> water')
+
+        self.controller.level = CACHED
+        # another user asking the same is served from the cache
+        self.assertEqual(asyncio.run(generate(2, 'water')), '<b>full</b> water')
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(journal.get(JobJournal.job_id(2, 'swot_analysis', 'water'))['state'],
+                         'generated')
+
+        self.controller.level = REDUCED
+        self.assertEqual(asyncio.run(generate(2, 'schools')), '<b>reduced</b> schools')
+        # degraded results are not shared with the team
+        self.assertEqual(workspaces.artifacts(team['id']), [])
+
+        self.controller.level = SHED
+        with self.assertRaises(Overloaded):
+            asyncio.run(generate(3, 'clinics'))
+        self.assertIsNone(journal.get(JobJournal.job_id(3, 'swot_analysis', 'clinics')))
+        self.assertEqual(asyncio.run(generate(3, 'schools')), '<b>reduced</b> schools')
+        self.assertEqual(reduced.calls, 1)
+
+        # once the load dropped the full model answers again
+        self.controller.level = NORMAL
+        self.assertEqual(asyncio.run(generate(4, 'schools')), '<b>full</b> schools')
+        self.controller.level = CACHED
+        self.assertEqual(asyncio.run(generate(5, 'schools')), '<b>full</b> schools')
+        self.assertEqual(model.calls, 2)
+
+    def test_repeat_served_from_the_cache_is_delivered(self):
+        """ """
+        model = FakeModel()
+        journal = JobJournal(os.path.join(tempfile.mkdtemp(), 'journal.sqlite3'),
+                             model=lambda: model, overload=self.controller,
+                             cache=ResponseCache())
+        job_id = JobJournal.job_id(1, 'swot_analysis', 'water')
+
+        def deliver():
+            output = asyncio.run(journal.generate(1, 1, 'en', 'swot_analysis', 'water'))
+            with journal.delivering(job_id) as owned:
+                return output, owned
+
+        self.assertEqual(deliver(), ('<b>SWOT</b> water', True))
+        self.controller.level = CACHED
+        # the repeat is served from the cache and sent again
+        self.assertEqual(deliver(), ('<b>SWOT</b> water', True))
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(journal.get(job_id)['state'], 'delivered')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from telegram.ext import ApplicationHandlerStop
+from bot.states.language_handler import set_language
+from bot.states.pager import page_callback
+from bot.utils import delivery
+from bot.utils.delivery import result_pages, send_result, summarize
+
+ANALYSIS = '\n\n'.join(
+    f'<b>Cause {n}.</b> Water is scarce in the villages. Wells dry up every summer.'
+    for n in range(1, 41))
+
+
+class TestPager(unittest.TestCase):
+    """ """
+
+    def query(self, data, user_data):
+        """ """
+        query = SimpleNamespace(data=data, answer=AsyncMock(), edit_message_text=AsyncMock(),
+                                message=SimpleNamespace(reply_document=AsyncMock()))
+        context = SimpleNamespace(user_data=user_data, _user_id=1)
+        with self.assertRaises(ApplicationHandlerStop):
+            asyncio.run(page_callback(SimpleNamespace(callback_query=query), context))
+        return query
+
+    def test_summarize(self):
+        """ """
+        summary = summarize(ANALYSIS, limit=100)
+        self.assertTrue(summary.startswith('Cause 1.\nCause 2.'))
+        self.assertLessEqual(len(summary), 101)
+        self.assertTrue(summary.endswith('…'))
+        self.assertEqual(summarize('<i>a &lt; b</i> holds'), 'a &lt; b holds')
+
+    def test_result_pages(self):
+        """ """
+        pages = result_pages(ANALYSIS, size=500)
+        self.assertGreater(len(pages), 1)
+        self.assertTrue(all(len(page) <= 500 for page in pages))
+        self.assertEqual(pages[0].count('<b>'), pages[0].count('</b>'))
+
+    def test_send_result(self):
+        """ """
+        message = SimpleNamespace(reply_text=AsyncMock())
+        before = delivery.delivered_bytes.values.get(('low_bandwidth',), 0)
+        user_data = {'language_code': 'en', 'low_bandwidth': True, 'swot_analysis': ANALYSIS}
+        asyncio.run(send_result(message, user_data, 'swot_analysis', ANALYSIS))
+        message.reply_text.assert_awaited_once()
+        text = message.reply_text.call_args.args[0]
+        markup = message.reply_text.call_args.kwargs['reply_markup']
+        self.assertLess(len(text), len(ANALYSIS) / 4)
+        self.assertEqual(markup.inline_keyboard[0][0].callback_data, 'page:swot_analysis:1')
+        self.assertEqual(delivery.delivered_bytes.values[('low_bandwidth',)] - before,
+                         len(text.encode()))
+
+        message = SimpleNamespace(reply_text=AsyncMock())
+        user_data['low_bandwidth'] = False
+        asyncio.run(send_result(message, user_data, 'swot_analysis', ANALYSIS))
+        self.assertIn('Wells dry up', message.reply_text.call_args.args[0])
+
+    def test_page_callback(self):
+        """ """
+        user_data = {'language_code': 'en', 'swot_analysis': ANALYSIS}
+        pages = result_pages(ANALYSIS)
+        query = self.query('page:swot_analysis:2', user_data)
+        query.answer.assert_awaited_once_with()
+        text = query.edit_message_text.call_args.args[0]
+        self.assertIn(f'Page 2 of {len(pages)}', text)
+        self.assertTrue(text.endswith(pages[1]))
+        buttons = query.edit_message_text.call_args.kwargs['reply_markup'].inline_keyboard[0]
+        self.assertEqual([button.callback_data for button in buttons],
+                         ['page:swot_analysis:1', 'page:swot_analysis:3'])
+
+        query = self.query('page:swot_analysis:99', user_data)
+        buttons = query.edit_message_text.call_args.kwargs['reply_markup'].inline_keyboard[0]
+        self.assertEqual(len(buttons), 1)
+
+    def test_paper_document_and_expired_results(self):
+        """ """
+        user_data = {'language_code': 'en', 'concept_note': ANALYSIS}
+        query = self.query('page:concept_note:docx', user_data)
+        self.assertEqual(query.message.reply_document.call_args.kwargs['filename'],
+                         'concept_note.docx')
+
+        for data in ('page:swot_analysis:1', 'page:language_code:1'):
+            query = self.query(data, user_data)
+            self.assertTrue(query.answer.call_args.kwargs['show_alert'])
+            query.edit_message_text.assert_not_awaited()
+
+    def test_lite_language(self):
+        """ """
+        query = SimpleNamespace(data='ar:lite', answer=AsyncMock(), edit_message_text=AsyncMock())
+        context = SimpleNamespace(user_data={}, bot=SimpleNamespace(send_message=AsyncMock()),
+                                  _chat_id=10)
+        update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1))
+        asyncio.run(set_language(update, context))
+        self.assertEqual(context.user_data, {'language_code': 'ar', 'low_bandwidth': True})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
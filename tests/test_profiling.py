@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import pstats
+import tempfile
+import unittest
+from types import SimpleNamespace
+from bot import CONCEPT_NOTE
+from bot.utils.profiling import UpdateProfiler
+from bot.utils.sessions import track_state
+from bot.utils.workers import shutdown_pools
+
+
+async def concept_note(update, context):
+    """ """
+    return sum(range(10000)) and CONCEPT_NOTE
+
+
+async def set_tasks(update, context):
+    """ """
+    return None
+
+
+class TestProfiling(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.directory = tempfile.mkdtemp()
+
+    def dispatch(self, profiler, *callbacks):
+        """ """
+        async def scenario():
+            for update_id, callback in enumerate(callbacks):
+                update = SimpleNamespace(update_id=update_id, effective_user=None,
+                                         effective_chat=None)
+                context = SimpleNamespace(user_data={'_state': CONCEPT_NOTE})
+                await profiler.dispatch(
+                    track_state(callback)(update, context), update_id, 'CONCEPT_NOTE')
+            # let the profiles be written.
+            while len(asyncio.all_tasks()) > 1:
+                await asyncio.sleep(0.01)
+
+        asyncio.run(scenario())
+        shutdown_pools()
+        return sorted(os.listdir(self.directory))
+
+    def test_matching_handler(self):
+        """ """
+        profiler = UpdateProfiler(self.directory, rate=0, match=['concept_note'], keep=10)
+        profiles = self.dispatch(profiler, set_tasks, concept_note)
+        self.assertEqual(len(profiles), 1)
+        self.assertRegex(profiles[0], r'^\d{8}T\d{6}-1-concept_note-\d+ms\.prof$')
+        stats = pstats.Stats(os.path.join(self.directory, profiles[0]))
+        self.assertIn('concept_note', {name for _, _, name in stats.stats})
+
+    def test_sampling_and_pruning(self):
+        """ """
+        profiler = UpdateProfiler(self.directory, rate=1, keep=2)
+        profiles = self.dispatch(profiler, set_tasks, set_tasks, set_tasks)
+        self.assertEqual(len(profiles), 2)
+
+        profiler.configure()
+        self.assertFalse(profiler.enabled)
+        self.assertEqual(self.dispatch(profiler, concept_note), profiles)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import asyncio
+import unittest
+from telegram.error import RetryAfter
+from bot.utils import ratelimit
+from bot.utils.ratelimit import OutboundLimiter, BULK
+
+
+class TestRateLimit(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.limiter = OutboundLimiter(overall_rate=20)
+        self.sent = []
+
+    def request(self, endpoint, chat_id, result, priority=None, **data):
+        """ """
+        async def callback():
+            self.sent.append(result)
+            return result
+
+        return self.limiter.process_request(
+            callback, (), {}, endpoint, dict(chat_id=chat_id, **data), priority)
+
+    def test_interactive_before_bulk(self):
+        """ """
+        async def scenario():
+            self.limiter.overall.tokens = 0
+            return await asyncio.gather(
+                self.request('sendDocument', 1, 'document'),
+                self.request('sendMessage', 2, 'bulk', priority=BULK),
+                self.request('sendMessage', 3, 'reply'))
+
+        self.assertEqual(asyncio.run(scenario()), ['document', 'bulk', 'reply'])
+        self.assertEqual(self.sent[0], 'reply')
+        self.assertEqual(ratelimit.queue_depth.values[('bulk',)], 0)
+        self.assertGreater(ratelimit.wait_seconds.values[('bulk',)]['count'], 0)
+
+    def test_edits_are_coalesced(self):
+        """ """
+        async def scenario():
+            self.limiter.overall.tokens = 0
+            return await asyncio.gather(*(
+                self.request('editMessageText', 1, text, message_id=5)
+                for text in ('10%', '50%', '100%')))
+
+        self.assertEqual(asyncio.run(scenario()), ['100%'] * 3)
+        self.assertEqual(self.sent, ['100%'])
+        # the replaced edits give their tokens back to the chat
+        self.assertGreater(self.limiter._chats[1].tokens, 1)
+
+    def test_retry_after(self):
+        """ """
+        attempts = []
+
+        async def callback():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RetryAfter(0)
+            return 'ok'
+
+        before = ratelimit.retries.values.get((), 0)
+        result = asyncio.run(self.limiter.process_request(
+            callback, (), {}, 'sendMessage', {'chat_id': 1}, None))
+        self.assertEqual(result, 'ok')
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(ratelimit.retries.values[()], before + 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import asyncio
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from telegram.ext import ConversationHandler
+from bot import SET_DOCUMENT, SET_TASKS
+from bot.config import STATE_TIMEOUTS
+from bot.utils import memory, sessions
+from bot.utils.memory import UserData, MemoryManager
+
+
+class TestSessions(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        self.previous = memory.manager
+        memory.manager = MemoryManager(spill_dir=tempfile.mkdtemp())
+        self.bot = SimpleNamespace(send_message=AsyncMock())
+
+    def tearDown(self):
+        """ """
+        memory.manager = self.previous
+
+    def user(self, state, idle):
+        """ """
+        return UserData(
+            id=1, language_code='ar', document='water ' * 5000, tree_analysis='tree',
+            _state=state, _seen=time.time() - idle, _chat_id=10)
+
+    def run_sweep(self, *users):
+        """ """
+        context = SimpleNamespace(
+            bot=self.bot,
+            application=SimpleNamespace(user_data=dict(enumerate(users))))
+        asyncio.run(sessions.sweep(context))
+
+    def test_track_state(self):
+        """ """
+        async def callback(update, context):
+            return SET_TASKS
+
+        async def end(update, context):
+            return ConversationHandler.END
+
+        update = SimpleNamespace(update_id=1, effective_user=None,
+                                 effective_chat=SimpleNamespace(id=10))
+        context = SimpleNamespace(user_data=UserData(_expired=True))
+        asyncio.run(sessions.track_state(callback)(update, context))
+        self.assertEqual(context.user_data['_state'], SET_TASKS)
+        self.assertEqual(context.user_data['_chat_id'], 10)
+        self.assertNotIn('_expired', context.user_data)
+        asyncio.run(sessions.track_state(end)(update, context))
+        self.assertNotIn('_state', context.user_data)
+
+    def test_state_timeouts(self):
+        """ """
+        idle = STATE_TIMEOUTS[SET_TASKS] + 1
+        self.assertGreater(STATE_TIMEOUTS[SET_DOCUMENT], idle)
+        waiting, tasks = self.user(SET_DOCUMENT, idle), self.user(SET_TASKS, idle)
+        self.run_sweep(waiting, tasks)
+
+        self.assertIn('document', waiting)
+        self.assertEqual(waiting['_state'], SET_DOCUMENT)
+        self.assertNotIn('document', tasks)
+        self.assertNotIn('tree_analysis', tasks)
+        self.assertTrue(tasks['_expired'])
+        self.assertEqual(tasks['language_code'], 'ar')
+        self.bot.send_message.assert_awaited_once()
+        self.assertEqual(self.bot.send_message.await_args.args[0], 10)
+        self.assertEqual(sessions.live_conversations.values[()], 1)
+
+    def test_release_artifacts(self):
+        """ """
+        before = sessions.reclaimed_bytes.values.get((), 0)
+        user = self.user(SET_TASKS, 0)
+        released = sessions.release_artifacts(user)
+        self.assertGreater(released, 0)
+        self.assertEqual(user['id'], 1)
+        self.run_sweep(self.user(SET_TASKS, STATE_TIMEOUTS[SET_TASKS] + 1))
+        self.assertGreater(sessions.reclaimed_bytes.values[()], before)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# cumulative import time allowed for `bot.app`, in milliseconds.
+IMPORT_TIME_BUDGET_MS = int(os.getenv('IMPORT_TIME_BUDGET_MS', 500))
+
+HEAVY_MODULES = ('google.generativeai', 'pypdf', 'docx', 'textract')
+
+# run in a fresh interpreter, so no other test created the model first
+MODEL_ON_DEMAND = '''
+import bot.app
+from bot.gemini import base
+assert base._model is None, 'the model was created on import'
+model = base.get_model()
+assert model is not None and base.get_model() is model, 'the model was not shared'
+'''
+
+
+def import_times(module: str) -> dict:
+    """Imports the module in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        dict: The cumulative import time in microseconds of every imported module.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    """ """
+
+    def test_heavy_dependencies_are_lazy(self):
+        """ """
+        times = import_times('bot.app')
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times)
+
+    def test_import_time_budget(self):
+        """ """
+        times = import_times('bot.app')
+        self.assertLessEqual(times['bot.app'] / 1000, IMPORT_TIME_BUDGET_MS)
+
+    def test_model_is_created_on_demand(self):
+        """ """
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as cassette:
+            result = subprocess.run(
+                [sys.executable, '-c', MODEL_ON_DEMAND], capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                env={**os.environ, 'GEMINI_BACKEND': 'replay', 'GEMINI_CASSETTE': cassette.name})
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from telegram.ext import ApplicationHandlerStop
+from bot.states.admin import usage_command
+from bot.utils.journal import JobJournal
+from bot.utils.overload import CACHED
+from bot.utils.usage import QuotaExceeded, UsageLedger, count_tokens, measure
+from tests.fake_model import FakeModel
+
+
+# tokens of the two calls of every generation
+TOKENS = ((100, 40), (10, 5))
+
+
+class TestUsage(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        directory = tempfile.mkdtemp()
+        self.ledger = UsageLedger(os.path.join(directory, 'usage.sqlite3'),
+                                  user_quota=200, org_quota=300)
+        self.journal = JobJournal(os.path.join(directory, 'journal.sqlite3'),
+                                  model=lambda: FakeModel(tokens=TOKENS),
+                                  ledger=self.ledger)
+
+    def generate(self, user_id, text):
+        """ """
+        return asyncio.run(self.journal.generate(user_id, user_id, 'en', 'swot_analysis', text))
+
+    def test_measure(self):
+        """ """
+        self.assertEqual(measure(FakeModel(tokens=TOKENS).swot_analysis, 'water'),
+                         ('<b>SWOT</b> water', {'prompt_tokens': 110, 'output_tokens': 45}))
+        # outside of a measure the tokens are not counted anywhere
+        count_tokens(1, 1)
+
+    def test_generations_are_accounted(self):
+        """ """
+        self.generate(1, 'water')
+        self.assertEqual(self.ledger.used(user_id=1), 155)
+        self.journal.overload.level = CACHED
+        self.generate(2, 'water')
+        report = self.ledger.report()
+        self.assertEqual(report['totals']['calls'], 1)
+        self.assertEqual(report['totals']['cached'], 1)
+        self.assertEqual([row['user_id'] for row in report['users']], [1, 2])
+        self.assertEqual(self.ledger.report(user_id=1)['kinds'][0]['kind'], 'swot_analysis')
+
+    def test_quotas(self):
+        """ """
+        self.generate(1, 'water')
+        self.generate(1, 'schools')
+        with self.assertRaises(QuotaExceeded) as raised:
+            self.generate(1, 'clinics')
+        self.assertEqual(raised.exception.scope, 'user')
+
+        self.ledger.set_org(2, 'unicef')
+        self.ledger.set_org(3, 'unicef')
+        self.generate(2, 'water')
+        self.generate(3, 'water')
+        with self.assertRaises(QuotaExceeded) as raised:
+            self.generate(2, 'schools')
+        self.assertEqual(raised.exception.scope, 'org')
+        self.assertEqual(self.ledger.used(org='unicef'), 310)
+        # the other day starts afresh
+        with patch('bot.utils.usage.today', return_value='2099-01-01'):
+            self.generate(2, 'schools')
+
+    def test_usage_command(self):
+        """ """
+        self.generate(1, 'water')
+        update = SimpleNamespace(message=SimpleNamespace(reply_text=AsyncMock()),
+                                 effective_user=SimpleNamespace(id=99))
+        with patch('bot.states.admin.ledger', self.ledger):
+            for args in (['org', '1', 'unicef'], [], ['user', '1'], ['user']):
+                with self.assertRaises(ApplicationHandlerStop):
+                    asyncio.run(usage_command(update, SimpleNamespace(args=args)))
+        replies = [call.args[0] for call in update.message.reply_text.call_args_list]
+        self.assertEqual(replies[0], 'User 1 now belongs to unicef.')
+        self.assertIn('1: 155 tokens (110 prompt, 45 output), 1 calls', replies[1])
+        self.assertIn('Usage of user 1 (unicef) over 7 days', replies[2])
+        self.assertTrue(replies[3].startswith('/usage'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from telegram import Bot
+from bot.states.voice_handler import accept_voice
+from bot.utils.network import MeteredRequest, RoutedRequest
+from bot.utils.voice import StubEngine, Transcriber, TranscriptionError, VoiceTooLong, make_engine
+from bot.utils.workers import pending_work
+from tests.fake_bot_api import FakeBotAPI
+
+VOICE: bytes = b'OggS' * 50000
+
+
+class ReadingEngine(StubEngine):
+    """ """
+
+    def transcribe(self, path, lang, limit, deadline):
+        """ """
+        with open(path, 'rb') as audio:
+            self.content = audio.read()
+        return super().transcribe(path, lang, limit, deadline)
+
+
+def voice(duration=5, file_size=len(VOICE)):
+    """ """
+    return SimpleNamespace(file_id='voice', duration=duration, file_size=file_size)
+
+
+class TestVoice(unittest.TestCase):
+    """ """
+
+    def transcribe(self, transcriber, audio):
+        """ """
+        async def scenario():
+            api = await FakeBotAPI().start()
+            api.add_file('voice', VOICE)
+            request = RoutedRequest(MeteredRequest('voice-api', 2, 5),
+                                    MeteredRequest('voice-files', 1, 5))
+            bot = Bot('123:abc', base_url=api.base_url, base_file_url=api.base_file_url,
+                      request=request, get_updates_request=MeteredRequest('voice-updates', 1, 5))
+            ticks: list = []
+
+            async def tick():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0.01)
+
+            ticker = asyncio.create_task(tick())
+            try:
+                async with bot:
+                    return await transcriber.transcribe(bot, audio, 'en'), len(ticks), api
+            finally:
+                ticker.cancel()
+                await api.stop()
+
+        return asyncio.run(scenario())
+
+    def test_transcription_is_off_the_event_loop(self):
+        """ """
+        engine = ReadingEngine('Water shortage in Nyala', delay=0.2)
+        text, ticks, api = self.transcribe(Transcriber(engine), voice())
+        self.assertEqual(text, 'Water shortage in Nyala')
+        self.assertEqual(engine.content, VOICE)
+        self.assertEqual(engine.calls[0][1], 'en')
+        # the temporary file is removed
+        self.assertFalse(os.path.exists(engine.calls[0][0]))
+        # the event loop kept running while the engine worked
+        self.assertGreater(ticks, 5)
+        self.assertEqual(len(api.called('getFile')), 1)
+
+    def test_limits(self):
+        """ """
+        engine = StubEngine()
+        with self.assertRaises(VoiceTooLong) as raised:
+            self.transcribe(Transcriber(engine, max_seconds=60), voice(duration=61))
+        self.assertEqual(raised.exception.limit, 60)
+        self.assertEqual(engine.calls, [])
+        with self.assertRaises(TranscriptionError):
+            self.transcribe(Transcriber(StubEngine(delay=0.5), timeout=0.1), voice())
+
+    def test_timed_out_jobs_free_the_pool(self):
+        """ """
+        engine = StubEngine('Water shortage', delay=0.2)
+        slow = Transcriber(StubEngine(delay=30), timeout=0.3)
+
+        async def scenario():
+            api = await FakeBotAPI().start()
+            api.add_file('voice', VOICE)
+            bot = Bot('123:abc', base_url=api.base_url, base_file_url=api.base_file_url)
+            try:
+                async with bot:
+                    # more slow jobs than workers, the last ones time out in the queue
+                    failed = await asyncio.gather(
+                        *(slow.transcribe(bot, voice(), 'en') for _ in range(3)),
+                        return_exceptions=True)
+                    pending = pending_work.values[('transcription',)]
+                    started = time.perf_counter()
+                    text = await Transcriber(engine, timeout=1).transcribe(bot, voice(), 'en')
+                    return failed, pending, text, time.perf_counter() - started
+            finally:
+                await api.stop()
+
+        failed, pending, text, seconds = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(e, TranscriptionError) for e in failed))
+        # the workers gave up at the deadline, so the next job runs at once
+        self.assertEqual(pending, 0)
+        self.assertEqual(text, 'Water shortage')
+        self.assertLess(seconds, 1)
+        # the workers removed the temporary files once done with them
+        for path, _ in slow.engine.calls + engine.calls:
+            self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+    def test_stream_limit(self):
+        """ """
+        async def scenario(path):
+            api = await FakeBotAPI().start()
+            api.add_file('voice', VOICE)
+            request = MeteredRequest('voice-stream', 1, 5)
+            await request.initialize()
+            try:
+                written = await request.stream(f'{api.base_file_url}123:abc/voice', path)
+                with self.assertRaises(ValueError):
+                    await request.stream(f'{api.base_file_url}123:abc/voice', path, limit=1000)
+                return written
+            finally:
+                await request.shutdown()
+                await api.stop()
+
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertEqual(asyncio.run(scenario(os.path.join(directory, 'voice.ogg'))),
+                             len(VOICE))
+
+    def test_make_engine(self):
+        """ """
+        self.assertEqual(make_engine('stub').name, 'stub')
+        self.assertEqual(make_engine('sphinx').name, 'sphinx')
+        with self.assertRaises(ValueError):
+            make_engine('whisper')
+
+    def test_accept_voice(self):
+        """ """
+        handled: list = []
+
+        async def swot_analysis_method(update, context):
+            handled.append(update.message.text)
+            return 'END'
+
+        handler = accept_voice(swot_analysis_method)
+        self.assertEqual(handler.__name__, 'swot_analysis_method')
+
+        def send(audio, transcript='Water shortage'):
+            message = SimpleNamespace(
+                voice=audio, audio=None, text=None if audio else 'typed', reply_text=AsyncMock(),
+                to_dict=lambda: {'message_id': 1, 'date': 0,
+                                 'chat': {'id': 7, 'type': 'private'}})
+            update = SimpleNamespace(update_id=3, message=message)
+            context = SimpleNamespace(bot=None, user_data={'language_code': 'en'})
+            transcriber = Transcriber(StubEngine(transcript), max_seconds=60)
+            transcriber.download = AsyncMock()
+            with patch('bot.states.voice_handler.transcriber', transcriber):
+                state = asyncio.run(handler(update, context))
+            return state, [call.args[0] for call in message.reply_text.call_args_list]
+
+        self.assertEqual(send(None), ('END', []))
+        state, replies = send(voice())
+        self.assertEqual(state, 'END')
+        self.assertIn('<i>Water shortage</i>', replies[0])
+        self.assertEqual(handled, ['typed', 'Water shortage'])
+
+        # the conversation stays in its state when the voice is not transcribed
+        state, replies = send(voice(duration=90))
+        self.assertIsNone(state)
+        self.assertIn('under 60 seconds', replies[0])
+        state, replies = send(voice(), transcript='  ')
+        self.assertIsNone(state)
+        self.assertIn('could not understand', replies[0])
+        self.assertEqual(len(handled), 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
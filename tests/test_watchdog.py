@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from bot import SET_DOCUMENT
+from bot.utils import watchdog as module
+from bot.utils.sessions import track_state
+from bot.utils.watchdog import LoopWatchdog
+
+
+class TestWatchdog(unittest.TestCase):
+    """ """
+
+    def test_reports_blocking_callback(self):
+        """ """
+        async def handle_documents_upload(update, context):
+            time.sleep(0.3)
+            return SET_DOCUMENT
+
+        async def scenario(watchdog):
+            watchdog.start()
+            await asyncio.sleep(0.05)
+            update = SimpleNamespace(update_id=7, effective_user=None,
+                                     effective_chat=SimpleNamespace(id=10))
+            context = SimpleNamespace(user_data={'_state': SET_DOCUMENT})
+            for _ in range(2):
+                await track_state(handle_documents_upload)(update, context)
+                await asyncio.sleep(0.05)
+            watchdog.stop()
+
+        watchdog = LoopWatchdog(threshold=0.1, interval=0.01, report_interval=60)
+        with self.assertLogs('bot.utils.watchdog', 'WARNING') as logs:
+            asyncio.run(scenario(watchdog))
+
+        # the second stall at the same location is counted but not logged.
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('in handle_documents_upload (state SET_DOCUMENT, update 7, chat 10)',
+                      logs.output[0])
+        self.assertIn('time.sleep(0.3)', logs.output[0])
+        location = next(key for (key,) in module.loop_stalls.values
+                        if key.startswith('tests/test_watchdog.py'))
+        self.assertEqual(module.loop_stalls.values[(location,)], 2)
+        self.assertGreater(module.loop_lag.values[()]['count'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
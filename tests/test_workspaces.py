@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from telegram.ext import ApplicationHandlerStop
+from bot.states.documents_handler import handle_documents_upload
+from bot.states.workspace_handler import workspace_command
+from bot.utils.journal import JobJournal
+from bot.utils.workspaces import WorkspaceStore
+from tests.fake_model import FakeModel
+
+
+class TestWorkspaces(unittest.TestCase):
+    """ """
+
+    def setUp(self):
+        """ """
+        directory = tempfile.mkdtemp()
+        self.store = WorkspaceStore(os.path.join(directory, 'workspaces.sqlite3'), versions=2)
+        self.model = FakeModel()
+        self.journal = JobJournal(os.path.join(directory, 'journal.sqlite3'),
+                                  model=lambda: self.model, workspaces=self.store)
+
+    def command(self, user_id, args, chat_type='private', chat_id=None):
+        """ """
+        update = SimpleNamespace(
+            message=SimpleNamespace(reply_text=AsyncMock()),
+            effective_user=SimpleNamespace(id=user_id, language_code='en'),
+            effective_chat=SimpleNamespace(id=chat_id or user_id, type=chat_type, title='Team'))
+        with patch('bot.states.workspace_handler.workspaces', self.store):
+            with self.assertRaises(ApplicationHandlerStop):
+                asyncio.run(workspace_command(update, SimpleNamespace(args=args, user_data={})))
+        return update.message.reply_text.call_args.args[0]
+
+    def test_membership(self):
+        """ """
+        workspace = self.store.create('Nyala Water', 1)
+        self.assertEqual(self.store.join(workspace['code'].lower(), 2)['members'], 2)
+        self.assertIsNone(self.store.join('NOPE', 3))
+        group = self.store.for_chat(-100, 'Team', 2)
+        self.assertEqual(self.store.for_chat(-100, 'Team', 3)['id'], group['id'])
+        # a user belongs to one workspace
+        self.assertEqual(self.store.of(2)['id'], group['id'])
+        self.assertEqual(self.store.of(1)['members'], 1)
+        self.assertEqual(self.store.leave(3)['id'], group['id'])
+        self.assertIsNone(self.store.of(3))
+
+    def test_versions(self):
+        """ """
+        workspace = self.store.create('Team', 1)
+        self.assertEqual(self.store.save(workspace['id'], 'document', 'v1', 1, 'file-a'), 1)
+        self.assertEqual(self.store.save(workspace['id'], 'document', 'v1', 2, 'file-a'), 1)
+        self.assertEqual(self.store.save(workspace['id'], 'document', 'v2', 2, 'file-b'), 2)
+        self.assertEqual(self.store.save(workspace['id'], 'document', 'v3', 2, 'file-c'), 3)
+        self.assertEqual(self.store.document(1)['content'], 'v3')
+        versions = self.store.db.execute(
+            "SELECT version FROM artifacts WHERE name = 'document'").fetchall()
+        self.assertEqual(sorted(row[0] for row in versions), [2, 3])
+        self.assertEqual(self.store.artifacts(workspace['id'])[0]['version'], 3)
+
+    def test_results_are_generated_once_per_team(self):
+        """ """
+        workspace = self.store.create('Team', 1)
+        self.store.join(workspace['code'], 2)
+
+        def generate(user_id, text):
+            return asyncio.run(self.journal.generate(user_id, user_id, 'en', 'swot_analysis', text))
+
+        self.assertEqual(generate(1, 'water'), '<b>SWOT</b> water')
+        self.assertEqual(generate(2, 'water'), '<b>SWOT</b> water')
+        self.assertEqual(self.model.calls, 1)
+        # outside of the workspace results are not shared
+        generate(3, 'water')
+        self.assertEqual(self.model.calls, 2)
+
+    def test_repeated_results_are_delivered(self):
+        """ """
+        self.store.create('Team', 1)
+
+        def deliver():
+            output = asyncio.run(self.journal.generate(1, 1, 'en', 'swot_analysis', 'water'))
+            with self.journal.delivering(JobJournal.job_id(1, 'swot_analysis', 'water')) as owned:
+                return output, owned
+
+        self.assertEqual(deliver(), ('<b>SWOT</b> water', True))
+        # the repeat is served from the workspace and sent again
+        self.assertEqual(deliver(), ('<b>SWOT</b> water', True))
+        self.assertEqual(self.model.calls, 1)
+
+    def test_upload_is_shared_once(self):
+        """ """
+        workspace = self.store.create('Team', 1)
+        self.store.join(workspace['code'], 2)
+        bot = SimpleNamespace(get_file=AsyncMock())
+
+        def upload(user_id):
+            update = SimpleNamespace(
+                message=SimpleNamespace(
+                    reply_text=AsyncMock(),
+                    document=SimpleNamespace(file_id=f'id-{user_id}', file_unique_id='profile',
+                                             file_name='profile.pdf')),
+                effective_user=SimpleNamespace(id=user_id))
+            context = SimpleNamespace(bot=bot, user_data={'language_code': 'en'})
+            with patch('bot.states.documents_handler.workspaces', self.store), \
+                    patch('bot.states.documents_handler.process_documents',
+                          AsyncMock(return_value='Profile text')):
+                asyncio.run(handle_documents_upload(update, context))
+            return context.user_data, update.message.reply_text.call_args.args[0]
+
+        user_data, reply = upload(1)
+        self.assertNotIn('document', user_data)
+        self.assertIn('version 1', reply)
+        upload(2)
+        bot.get_file.assert_awaited_once()
+        self.assertEqual(self.store.document(2)['content'], 'Profile text')
+
+    def test_workspace_command(self):
+        """ """
+        reply = self.command(1, ['new', 'Nyala', 'Water'])
+        code = self.store.of(1)['code']
+        self.assertIn(code, reply)
+        self.assertIn('It has 2 members', self.command(2, ['join', code]))
+        self.assertIn('not valid', self.command(3, ['join', 'NOPE']))
+        self.assertIn('Members: 2', self.command(1, []))
+        self.assertIn('not in a workspace', self.command(3, []))
+        self.assertIn('Team', self.command(3, [], 'group', -100))
+        self.assertIn('You left the workspace Team', self.command(3, ['leave']))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)